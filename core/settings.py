@@ -92,6 +92,26 @@ DATABASES = {
 }
 
 
+# Cache
+# Compartilhado entre os processos do servidor (token do SITAC, locks).
+# Sem REDIS_URL usa a tabela do banco: execute `python manage.py createcachetable`.
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -168,6 +188,27 @@ CSP_STYLE_SRC = ("'self'", "'unsafe-inline'", "https://www.google.com")
 SITAC_BASE_URL = os.getenv('SITAC_BASE_URL', 'https://crea-to.sitac.com.br/app/webservices')
 SITAC_USERNAME = os.getenv('SITAC_USERNAME', '')
 SITAC_PASSWORD = os.getenv('SITAC_PASSWORD', '')
+SITAC_POOL_SIZE = int(os.getenv('SITAC_POOL_SIZE', '10'))  # conexões mantidas por processo
+SITAC_ASYNC_POOL_SIZE = int(os.getenv('SITAC_ASYNC_POOL_SIZE', '100'))  # conexões do cliente assíncrono por event loop
+SITAC_ASYNC_CONCURRENCY = int(os.getenv('SITAC_ASYNC_CONCURRENCY', '100'))  # envios simultâneos por event loop (asubmit_many/--concurrency maior eleva o limite)
+SITAC_CONNECT_TIMEOUT = float(os.getenv('SITAC_CONNECT_TIMEOUT', '5'))
+SITAC_READ_TIMEOUT = float(os.getenv('SITAC_READ_TIMEOUT', '30'))
+SITAC_MIN_READ_TIMEOUT = float(os.getenv('SITAC_MIN_READ_TIMEOUT', '5'))  # piso do timeout adaptativo
+SITAC_MAX_RETRIES = int(os.getenv('SITAC_MAX_RETRIES', '2'))
+SITAC_LEDGER_CLAIM_TIMEOUT = int(os.getenv('SITAC_LEDGER_CLAIM_TIMEOUT', '600'))  # segundos até um envio "enviando" abandonado poder ser refeito
+SITAC_BREAKER_FAILURE_RATE = float(os.getenv('SITAC_BREAKER_FAILURE_RATE', '0.5'))
+SITAC_BREAKER_OPEN_SECONDS = int(os.getenv('SITAC_BREAKER_OPEN_SECONDS', '30'))
+SITAC_TOKEN_REFRESH_MARGIN = int(os.getenv('SITAC_TOKEN_REFRESH_MARGIN', '120'))  # segundos antes de expirar
+SITAC_METRICS_TOKEN = os.getenv('SITAC_METRICS_TOKEN', '')  # Bearer token para o scrape de /sitac/metrics/
+SITAC_DEBUG_LOG_SAMPLE_RATE = float(os.getenv('SITAC_DEBUG_LOG_SAMPLE_RATE', '0'))  # fração das chamadas com log detalhado (0 a 1)
 
 # Validation behavior
 STRICT_CPF_CNPJ = os.getenv('STRICT_CPF_CNPJ', '1') == '1'
+
+# Lista de protocolos
+PROTOCOLOS_COUNT_CAP = int(os.getenv('PROTOCOLOS_COUNT_CAP', '10000'))  # acima disso a lista mostra "10.000+"
+PROTOCOLOS_FACET_TTL = int(os.getenv('PROTOCOLOS_FACET_TTL', '60'))  # segundos em cache das contagens por faceta
+PROTOCOLOS_FACET_MONTHS = int(os.getenv('PROTOCOLOS_FACET_MONTHS', '12'))  # meses exibidos na faceta de emissão
+PROTOCOLOS_RESPONSE_CACHE_TTL = int(os.getenv('PROTOCOLOS_RESPONSE_CACHE_TTL', '300'))  # páginas/fragmentos em cache (invalidados a cada gravação)
+PROTOCOLOS_EXPORT_CHUNK_SIZE = int(os.getenv('PROTOCOLOS_EXPORT_CHUNK_SIZE', '2000'))  # linhas por lote na exportação CSV/XLSX
+PROTOCOLOS_DASHBOARD_TTL = int(os.getenv('PROTOCOLOS_DASHBOARD_TTL', '300'))  # estatísticas do dashboard (invalidadas a cada gravação)
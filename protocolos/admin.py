@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Protocolo
+from .models import Protocolo, EnvioSITAC, RegistroEnvioSITAC, EstatisticaDiariaProtocolo
 
 @admin.register(Protocolo)
 class ProtocoloAdmin(admin.ModelAdmin):
@@ -36,3 +36,53 @@ class ProtocoloAdmin(admin.ModelAdmin):
         if not change:  # Se for uma nova criação
             obj.criado_por = request.user
         super().save_model(request, obj, form, change)
+
+
+
+@admin.register(EnvioSITAC)
+class EnvioSITACAdmin(admin.ModelAdmin):
+    list_display = ['protocolo', 'status', 'tentativas', 'disponivel_em', 'atualizado_em']
+    list_filter = ['status']
+    search_fields = ['protocolo__numero']
+    readonly_fields = ['criado_em', 'atualizado_em']
+    raw_id_fields = ['protocolo']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('protocolo')
+
+
+
+@admin.register(RegistroEnvioSITAC)
+class RegistroEnvioSITACAdmin(admin.ModelAdmin):
+    list_display = ['protocolo', 'status', 'tentativas', 'payload_hash', 'atualizado_em']
+    list_filter = ['status']
+    search_fields = ['protocolo__numero', 'payload_hash']
+    readonly_fields = ['protocolo', 'payload_hash', 'payload', 'resposta', 'tentativas', 'criado_em', 'atualizado_em']
+    actions = ['marcar_como_falhou']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('protocolo')
+    
+    def marcar_como_falhou(self, request, queryset):
+        # Libera envios que ficaram presos em "enviando" (ex.: worker interrompido)
+        # depois de confirmar no SITAC que o protocolo não foi criado
+        updated = queryset.filter(status=RegistroEnvioSITAC.STATUS_ENVIANDO).update(
+            status=RegistroEnvioSITAC.STATUS_FALHOU
+        )
+        self.message_user(request, f'{updated} registro(s) liberado(s) para reenvio.')
+    marcar_como_falhou.short_description = "Liberar envios presos para reenvio"
+
+
+
+@admin.register(EstatisticaDiariaProtocolo)
+class EstatisticaDiariaProtocoloAdmin(admin.ModelAdmin):
+    list_display = ['data', 'unidade_crea', 'tipo', 'total']
+    list_filter = ['unidade_crea', 'tipo']
+    date_hierarchy = 'data'
+    
+    # Mantida pelos signals e pelo comando estatisticas_diarias
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class ProtocolosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'protocolos'
-    verbose_name = 'Protocolos'
\ No newline at end of file
+    verbose_name = 'Protocolos'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,153 @@
+"""
+Cache das páginas públicas de protocolos
+Uma "versão dos dados" global (timestamp em microssegundos guardado no cache)
+entra em todas as chaves e no ETag. Qualquer gravação em Protocolo/Documento
+(signals, ou chamada explícita em quem usa update()/bulk_create) gera uma nova
+versão, e as respostas antigas deixam de ser usadas e expiram pelo TTL.
+
+- anônimos: a resposta inteira fica em cache
+- autenticados: só o fragmento da tabela, com uma marca no lugar dos botões
+  de ação, que são preenchidos por usuário a cada requisição
+- ETag/Last-Modified derivados da versão permitem respostas 304; para
+  autenticados o ETag inclui a sessão e o token CSRF, e com mensagens
+  pendentes não há 304 (a página antiga não as mostraria)
+"""
+import datetime
+import hashlib
+import time
+from functools import wraps
+from typing import Dict, List
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+VERSION_KEY = 'protocolos:versao'
+
+# Autoescape nunca produz "<!--" a partir dos dados, então a marca é inequívoca
+MARCA_ACOES = '<!--acoes-->'
+
+
+def response_ttl() -> int:
+    return getattr(settings, 'PROTOCOLOS_RESPONSE_CACHE_TTL', 300)
+
+
+def _agora_us() -> int:
+    return time.time_ns() // 1000
+
+
+def data_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Cache vazio (reinício do Redis): começa em "agora", invalidando tudo que havia
+        cache.add(VERSION_KEY, _agora_us(), None)
+        version = cache.get(VERSION_KEY) or _agora_us()
+    return version
+
+
+def bump_data_version() -> int:
+    version = max(_agora_us(), (cache.get(VERSION_KEY) or 0) + 1)
+    cache.set(VERSION_KEY, version, None)
+    return version
+
+
+def invalidate() -> None:
+    """Nova versão agora e de novo no commit, para não servir o que for renderizado antes dele"""
+    bump_data_version()
+    if connection.in_atomic_block:
+        transaction.on_commit(bump_data_version)
+
+
+def data_last_modified(request=None, *args, **kwargs) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(data_version() / 1_000_000, tz=datetime.timezone.utc)
+
+
+def user_variant(request) -> str:
+    """O que muda a página entre usuários: anônimo ou id e permissões do perfil"""
+    user = request.user
+    if not user.is_authenticated:
+        return 'anon'
+    perfil = getattr(user, 'perfil', None)
+    return f"u{user.pk}:{int(bool(perfil and perfil.can_edit))}{int(bool(perfil and perfil.can_publish))}"
+
+
+def _normalized_query(request) -> str:
+    return '&'.join(
+        f'{chave}={valor}'
+        for chave, valores in sorted(request.GET.lists())
+        for valor in valores
+        if valor
+    )
+
+
+def response_cache_key(nome: str, request, *partes) -> str:
+    # A data entra na chave porque a faceta de meses depende do dia atual
+    raw = '|'.join([_normalized_query(request), timezone.localdate().isoformat(), *map(str, partes)])
+    return f'protocolos:resposta:{nome}:{data_version()}:{hashlib.sha1(raw.encode("utf-8")).hexdigest()}'
+
+
+def session_variant(request) -> str:
+    """Sessão e token CSRF: login/logout os renovam, e a página guardada teria o token antigo nos formulários"""
+    if not request.user.is_authenticated:
+        return ''
+    session = getattr(request, 'session', None)
+    return f"{session.session_key if session is not None else ''}:{request.META.get('CSRF_COOKIE', '')}"
+
+
+def has_pending_messages(request) -> bool:
+    """Há mensagens a exibir (len() não as consome)"""
+    return bool(len(messages.get_messages(request)))
+
+
+def response_etag(request, *args, **kwargs) -> str:
+    raw = '|'.join([
+        str(data_version()), request.path, _normalized_query(request),
+        timezone.localdate().isoformat(), user_variant(request), session_variant(request),
+    ])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def conditional_page(view):
+    """``condition`` com ETag/Last-Modified da versão dos dados, ignorado quando há mensagens pendentes"""
+    condicional = condition(etag_func=response_etag, last_modified_func=data_last_modified)(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if has_pending_messages(request):
+            return view(request, *args, **kwargs)
+        return condicional(request, *args, **kwargs)
+    return wrapper
+
+
+def revalidate(response, request):
+    """Sempre revalidar (304 barato) e nunca compartilhar páginas de usuários autenticados"""
+    if request.user.is_authenticated:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def split_fragment(html: str, linhas: List) -> Dict:
+    """Fragmento cacheável: partes de HTML entre as marcas e os dados de cada linha"""
+    return {
+        'partes': html.split(MARCA_ACOES),
+        'linhas': [(linha.pk, linha.numero, linha.criado_por_id) for linha in linhas],
+    }
+
+
+def fill_actions(fragmento: Dict, user, user_can_edit: bool) -> str:
+    """Recompõe o fragmento com os botões que ``user`` pode ver em cada linha"""
+    partes = fragmento['partes']
+    html = [partes[0]]
+    for (pk, numero, criado_por_id), parte in zip(fragmento['linhas'], partes[1:]):
+        if user_can_edit or (user.is_authenticated and criado_por_id == user.pk):
+            html.append(render_to_string('protocolos/_acoes.html', {'protocolo': {'pk': pk, 'numero': numero}}))
+        html.append(parte)
+    return ''.join(html)
+
@@ -0,0 +1,30 @@
+"""
+Cadastro de protocolos
+Gravação usada pela view de criação e pelo comando ``benchmark_sitac``:
+protocolo e documentos em uma transação, junto com o envio ao SITAC que o
+post_save de Protocolo enfileira (somente finalísticos).
+"""
+from typing import Iterable, List, Tuple
+
+from django.db import transaction
+
+from .caching import invalidate
+from .models import Documento, Protocolo, TipoDocumento
+
+
+def criar_protocolo(
+    protocolo: Protocolo,
+    documentos: Iterable[Tuple[TipoDocumento, str]],
+    usuario=None,
+) -> List[Documento]:
+    """Grava ``protocolo`` (ainda não salvo) e os documentos ``(tipo, observações)``"""
+    with transaction.atomic():
+        protocolo.criado_por = usuario
+        protocolo.save()
+        criados = Documento.objects.bulk_create([
+            Documento(protocolo=protocolo, tipo_documento=tipo, observacoes=observacoes)
+            for tipo, observacoes in documentos
+        ])
+        # bulk_create não dispara os signals que invalidam o cache
+        invalidate()
+    return criados
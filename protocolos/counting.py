@@ -0,0 +1,146 @@
+"""
+Contagens baratas para listas grandes
+A lista não paga mais um COUNT(*) completo a cada página:
+
+- sem filtros: estimativa do planejador do PostgreSQL (pg_class.reltuples),
+  quando a tabela é grande o bastante para a estimativa importar;
+- com filtros: contagem limitada (``SELECT COUNT(*) FROM (... LIMIT n+1)``),
+  exibida como "10.000+" quando passa do limite; as páginas continuam além
+  do limite, cada uma buscando uma linha a mais para saber se há próxima;
+- contagem exata apenas quando pedida.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+def count_cap() -> int:
+    return getattr(settings, 'PROTOCOLOS_COUNT_CAP', 10000)
+
+
+@dataclass(frozen=True)
+class Contagem:
+    valor: int
+    estimada: bool = False  # estatística do planejador, não contada
+    limitada: bool = False  # há mais registros que ``valor``
+
+    @property
+    def exata(self) -> bool:
+        return not (self.estimada or self.limitada)
+
+    def __int__(self) -> int:
+        return self.valor
+
+    def __str__(self) -> str:
+        numero = f"{self.valor:,}".replace(',', '.')
+        if self.limitada:
+            return f"{numero}+"
+        if self.estimada:
+            return f"~{numero}"
+        return numero
+
+
+def estimar_total(model, using: str = 'default') -> Optional[int]:
+    """Linhas estimadas pelo planejador do PostgreSQL; None em outros bancos ou sem ANALYZE"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def contar(qs: QuerySet, filtrado: bool, exata: bool = False) -> Contagem:
+    """Conta ``qs`` do jeito mais barato que ainda informa o usuário"""
+    if exata:
+        return Contagem(qs.count())
+
+    limite = count_cap()
+    if not filtrado:
+        estimativa = estimar_total(qs.model, qs.db)
+        # Abaixo do limite a contagem limitada é exata e barata
+        if estimativa is not None and estimativa > limite:
+            return Contagem(estimativa, estimada=True)
+
+    parcial = qs.order_by().values('pk')[:limite + 1].count()
+    if parcial > limite:
+        return Contagem(limite, limitada=True)
+    return Contagem(parcial)
+
+
+class PaginaSemTotal(Page):
+    """Página de uma lista com contagem limitada: a próxima existe se veio uma linha a mais"""
+
+    def __init__(self, object_list, number, paginator, tem_proxima: bool):
+        super().__init__(object_list, number, paginator)
+        self.tem_proxima = tem_proxima
+
+    def has_next(self) -> bool:
+        return self.tem_proxima
+
+    def end_index(self) -> int:
+        return (self.number - 1) * self.paginator.per_page + len(self.object_list)
+
+
+class ContagemPaginator(Paginator):
+    """
+    Paginator que usa uma Contagem já calculada em vez de COUNT(*). Com
+    contagem limitada o total real é desconhecido, então qualquer página
+    pode ser pedida e ``num_pages`` cresce conforme as páginas visitadas.
+    """
+
+    def __init__(self, object_list, per_page, contagem: Contagem, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.contagem = contagem
+        self._ultima_vista = 0
+
+    @cached_property
+    def count(self) -> int:
+        return self.contagem.valor
+
+    @property
+    def num_pages(self) -> int:
+        paginas = super().num_pages
+        return max(paginas, self._ultima_vista) if self.contagem.limitada else paginas
+
+    def validate_number(self, number):
+        if not self.contagem.limitada:
+            return super().validate_number(number)
+        # Sem limite superior: a página além do fim é detectada em page()
+        try:
+            numero = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if numero < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return numero
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            # Além do fim real: a última página que se sabe existir
+            return self.page(self.num_pages)
+
+    def page(self, number):
+        if not self.contagem.limitada:
+            return super().page(number)
+        number = self.validate_number(number)
+        inicio = (number - 1) * self.per_page
+        linhas = list(self.object_list[inicio:inicio + self.per_page + 1])
+        if not linhas and number > 1:
+            raise EmptyPage(self.error_messages['no_results'])
+        tem_proxima = len(linhas) > self.per_page
+        self._ultima_vista = max(self._ultima_vista, number + tem_proxima)
+        return PaginaSemTotal(linhas[:self.per_page], number, self, tem_proxima)
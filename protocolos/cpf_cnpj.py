@@ -0,0 +1,90 @@
+"""
+Validação de CPF/CNPJ em lote
+Mesmo resultado de ``_validate_cpf``/``_validate_cnpj`` (protocolos/forms.py)
+para listas inteiras: os dígitos viram uma matriz uint8 (uma linha por
+documento) e os dígitos verificadores saem de dois produtos matriciais no
+NumPy. Sem NumPy instalado, os validadores escalares são usados linha a
+linha. Usado pelo comando ``auditar_cpf_cnpj``.
+"""
+import re
+from typing import Callable, List, Optional, Sequence
+
+from .forms import _validate_cnpj, _validate_cpf
+
+try:
+    import numpy as np
+except ImportError:  # opcional
+    np = None
+
+NAO_DIGITOS = re.compile(r'\D')
+
+PESOS_CPF_1 = list(range(10, 1, -1))
+PESOS_CPF_2 = list(range(11, 1, -1))
+PESOS_CNPJ_1 = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+PESOS_CNPJ_2 = [6] + PESOS_CNPJ_1
+
+
+def _digitos_cpf_ok(matriz):
+    d1 = (matriz[:, :9] @ np.array(PESOS_CPF_1) * 10) % 11
+    d1[d1 == 10] = 0
+    d2 = (matriz[:, :10] @ np.array(PESOS_CPF_2) * 10) % 11
+    d2[d2 == 10] = 0
+    return (matriz[:, 9] == d1) & (matriz[:, 10] == d2)
+
+
+def _digitos_cnpj_ok(matriz):
+    d1 = 11 - (matriz[:, :12] @ np.array(PESOS_CNPJ_1)) % 11
+    d1[d1 >= 10] = 0
+    d2 = 11 - (matriz[:, :13] @ np.array(PESOS_CNPJ_2)) % 11
+    d2[d2 >= 10] = 0
+    return (matriz[:, 12] == d1) & (matriz[:, 13] == d2)
+
+
+def _validar(
+    values: Sequence[Optional[str]],
+    tamanho: int,
+    escalar: Callable[[str], bool],
+    digitos_ok: Callable,
+) -> List[bool]:
+    if np is None:
+        return [escalar(value) for value in values]
+
+    resultado = [False] * len(values)
+    posicoes, limpos = [], []
+    for i, value in enumerate(values):
+        limpo = NAO_DIGITOS.sub('', value or '')
+        if len(limpo) != tamanho:
+            continue
+        if not limpo.isascii():
+            # \d também aceita dígitos de outros alfabetos; esses ficam com o validador escalar
+            resultado[i] = escalar(limpo)
+            continue
+        posicoes.append(i)
+        limpos.append(limpo)
+    if not limpos:
+        return resultado
+
+    matriz = np.frombuffer(''.join(limpos).encode('ascii'), dtype=np.uint8).reshape(-1, tamanho) - ord('0')
+    repetidos = (matriz == matriz[:, :1]).all(axis=1)
+    validos = digitos_ok(matriz.astype(np.int64)) & ~repetidos
+    for i, valido in zip(posicoes, validos.tolist()):
+        resultado[i] = valido
+    return resultado
+
+
+def validate_cpf_batch(values: Sequence[Optional[str]]) -> List[bool]:
+    """``_validate_cpf`` de cada valor, na mesma ordem"""
+    return _validar(values, 11, _validate_cpf, _digitos_cpf_ok)
+
+
+def validate_cnpj_batch(values: Sequence[Optional[str]]) -> List[bool]:
+    """``_validate_cnpj`` de cada valor, na mesma ordem"""
+    return _validar(values, 14, _validate_cnpj, _digitos_cnpj_ok)
+
+
+def validate_cpf_cnpj_batch(values: Sequence[Optional[str]]) -> List[bool]:
+    """CPF para valores com 11 dígitos, CNPJ para 14; qualquer outro tamanho é inválido"""
+    tamanhos = [len(NAO_DIGITOS.sub('', value or '')) for value in values]
+    cpfs = iter(validate_cpf_batch([v for v, t in zip(values, tamanhos) if t == 11]))
+    cnpjs = iter(validate_cnpj_batch([v for v, t in zip(values, tamanhos) if t == 14]))
+    return [next(cpfs) if t == 11 else next(cnpjs) if t == 14 else False for t in tamanhos]
@@ -0,0 +1,72 @@
+"""
+Estatísticas do dashboard
+Totais por tipo e por unidade, finalísticos pendentes/enviados ao SITAC e
+protocolos criados hoje, todos em uma única consulta com agregados
+condicionais. O resultado fica em cache sob a versão dos dados
+(``caching.data_version``), que os signals de Protocolo renovam a cada
+gravação/exclusão; o TTL (PROTOCOLOS_DASHBOARD_TTL) é só um limite.
+"""
+import datetime
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .caching import data_version
+from .models import Protocolo
+from .sitac_outbox import TIPOS_FINALISTICOS
+
+SITAC_PENDENTE = Q(tipo__in=TIPOS_FINALISTICOS) & (Q(protocolo_sitac__isnull=True) | Q(protocolo_sitac=''))
+
+
+def dashboard_ttl() -> int:
+    return getattr(settings, 'PROTOCOLOS_DASHBOARD_TTL', 300)
+
+
+def _inicio_do_dia(hoje: datetime.date) -> datetime.datetime:
+    inicio = datetime.datetime.combine(hoje, datetime.time.min)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+def dashboard_stats(hoje: Optional[datetime.date] = None) -> Dict:
+    """
+    ``{'total', 'criados_hoje', 'sitac_pendentes', 'sitac_enviados',
+    'por_tipo': [(valor, rótulo, total)], 'por_unidade': [...]}``
+    """
+    hoje = hoje or timezone.localdate()
+    key = f'protocolos:dashboard:{data_version()}:{hoje.isoformat()}'
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+
+    inicio = _inicio_do_dia(hoje)
+    agregados = {
+        'total': Count('pk'),
+        'criados_hoje': Count('pk', filter=Q(criado_em__gte=inicio, criado_em__lt=inicio + datetime.timedelta(days=1))),
+        'sitac_pendentes': Count('pk', filter=SITAC_PENDENTE),
+        'sitac_enviados': Count('pk', filter=Q(tipo__in=TIPOS_FINALISTICOS) & ~SITAC_PENDENTE),
+    }
+    for i, (valor, _) in enumerate(Protocolo.TIPO_CHOICES):
+        agregados[f'tipo_{i}'] = Count('pk', filter=Q(tipo=valor))
+    for i, (valor, _) in enumerate(Protocolo.UNIDADE_CHOICES):
+        agregados[f'unidade_{i}'] = Count('pk', filter=Q(unidade_crea=valor))
+
+    totais = Protocolo.objects.aggregate(**agregados)
+    stats = {
+        'total': totais['total'],
+        'criados_hoje': totais['criados_hoje'],
+        'sitac_pendentes': totais['sitac_pendentes'],
+        'sitac_enviados': totais['sitac_enviados'],
+        'por_tipo': [
+            (valor, rotulo, totais[f'tipo_{i}'])
+            for i, (valor, rotulo) in enumerate(Protocolo.TIPO_CHOICES)
+        ],
+        'por_unidade': [
+            (valor, rotulo, totais[f'unidade_{i}'])
+            for i, (valor, rotulo) in enumerate(Protocolo.UNIDADE_CHOICES)
+        ],
+    }
+    cache.set(key, stats, dashboard_ttl())
+    return stats
@@ -0,0 +1,190 @@
+"""
+Exportação da lista de protocolos (CSV e XLSX)
+As linhas saem de ``values_list().iterator(chunk_size)`` (cursor no servidor
+no PostgreSQL) com apenas as colunas exportadas; os documentos de cada lote
+vêm de uma consulta só e viram uma coluna "Tipo A; Tipo B". Tudo é gerado sob
+demanda, então a memória não cresce com o tamanho do resultado.
+
+No CSV, textos que começam com =, +, -, @ (ou tab/CR) recebem um "'" na
+frente para o Excel não os interpretar como fórmula (injeção de CSV).
+
+O XLSX é montado com zipfile (planilha com strings inline, sem estilos) e
+escrito em um buffer que é esvaziado a cada lote, sem dependências externas.
+"""
+import csv
+from itertools import islice
+import re
+from typing import Iterable, Iterator, List
+from xml.sax.saxutils import escape
+import zipfile
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from .models import Documento, Protocolo, formatar_cpf_cnpj
+
+EXPORT_FIELDS = (
+    'id', 'numero', 'tipo', 'cpf_cnpj', 'unidade_crea', 'armario', 'prateleira',
+    'caixa', 'data_emissao', 'protocolo_sitac', 'criado_em',
+)
+
+HEADER = [
+    'Número', 'Tipo', 'CPF/CNPJ', 'Unidade CREA-TO', 'Armário', 'Prateleira', 'Caixa',
+    'Data de Emissão', 'Protocolo SITAC', 'Criado em', 'Documentos',
+]
+
+TIPO_DISPLAY = dict(Protocolo.TIPO_CHOICES)
+UNIDADE_DISPLAY = dict(Protocolo.UNIDADE_CHOICES)
+
+
+def export_chunk_size() -> int:
+    return getattr(settings, 'PROTOCOLOS_EXPORT_CHUNK_SIZE', 2000)
+
+
+def _documentos(ids: List[int]) -> dict:
+    """Nomes dos tipos de documento de cada protocolo do lote, em uma consulta"""
+    por_protocolo = {}
+    documentos = (
+        Documento.objects.filter(protocolo_id__in=ids)
+        .order_by('protocolo_id', 'criado_em', 'pk')
+        .values_list('protocolo_id', 'tipo_documento__nome')
+    )
+    for protocolo_id, nome in documentos:
+        por_protocolo.setdefault(protocolo_id, []).append(nome)
+    return por_protocolo
+
+
+def export_rows(qs: QuerySet, chunk_size: int = None) -> Iterator[List[str]]:
+    """Cabeçalho e depois uma lista de textos por protocolo, na ordem de ``qs``"""
+    chunk_size = chunk_size or export_chunk_size()
+    yield HEADER
+    valores = qs.values_list(*EXPORT_FIELDS, named=True).iterator(chunk_size=chunk_size)
+    while True:
+        lote = list(islice(valores, chunk_size))
+        if not lote:
+            return
+        documentos = _documentos([v.id for v in lote])
+        for v in lote:
+            yield [
+                v.numero,
+                TIPO_DISPLAY.get(v.tipo, v.tipo),
+                formatar_cpf_cnpj(v.cpf_cnpj) if v.cpf_cnpj else '',
+                UNIDADE_DISPLAY.get(v.unidade_crea, v.unidade_crea),
+                v.armario,
+                v.prateleira,
+                v.caixa,
+                v.data_emissao.strftime('%d/%m/%Y'),
+                v.protocolo_sitac or '',
+                timezone.localtime(v.criado_em).strftime('%d/%m/%Y %H:%M'),
+                '; '.join(documentos.get(v.id, ())),
+            ]
+
+
+class _Buffer:
+    """Arquivo só de escrita que acumula bytes até serem retirados com take()"""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, data):
+        self.partes.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b''.join(self.partes)
+        self.partes = []
+        return data
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value: str) -> str:
+    return "'" + value if value.startswith(_INICIO_FORMULA) else value
+
+
+def csv_stream(rows: Iterable[List[str]]) -> Iterator[str]:
+    # BOM e ";" para o Excel em português abrir com acentos e colunas certos
+    yield '\ufeff'
+    writer = csv.writer(_Echo(), delimiter=';')
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+# Caracteres de controle não são permitidos em XML 1.0
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Protocolos" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+
+def _xlsx_row(row: List[str]) -> str:
+    cells = ''.join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_INVALID_XML.sub("", value))}</t></is></c>'
+        for value in row
+    )
+    return f'<row>{cells}</row>'
+
+
+def xlsx_stream(rows: Iterable[List[str]], rows_per_flush: int = 500) -> Iterator[bytes]:
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as xlsx:
+        xlsx.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        xlsx.writestr('_rels/.rels', _ROOT_RELS)
+        xlsx.writestr('xl/workbook.xml', _WORKBOOK)
+        xlsx.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        yield buffer.take()
+        with xlsx.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(_SHEET_START.encode('utf-8'))
+            for i, row in enumerate(rows, 1):
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                if i % rows_per_flush == 0:
+                    yield buffer.take()
+            sheet.write(_SHEET_END.encode('utf-8'))
+    yield buffer.take()
@@ -0,0 +1,100 @@
+"""
+Facetas da lista de protocolos
+Quantos protocolos cada opção de tipo, unidade e mês de emissão retornaria
+com os demais filtros atuais. Cada faceta ignora o próprio filtro (para
+mostrar as alternativas) e respeita os outros. Tudo sai de uma única consulta
+com agregados condicionais (COUNT(*) FILTER no PostgreSQL) e fica em cache
+por PROTOCOLOS_FACET_TTL segundos ou até a próxima gravação.
+"""
+import datetime
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .caching import data_version
+from .filters import ProtocoloFiltros
+from .models import Protocolo
+
+FACETAS = ('tipo', 'unidade_crea', 'data_emissao')
+
+
+def facet_ttl() -> int:
+    return getattr(settings, 'PROTOCOLOS_FACET_TTL', 60)
+
+
+def facet_months() -> int:
+    return getattr(settings, 'PROTOCOLOS_FACET_MONTHS', 12)
+
+
+def _meses(hoje: datetime.date, quantidade: int) -> List[datetime.date]:
+    """Primeiro dia dos ``quantidade`` últimos meses, do mais recente ao mais antigo"""
+    meses = []
+    ano, mes = hoje.year, hoje.month
+    for _ in range(quantidade):
+        meses.append(datetime.date(ano, mes, 1))
+        ano, mes = (ano, mes - 1) if mes > 1 else (ano - 1, 12)
+    return meses
+
+
+def _proximo_mes(inicio: datetime.date) -> datetime.date:
+    return datetime.date(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+
+
+def _cache_key(filtros: ProtocoloFiltros, hoje: datetime.date) -> str:
+    raw = json.dumps([filtros.as_dict(), hoje.isoformat()], sort_keys=True)
+    # A versão dos dados invalida as contagens a cada gravação, antes do TTL
+    return f'protocolos:facetas:{data_version()}:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def facet_counts(filtros: ProtocoloFiltros, hoje: Optional[datetime.date] = None) -> Dict[str, list]:
+    """
+    ``{'tipo': [(valor, rótulo, total)], 'unidade_crea': [...],
+    'mes': [(primeiro_dia, último_dia, total)]}``
+    """
+    hoje = hoje or timezone.localdate()
+    key = _cache_key(filtros, hoje)
+    facetas = cache.get(key)
+    if facetas is not None:
+        return facetas
+
+    condicoes = filtros.condicoes()
+
+    def demais(faceta: str) -> Q:
+        resultado = Q()
+        for nome, condicao in condicoes.items():
+            if nome != faceta:
+                resultado &= condicao
+        return resultado
+
+    meses = _meses(hoje, facet_months())
+    agregados = {}
+    for i, (valor, _) in enumerate(Protocolo.TIPO_CHOICES):
+        agregados[f'tipo_{i}'] = Count('pk', filter=Q(tipo=valor) & demais('tipo'))
+    for i, (valor, _) in enumerate(Protocolo.UNIDADE_CHOICES):
+        agregados[f'unidade_{i}'] = Count('pk', filter=Q(unidade_crea=valor) & demais('unidade_crea'))
+    for i, inicio in enumerate(meses):
+        periodo = Q(data_emissao__gte=inicio, data_emissao__lt=_proximo_mes(inicio))
+        agregados[f'mes_{i}'] = Count('pk', filter=periodo & demais('data_emissao'))
+
+    totais = filtros.apply(Protocolo.objects.all(), ignorar=FACETAS).aggregate(**agregados)
+    facetas = {
+        'tipo': [
+            (valor, rotulo, totais[f'tipo_{i}'])
+            for i, (valor, rotulo) in enumerate(Protocolo.TIPO_CHOICES)
+        ],
+        'unidade_crea': [
+            (valor, rotulo, totais[f'unidade_{i}'])
+            for i, (valor, rotulo) in enumerate(Protocolo.UNIDADE_CHOICES)
+        ],
+        'mes': [
+            (inicio, _proximo_mes(inicio) - datetime.timedelta(days=1), totais[f'mes_{i}'])
+            for i, inicio in enumerate(meses)
+        ],
+    }
+    cache.set(key, facetas, facet_ttl())
+    return facetas
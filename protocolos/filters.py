@@ -0,0 +1,83 @@
+"""
+Filtros da lista de protocolos
+Lê os parâmetros GET da lista (busca, tipo, unidade, local físico e período)
+e os aplica a um queryset. Usado pela lista, pelas facetas e por quem mais
+precisar do mesmo recorte (exportação).
+"""
+from dataclasses import asdict, dataclass
+import datetime
+from typing import Dict, Iterable, Optional
+
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_date
+
+from .search import search_protocolos
+
+FILTER_FIELDS = ('q', 'tipo', 'unidade_crea', 'armario', 'prateleira', 'caixa', 'data_inicio', 'data_fim')
+
+
+def _parse_date(value: str) -> Optional[datetime.date]:
+    try:
+        return parse_date(value) if value else None
+    except (ValueError, TypeError):
+        return None
+
+
+@dataclass(frozen=True)
+class ProtocoloFiltros:
+    q: str = ''
+    tipo: str = ''
+    unidade_crea: str = ''
+    armario: str = ''
+    prateleira: str = ''
+    caixa: str = ''
+    data_inicio: str = ''
+    data_fim: str = ''
+
+    @classmethod
+    def from_query(cls, params) -> 'ProtocoloFiltros':
+        return cls(
+            q=params.get('q', '').strip(),
+            tipo=params.get('tipo', ''),
+            unidade_crea=params.get('unidade_crea', ''),
+            armario=params.get('armario', '').strip(),
+            prateleira=params.get('prateleira', '').strip(),
+            caixa=params.get('caixa', '').strip(),
+            data_inicio=params.get('data_inicio', ''),
+            data_fim=params.get('data_fim', ''),
+        )
+
+    def as_dict(self) -> Dict[str, str]:
+        return asdict(self)
+
+    @property
+    def ativo(self) -> bool:
+        return any(self.as_dict().values())
+
+    def condicoes(self) -> Dict[str, Q]:
+        """Condição de cada filtro de faceta (tipo, unidade_crea, data_emissao); Q() se inativo"""
+        periodo = Q()
+        inicio, fim = _parse_date(self.data_inicio), _parse_date(self.data_fim)
+        if inicio:
+            periodo &= Q(data_emissao__gte=inicio)
+        if fim:
+            periodo &= Q(data_emissao__lte=fim)
+        return {
+            'tipo': Q(tipo=self.tipo) if self.tipo else Q(),
+            'unidade_crea': Q(unidade_crea=self.unidade_crea) if self.unidade_crea else Q(),
+            'data_emissao': periodo,
+        }
+
+    def apply(self, qs: QuerySet, ignorar: Iterable[str] = ()) -> QuerySet:
+        """Aplica os filtros a ``qs``; ``ignorar`` deixa de fora condições de faceta"""
+        if self.q:
+            # Busca indexada (trigramas/full-text no PostgreSQL), ordenada por relevância
+            qs = search_protocolos(qs, self.q)
+        for campo in ('armario', 'prateleira', 'caixa'):
+            valor = getattr(self, campo)
+            if valor:
+                qs = qs.filter(**{campo: valor})
+        for nome, condicao in self.condicoes().items():
+            if nome not in ignorar and condicao:
+                qs = qs.filter(condicao)
+        return qs
@@ -38,6 +38,39 @@ def _validate_cnpj(cnpj: str) -> bool:
     d2 = 0 if d2 >= 10 else d2
     return int(cnpj[12]) == d1 and int(cnpj[13]) == d2
 
+def normalize_cpf_cnpj(cpf_cnpj, tipo):
+    """CPF/CNPJ só com dígitos, validado para o tipo de processo (também usado por importar_protocolos)"""
+    # Para processos administrativos, CPF/CNPJ não deve ser informado
+    if tipo == 'administrativo' and cpf_cnpj:
+        raise forms.ValidationError(
+            'CPF/CNPJ não deve ser informado para processos administrativos'
+        )
+    
+    # Para processos finalísticos, CPF/CNPJ é obrigatório
+    if tipo in ['finalistico_pf', 'finalistico_pj'] and not cpf_cnpj:
+        raise forms.ValidationError(
+            'CPF/CNPJ é obrigatório para processos finalísticos'
+        )
+    
+    if cpf_cnpj:
+        cpf_cnpj_limpo = re.sub(r'[^\d]', '', cpf_cnpj)
+        
+        # Validação específica por tipo com dígitos verificadores
+        if tipo == 'finalistico_pf':
+            if len(cpf_cnpj_limpo) != 11:
+                raise forms.ValidationError('CPF deve ter 11 dígitos.')
+            if settings.STRICT_CPF_CNPJ and not _validate_cpf(cpf_cnpj_limpo):
+                raise forms.ValidationError('CPF inválido.')
+        elif tipo == 'finalistico_pj':
+            if len(cpf_cnpj_limpo) != 14:
+                raise forms.ValidationError('CNPJ deve ter 14 dígitos.')
+            if settings.STRICT_CPF_CNPJ and not _validate_cnpj(cpf_cnpj_limpo):
+                raise forms.ValidationError('CNPJ inválido.')
+        
+        return cpf_cnpj_limpo
+    return cpf_cnpj
+
+
 class ProtocoloForm(forms.ModelForm):
     class Meta:
         model = Protocolo
@@ -108,38 +141,7 @@ class ProtocoloForm(forms.ModelForm):
 
     def clean_cpf_cnpj(self):
         """Validação e formatação do CPF/CNPJ"""
-        cpf_cnpj = self.cleaned_data.get('cpf_cnpj')
-        tipo = self.cleaned_data.get('tipo')
-        
-        # Para processos administrativos, CPF/CNPJ não deve ser informado
-        if tipo == 'administrativo' and cpf_cnpj:
-            raise forms.ValidationError(
-                'CPF/CNPJ não deve ser informado para processos administrativos'
-            )
-        
-        # Para processos finalísticos, CPF/CNPJ é obrigatório
-        if tipo in ['finalistico_pf', 'finalistico_pj'] and not cpf_cnpj:
-            raise forms.ValidationError(
-                'CPF/CNPJ é obrigatório para processos finalísticos'
-            )
-        
-        if cpf_cnpj:
-            cpf_cnpj_limpo = re.sub(r'[^\d]', '', cpf_cnpj)
-            
-            # Validação específica por tipo com dígitos verificadores
-            if tipo == 'finalistico_pf':
-                if len(cpf_cnpj_limpo) != 11:
-                    raise forms.ValidationError('CPF deve ter 11 dígitos.')
-                if settings.STRICT_CPF_CNPJ and not _validate_cpf(cpf_cnpj_limpo):
-                    raise forms.ValidationError('CPF inválido.')
-            elif tipo == 'finalistico_pj':
-                if len(cpf_cnpj_limpo) != 14:
-                    raise forms.ValidationError('CNPJ deve ter 14 dígitos.')
-                if settings.STRICT_CPF_CNPJ and not _validate_cnpj(cpf_cnpj_limpo):
-                    raise forms.ValidationError('CNPJ inválido.')
-            
-            return cpf_cnpj_limpo
-        return cpf_cnpj
+        return normalize_cpf_cnpj(self.cleaned_data.get('cpf_cnpj'), self.cleaned_data.get('tipo'))
 
     def clean(self):
         """Validação geral do formulário"""
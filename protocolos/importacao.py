@@ -0,0 +1,309 @@
+"""
+Importação em lote de protocolos (CSV/JSONL)
+Usada pelo comando ``importar_protocolos`` para trazer arquivos de
+inspetorias. Cada registro passa pelas mesmas regras do cadastro
+(``normalize_cpf_cnpj`` do formulário e ``Protocolo.full_clean``, que
+inclui ``Protocolo.clean``), sem consultas ao banco, então a validação pode
+rodar em processos separados. Números repetidos são conferidos por lote,
+em uma consulta.
+
+Os válidos são gravados por lote em uma transação: ``bulk_create`` dos
+protocolos (um INSERT ... RETURNING por lote no PostgreSQL) e dos
+documentos. Como bulk_create não dispara signals, o rollup diário e a
+versão do cache são atualizados aqui.
+
+O CSV aceita o cabeçalho da exportação (``export.HEADER``), com ";" ou ","
+e rótulos de tipo/unidade no lugar dos valores; documentos vêm como
+"Tipo A; Tipo B" (ou lista, no JSONL) e são procurados pelo nome entre os
+tipos ativos da categoria do protocolo. A coluna data_emissao é opcional
+(AAAA-MM-DD ou DD/MM/AAAA, como na exportação); sem ela vale a data da
+importação.
+"""
+import csv
+from collections import deque
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from itertools import islice
+import json
+import multiprocessing
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import unicodedata
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import invalidate
+from .forms import normalize_cpf_cnpj
+from .models import Documento, EnvioSITAC, Protocolo, TipoDocumento
+from .rollup import ajustar_varios, chave
+from .sitac_outbox import TIPOS_FINALISTICOS
+
+CAMPOS = ('numero', 'tipo', 'cpf_cnpj', 'unidade_crea', 'armario', 'prateleira', 'caixa', 'observacoes')
+
+# Colunas já sem acentos e em minúsculas (ver _normalizar)
+ALIASES = {
+    'unidade': 'unidade_crea',
+    'unidade crea-to': 'unidade_crea',
+    'cpf/cnpj': 'cpf_cnpj',
+    'cpf': 'cpf_cnpj',
+    'cnpj': 'cpf_cnpj',
+    'data de emissao': 'data_emissao',
+}
+
+FORMATOS_DATA = ('%Y-%m-%d', '%d/%m/%Y')
+
+ERRO_LEITURA = '__erro__'
+
+Resultado = Tuple[int, Optional[dict], List[str], Dict[str, List[str]]]
+
+
+def _normalizar(texto: str) -> str:
+    """Sem acentos, minúsculas e sem espaços nas pontas"""
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii').strip().lower()
+
+
+def _coluna(nome: str) -> str:
+    nome = _normalizar(nome or '')
+    return ALIASES.get(nome, nome)
+
+
+def _escolhas(choices) -> Dict[str, str]:
+    """Valor por valor ou por rótulo (normalizado)"""
+    mapa = {_normalizar(rotulo): valor for valor, rotulo in choices}
+    mapa.update({valor: valor for valor, _ in choices})
+    return mapa
+
+
+TIPOS = _escolhas(Protocolo.TIPO_CHOICES)
+UNIDADES = _escolhas(Protocolo.UNIDADE_CHOICES)
+
+
+def resolver_unidade(valor: str) -> Optional[str]:
+    """Valor da unidade a partir do valor ou do nome; None se desconhecida"""
+    return UNIDADES.get(_normalizar(valor))
+
+
+def _texto(valor) -> str:
+    return '' if valor is None else str(valor).strip()
+
+
+def ler_linhas(arquivo, formato: str) -> Iterator[Tuple[int, dict]]:
+    """(linha no arquivo, registro com colunas normalizadas) de um arquivo texto aberto"""
+    if formato == 'jsonl':
+        for numero_linha, texto in enumerate(arquivo, 1):
+            if not texto.strip():
+                continue
+            try:
+                dados = json.loads(texto)
+            except json.JSONDecodeError as exc:
+                yield numero_linha, {ERRO_LEITURA: f'JSON inválido: {exc.msg}'}
+                continue
+            if not isinstance(dados, dict):
+                yield numero_linha, {ERRO_LEITURA: 'Cada linha deve ser um objeto JSON'}
+                continue
+            yield numero_linha, {_coluna(coluna): valor for coluna, valor in dados.items()}
+        return
+
+    primeira = arquivo.readline()
+    arquivo.seek(0)
+    delimitador = ';' if primeira.count(';') >= primeira.count(',') else ','
+    leitor = csv.DictReader(arquivo, delimiter=delimitador)
+    leitor.fieldnames = [_coluna(nome) for nome in leitor.fieldnames or []]
+    for dados in leitor:
+        yield leitor.line_num, dados
+
+
+def _data(texto: str) -> Optional[datetime.date]:
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    return None
+
+
+def validar_linha(dados: dict, unidade_padrao: str = '') -> Tuple[Optional[dict], List[str], Dict[str, List[str]]]:
+    """(campos do Protocolo, nomes dos documentos, erros por campo) de um registro"""
+    if ERRO_LEITURA in dados:
+        return None, [], {'__all__': [dados[ERRO_LEITURA]]}
+
+    campos = {campo: _texto(dados.get(campo)) for campo in CAMPOS}
+    campos['tipo'] = TIPOS.get(_normalizar(campos['tipo']), campos['tipo'])
+    unidade = campos['unidade_crea'] or unidade_padrao
+    campos['unidade_crea'] = resolver_unidade(unidade) or unidade
+
+    erros: Dict[str, List[str]] = {}
+    data_emissao = _texto(dados.get('data_emissao'))
+    if data_emissao:
+        campos['data_emissao'] = _data(data_emissao)
+        if campos['data_emissao'] is None:
+            erros['data_emissao'] = [f'Data inválida: "{data_emissao}" (use AAAA-MM-DD ou DD/MM/AAAA).']
+        elif campos['data_emissao'] > timezone.localdate():
+            erros['data_emissao'] = ['A data de emissão não pode estar no futuro.']
+    try:
+        campos['cpf_cnpj'] = normalize_cpf_cnpj(campos['cpf_cnpj'], campos['tipo']) or None
+    except ValidationError as exc:
+        erros['cpf_cnpj'] = exc.messages
+    try:
+        Protocolo(**campos).full_clean(exclude=list(erros), validate_unique=False, validate_constraints=False)
+    except ValidationError as exc:
+        for campo, mensagens in exc.message_dict.items():
+            # Protocolo.clean repete a regra de CPF/CNPJ; fica a mensagem do formulário
+            erros.setdefault(campo, mensagens)
+
+    documentos = dados.get('documentos') or []
+    if isinstance(documentos, str):
+        documentos = documentos.split(';')
+    documentos = [_texto(nome) for nome in documentos if _texto(nome)]
+    return campos, documentos, erros
+
+
+def validar_lote(linhas: List[Tuple[int, dict]], unidade_padrao: str = '') -> List[Resultado]:
+    """``validar_linha`` de cada registro do lote; roda nos processos de validação"""
+    return [(numero_linha, *validar_linha(dados, unidade_padrao)) for numero_linha, dados in linhas]
+
+
+def _lotes(linhas: Iterable, tamanho: int) -> Iterator[list]:
+    linhas = iter(linhas)
+    while True:
+        lote = list(islice(linhas, tamanho))
+        if not lote:
+            return
+        yield lote
+
+
+def _validar(lotes: Iterable[list], workers: int, unidade_padrao: str) -> Iterator[List[Resultado]]:
+    validar = partial(validar_lote, unidade_padrao=unidade_padrao)
+    if workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        yield from map(validar, lotes)
+        return
+    # Os processos herdam o Django já configurado e não usam o banco. No máximo
+    # workers * 2 lotes ficam em andamento (executor.map leria o arquivo todo de
+    # uma vez); os resultados saem na ordem dos lotes, como no caminho serial.
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as executor:
+        pendentes = deque()
+        for lote in lotes:
+            pendentes.append(executor.submit(validar, lote))
+            if len(pendentes) >= workers * 2:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+
+@dataclass
+class ResumoImportacao:
+    lidas: int = 0
+    importadas: int = 0
+    erros: List[Tuple[int, str, str]] = field(default_factory=list)
+    linhas_com_erro: int = 0
+    segundos_gravacao: float = 0.0
+    inicio: float = field(default_factory=time.monotonic)
+    fim: Optional[float] = None
+
+    def registrar(self, numero_linha: int, erros: Dict[str, List[str]]) -> None:
+        self.linhas_com_erro += 1
+        for campo, mensagens in erros.items():
+            for mensagem in mensagens:
+                self.erros.append((numero_linha, campo, mensagem))
+
+    @property
+    def segundos(self) -> float:
+        return (self.fim or time.monotonic()) - self.inicio
+
+    @property
+    def linhas_por_segundo(self) -> float:
+        return self.lidas / self.segundos if self.segundos else 0.0
+
+
+def _tipos_documento() -> Dict[Tuple[str, str], int]:
+    return {
+        (categoria, _normalizar(nome)): pk
+        for pk, categoria, nome in TipoDocumento.objects.filter(ativo=True).values_list('pk', 'categoria', 'nome')
+    }
+
+
+def _gravar(validos: List[Tuple[int, dict, List[int]]], usuario, enviar_sitac: bool) -> None:
+    with transaction.atomic():
+        protocolos = Protocolo.objects.bulk_create(
+            [Protocolo(**campos, criado_por=usuario) for _, campos, _ in validos]
+        )
+        # data_emissao é auto_now_add: bulk_create grava a data de hoje e a do arquivo vem depois
+        por_data: Dict[datetime.date, List[int]] = {}
+        for protocolo, (_, campos, _) in zip(protocolos, validos):
+            data_emissao = campos.get('data_emissao')
+            if data_emissao and data_emissao != protocolo.data_emissao:
+                protocolo.data_emissao = data_emissao
+                por_data.setdefault(data_emissao, []).append(protocolo.pk)
+        for data_emissao, pks in por_data.items():
+            Protocolo.objects.filter(pk__in=pks).update(data_emissao=data_emissao)
+        Documento.objects.bulk_create([
+            Documento(protocolo=protocolo, tipo_documento_id=tipo_id)
+            for protocolo, (_, _, tipos) in zip(protocolos, validos)
+            for tipo_id in tipos
+        ])
+        if enviar_sitac:
+            EnvioSITAC.objects.bulk_create([
+                EnvioSITAC(protocolo=protocolo) for protocolo in protocolos if protocolo.tipo in TIPOS_FINALISTICOS
+            ])
+        ajustar_varios(chave(protocolo) for protocolo in protocolos)
+    invalidate()
+
+
+def importar(
+    linhas: Iterable[Tuple[int, dict]],
+    chunk_size: int = 1000,
+    workers: int = 1,
+    dry_run: bool = False,
+    usuario=None,
+    unidade_padrao: str = '',
+    enviar_sitac: bool = False,
+) -> ResumoImportacao:
+    """Valida e grava ``linhas`` em lotes de ``chunk_size``; com ``dry_run`` só valida"""
+    resumo = ResumoImportacao()
+    tipos_documento = _tipos_documento()
+    vistos: Dict[str, int] = {}
+
+    for lote in _validar(_lotes(linhas, chunk_size), workers, unidade_padrao):
+        candidatos = []
+        for numero_linha, campos, documentos, erros in lote:
+            resumo.lidas += 1
+            tipos = []
+            if not erros:
+                for nome in documentos:
+                    tipo_id = tipos_documento.get((campos['tipo'], _normalizar(nome)))
+                    if tipo_id is None:
+                        erros.setdefault('documentos', []).append(
+                            f'Tipo de documento "{nome}" inexistente ou inativo para este tipo de processo.'
+                        )
+                    tipos.append(tipo_id)
+                if campos['numero'] in vistos:
+                    erros['numero'] = [f'Número repetido no arquivo (linha {vistos[campos["numero"]]}).']
+            if erros:
+                resumo.registrar(numero_linha, erros)
+                continue
+            vistos[campos['numero']] = numero_linha
+            candidatos.append((numero_linha, campos, tipos))
+
+        existentes = set(
+            Protocolo.objects.filter(numero__in=[campos['numero'] for _, campos, _ in candidatos])
+            .values_list('numero', flat=True)
+        )
+        validos = []
+        for numero_linha, campos, tipos in candidatos:
+            if campos['numero'] in existentes:
+                resumo.registrar(numero_linha, {'numero': ['Já existe um protocolo com este número.']})
+            else:
+                validos.append((numero_linha, campos, tipos))
+
+        if validos and not dry_run:
+            inicio = time.monotonic()
+            _gravar(validos, usuario, enviar_sitac)
+            resumo.segundos_gravacao += time.monotonic() - inicio
+        resumo.importadas += len(validos)
+
+    resumo.fim = time.monotonic()
+    return resumo
@@ -0,0 +1,87 @@
+"""
+Management command to audit the stored CPF/CNPJ of every protocolo
+"""
+import csv
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from protocolos import cpf_cnpj
+from protocolos.models import Protocolo
+
+CPF_INVALIDO = 'CPF inválido'
+CNPJ_INVALIDO = 'CNPJ inválido'
+EM_ADMINISTRATIVO = 'CPF/CNPJ em processo administrativo'
+
+
+class Command(BaseCommand):
+    help = 'Verifica, em lotes, os dígitos verificadores dos CPF/CNPJ gravados nos protocolos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Protocolos lidos e validados por lote (padrão: 5000)')
+        parser.add_argument('--tipo', choices=[valor for valor, _ in Protocolo.TIPO_CHOICES], help='Somente protocolos deste tipo')
+        parser.add_argument('--unidade', choices=[valor for valor, _ in Protocolo.UNIDADE_CHOICES], help='Somente protocolos desta unidade')
+        parser.add_argument('--relatorio', help='Grava os protocolos com problema neste arquivo CSV')
+        parser.add_argument('--limite', type=int, default=20, help='Problemas listados na saída (padrão: 20)')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size deve ser maior que zero.')
+
+        qs = Protocolo.objects.exclude(Q(cpf_cnpj__isnull=True) | Q(cpf_cnpj=''))
+        if options['tipo']:
+            qs = qs.filter(tipo=options['tipo'])
+        if options['unidade']:
+            qs = qs.filter(unidade_crea=options['unidade'])
+        linhas = qs.order_by('pk').values_list('pk', 'numero', 'tipo', 'cpf_cnpj').iterator(chunk_size=chunk_size)
+
+        inicio = time.monotonic()
+        verificados = 0
+        problemas = []
+        while True:
+            lote = list(islice(linhas, chunk_size))
+            if not lote:
+                break
+            verificados += len(lote)
+            pf = [linha for linha in lote if linha[2] == 'finalistico_pf']
+            pj = [linha for linha in lote if linha[2] == 'finalistico_pj']
+            for linhas_tipo, validar, motivo in (
+                (pf, cpf_cnpj.validate_cpf_batch, CPF_INVALIDO),
+                (pj, cpf_cnpj.validate_cnpj_batch, CNPJ_INVALIDO),
+            ):
+                validos = validar([linha[3] for linha in linhas_tipo])
+                problemas.extend((*linha, motivo) for linha, valido in zip(linhas_tipo, validos) if not valido)
+            problemas.extend((*linha, EM_ADMINISTRATIVO) for linha in lote if linha[2] == 'administrativo')
+        segundos = time.monotonic() - inicio
+
+        problemas.sort()
+        for pk, numero, tipo, valor, motivo in problemas[:options['limite']]:
+            self.stdout.write(f'{numero} (id {pk}, {tipo}): {motivo} - {valor}')
+        if len(problemas) > options['limite']:
+            self.stdout.write(f'... e mais {len(problemas) - options["limite"]} protocolo(s).')
+        if options['relatorio']:
+            with open(options['relatorio'], 'w', encoding='utf-8-sig', newline='') as relatorio:
+                writer = csv.writer(relatorio, delimiter=';')
+                writer.writerow(['id', 'numero', 'tipo', 'cpf_cnpj', 'problema'])
+                writer.writerows(problemas)
+            self.stdout.write(f'Relatório gravado em {options["relatorio"]}.')
+
+        motivos = {}
+        for *_, motivo in problemas:
+            motivos[motivo] = motivos.get(motivo, 0) + 1
+        self.stdout.write('')
+        self.stdout.write(f'Protocolos com CPF/CNPJ verificados: {verificados}')
+        for motivo in (CPF_INVALIDO, CNPJ_INVALIDO, EM_ADMINISTRATIVO):
+            self.stdout.write(f'  {motivo}: {motivos.get(motivo, 0)}')
+        taxa = verificados / segundos if segundos else 0
+        self.stdout.write(
+            f'Tempo: {segundos:.1f}s ({taxa:.0f} protocolos/s; '
+            f'validação {"vetorizada (NumPy)" if cpf_cnpj.np is not None else "escalar"})'
+        )
+        if problemas:
+            self.stdout.write(self.style.WARNING(f'{len(problemas)} protocolo(s) com CPF/CNPJ a corrigir.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Nenhum problema encontrado.'))
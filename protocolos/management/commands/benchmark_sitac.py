@@ -0,0 +1,136 @@
+"""
+Load benchmark for protocolo creation and SITAC submission against a local SITAC
+"""
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from protocolos.cadastro import criar_protocolo
+from protocolos.forms import ProtocoloForm
+from protocolos.models import EnvioSITAC, Protocolo, TipoDocumento
+from protocolos.sitac_bulk import RateLimiter, submit_many
+from protocolos.sitac_fake import FakeSITACServer
+from protocolos.sitac_service import SITACService
+from protocolos.utils import percentile
+
+from protocolos.management.commands.sitac_fake import add_fake_arguments, fake_config_from_options
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria N protocolos em paralelo e os envia a um SITAC local, medindo a latência '
+        'de criação e a vazão de envio. Nunca usa o SITAC_BASE_URL configurado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--protocolos', type=int, default=200, help='Quantidade de protocolos a criar (padrão: 200)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Criações/envios simultâneos (padrão: 8)')
+        parser.add_argument('--documentos', type=int, default=2, help='Documentos por protocolo (padrão: 2)')
+        parser.add_argument('--url', help='Usa um SITAC local já em execução (ex.: iniciado com sitac_fake) em vez do embutido')
+        parser.add_argument('--manter', action='store_true', help='Não remove os protocolos criados ao final')
+        add_fake_arguments(parser)
+
+    def handle(self, *args, **options):
+        total = options['protocolos']
+        concurrency = options['concurrency']
+        if total < 1 or concurrency < 1:
+            raise CommandError('--protocolos e --concurrency devem ser maiores que zero.')
+
+        server = None
+        base_url = options['url']
+        if not base_url:
+            server = FakeSITACServer(('127.0.0.1', 0), fake_config_from_options(options))
+            server.start_in_thread()
+            base_url = server.base_url
+        self.stdout.write(self.style.SUCCESS(f'SITAC local: {base_url}'))
+
+        run_id = secrets.token_hex(3)
+        tipos = list(
+            TipoDocumento.objects.filter(categoria='finalistico_pf', ativo=True)[:options['documentos']]
+        )
+
+        try:
+            with override_settings(SITAC_BASE_URL=base_url, SITAC_USERNAME='benchmark', SITAC_PASSWORD='benchmark'):
+                criados, create_latencies, create_elapsed = self._criar(run_id, total, concurrency, tipos)
+                envio = self._enviar(criados, concurrency)
+        finally:
+            if not options['manter']:
+                removidos, _ = Protocolo.objects.filter(numero__startswith=f'BENCH-{run_id}-').delete()
+                self.stdout.write(f'Dados do benchmark removidos ({removidos} registro(s)).')
+            if server:
+                server.stop()
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('Criação de protocolos'))
+        self.stdout.write(
+            f'  {len(create_latencies)} protocolo(s) em {create_elapsed:.2f}s '
+            f'({len(create_latencies) / create_elapsed:.1f}/s)'
+        )
+        self._latencias(create_latencies)
+
+        summary = envio.summary()
+        self.stdout.write(self.style.SUCCESS('Envio ao SITAC'))
+        self.stdout.write(
+            f'  {summary["total"]} envio(s) em {summary["elapsed"]:.2f}s '
+            f'({summary["throughput"]:.1f}/s) | {summary["outcomes"]}'
+        )
+        self._latencias(envio.latencies)
+        if server:
+            self.stdout.write(f'  Requisições no SITAC local: {server.stats}')
+
+    def _latencias(self, latencias):
+        self.stdout.write(
+            f'  p50 {percentile(latencias, 50) * 1000:.1f} ms | '
+            f'p95 {percentile(latencias, 95) * 1000:.1f} ms | '
+            f'p99 {percentile(latencias, 99) * 1000:.1f} ms'
+        )
+
+    def _criar(self, run_id, total, concurrency, tipos):
+        latencies = []
+        criados = []
+        lock = threading.Lock()
+
+        def criar(i):
+            try:
+                start = time.monotonic()
+                # Same path as the create view: form validation, then protocolo,
+                # documentos and the outbox row in one transaction
+                form = ProtocoloForm({
+                    'numero': f'BENCH-{run_id}-{i:06d}',
+                    'tipo': 'finalistico_pf',
+                    'cpf_cnpj': '52998224725',
+                    'unidade_crea': Protocolo.UNIDADE_CHOICES[0][0],
+                    'armario': '1',
+                    'prateleira': '1',
+                    'caixa': str(i % 50 + 1),
+                })
+                if not form.is_valid():
+                    raise CommandError(f'Protocolo de benchmark inválido: {form.errors.as_text()}')
+                with transaction.atomic():
+                    protocolo = form.save(commit=False)
+                    criar_protocolo(protocolo, [(tipo, 'benchmark') for tipo in tipos])
+                    # Keep the outbox worker away from benchmark rows: they are sent to the local SITAC below
+                    EnvioSITAC.objects.filter(protocolo=protocolo).update(
+                        disponivel_em=timezone.now() + timedelta(days=365)
+                    )
+                elapsed = time.monotonic() - start
+                with lock:
+                    latencies.append(elapsed)
+                    criados.append(protocolo)
+            finally:
+                connection.close()
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bench-create') as executor:
+            list(executor.map(criar, range(total)))
+        return criados, latencies, time.monotonic() - start
+
+    def _enviar(self, criados, concurrency):
+        return submit_many(criados, concurrency, sitac_service=SITACService(), limiter=RateLimiter(0))
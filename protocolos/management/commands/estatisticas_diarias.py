@@ -0,0 +1,39 @@
+"""
+Management command to rebuild or verify the daily protocolo rollup
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from protocolos import rollup
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói (ou apenas verifica) as estatísticas diárias de protocolos por unidade e tipo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Compara o rollup com a contagem real e falha se houver divergências, sem alterar nada',
+        )
+        parser.add_argument(
+            '--limite',
+            type=int,
+            default=20,
+            help='Divergências listadas na verificação (padrão: 20)',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verificar']:
+            linhas = rollup.reconstruir()
+            self.stdout.write(self.style.SUCCESS(f'Rollup reconstruído: {linhas} linha(s).'))
+            return
+
+        divergencias = rollup.divergencias()
+        if not divergencias:
+            self.stdout.write(self.style.SUCCESS('Rollup confere com os protocolos.'))
+            return
+        for (data, unidade, tipo), no_rollup, real in divergencias[:options['limite']]:
+            self.stdout.write(f'{data:%d/%m/%Y} {unidade} {tipo}: rollup {no_rollup}, real {real}')
+        raise CommandError(
+            f'{len(divergencias)} divergência(s) no rollup; rode "estatisticas_diarias" sem --verificar para reconstruir.'
+        )
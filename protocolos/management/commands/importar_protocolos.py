@@ -0,0 +1,94 @@
+"""
+Management command to bulk-import protocolos from CSV or JSONL files
+"""
+import csv
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from protocolos.importacao import importar, ler_linhas, resolver_unidade
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa protocolos de um arquivo CSV ou JSONL (numero, tipo, cpf_cnpj, unidade, armario, '
+        'prateleira, caixa, observacoes, documentos e, opcionalmente, data_emissao) com as mesmas validações do cadastro'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo .csv ou .jsonl')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Registros validados e gravados por lote (padrão: 1000)')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processos de validação em paralelo (padrão: 1; requer fork, como no Linux)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Apenas valida e relata; nada é gravado')
+        parser.add_argument('--relatorio', help='Grava os erros por linha neste arquivo CSV')
+        parser.add_argument('--usuario', help='Username registrado como criador dos protocolos')
+        parser.add_argument('--unidade', help='Unidade para registros sem a coluna unidade (valor ou nome)')
+        parser.add_argument(
+            '--enviar-sitac',
+            action='store_true',
+            help='Enfileira os finalísticos importados para envio ao SITAC (por padrão não são enviados)',
+        )
+        parser.add_argument('--limite-erros', type=int, default=20, help='Erros exibidos na saída (padrão: 20)')
+
+    def handle(self, *args, **options):
+        caminho = options['arquivo']
+        if not os.path.isfile(caminho):
+            raise CommandError(f'Arquivo não encontrado: {caminho}')
+        formato = options['formato'] or ('jsonl' if caminho.lower().endswith(('.jsonl', '.ndjson')) else 'csv')
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size e --workers devem ser maiores que zero.')
+        unidade = options['unidade'] or ''
+        if unidade and not resolver_unidade(unidade):
+            raise CommandError(f'Unidade desconhecida: {unidade}')
+
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = get_user_model().objects.get(username=options['usuario'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'Usuário não encontrado: {options["usuario"]}')
+
+        with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+            resumo = importar(
+                ler_linhas(arquivo, formato),
+                chunk_size=options['chunk_size'],
+                workers=options['workers'],
+                dry_run=options['dry_run'],
+                usuario=usuario,
+                unidade_padrao=unidade,
+                enviar_sitac=options['enviar_sitac'],
+            )
+
+        for numero_linha, campo, mensagem in resumo.erros[:options['limite_erros']]:
+            self.stdout.write(f'Linha {numero_linha} [{campo}]: {mensagem}')
+        if len(resumo.erros) > options['limite_erros']:
+            self.stdout.write(f'... e mais {len(resumo.erros) - options["limite_erros"]} erro(s).')
+        if options['relatorio']:
+            with open(options['relatorio'], 'w', encoding='utf-8-sig', newline='') as relatorio:
+                writer = csv.writer(relatorio, delimiter=';')
+                writer.writerow(['linha', 'campo', 'erro'])
+                writer.writerows(resumo.erros)
+            self.stdout.write(f'Relatório de erros gravado em {options["relatorio"]}.')
+
+        self.stdout.write('')
+        self.stdout.write(f'Registros lidos: {resumo.lidas}')
+        if options['dry_run']:
+            self.stdout.write(f'  válidos (seriam importados): {resumo.importadas}')
+        else:
+            self.stdout.write(f'  importados: {resumo.importadas}')
+        self.stdout.write(f'  com erro: {resumo.linhas_com_erro}')
+        self.stdout.write(
+            f'Tempo total: {resumo.segundos:.1f}s ({resumo.linhas_por_segundo:.0f} registros/s; '
+            f'gravação {resumo.segundos_gravacao:.1f}s)'
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Simulação (--dry-run): nada foi gravado.'))
+        elif resumo.importadas:
+            self.stdout.write(self.style.SUCCESS('Importação concluída.'))
@@ -0,0 +1,75 @@
+"""
+Management command that drains the SITAC outbox
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from protocolos import sitac_metrics
+from protocolos.sitac_outbox import process_batch
+from protocolos.sitac_service import SITACService
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de envios de protocolos ao SITAC (pode rodar em vários processos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=10,
+            help='Quantidade de envios reservados por iteração',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=5.0,
+            help='Segundos de espera quando a fila está vazia',
+        )
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            help='Expõe as métricas do SITAC deste worker (formato Prometheus) nesta porta',
+        )
+        parser.add_argument(
+            '--uma-vez',
+            action='store_true',
+            help='Processa a fila até esvaziar e encerra',
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        intervalo = options['intervalo']
+        uma_vez = options['uma_vez']
+
+        if options['metrics_port']:
+            sitac_metrics.start_http_server(options['metrics_port'])
+            self.stdout.write(f"Métricas em http://0.0.0.0:{options['metrics_port']}/")
+
+        sitac_service = SITACService()
+        total_enviados = total_falhas = 0
+
+        self.stdout.write(self.style.SUCCESS('Processando fila de envios ao SITAC...'))
+        try:
+            while True:
+                close_old_connections()
+                # Renova o token antes de expirar, mesmo com a fila vazia
+                sitac_service.token_manager.refresh_if_needed()
+                enviados, falhas = process_batch(lote, sitac_service)
+                total_enviados += enviados
+                total_falhas += falhas
+
+                if enviados or falhas:
+                    self.stdout.write(f'Lote processado: {enviados} enviado(s), {falhas} falha(s)')
+                    continue
+
+                if uma_vez:
+                    break
+                time.sleep(intervalo)
+        except KeyboardInterrupt:
+            self.stdout.write('Interrompido pelo usuário.')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Concluído: {total_enviados} enviado(s), {total_falhas} falha(s).')
+        )
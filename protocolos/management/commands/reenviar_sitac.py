@@ -0,0 +1,143 @@
+"""
+Management command to (re)submit pending finalístico protocolos to SITAC in bulk
+"""
+import asyncio
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from protocolos.models import Protocolo
+from protocolos.sitac_async import AsyncSITACService, asubmit_many, close_async_client
+from protocolos.sitac_bulk import BulkResult, RateLimiter, submit_many
+from protocolos.sitac_ledger import ALREADY_SENT, SENT
+from protocolos.sitac_outbox import TIPOS_FINALISTICOS
+from protocolos.sitac_service import SITACService
+
+
+class Command(BaseCommand):
+    help = 'Reenvia ao SITAC, em paralelo, os protocolos finalísticos sem protocolo_sitac'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Envios simultâneos (padrão: 4)')
+        parser.add_argument('--rate', type=float, default=5.0, help='Máximo de envios por segundo; 0 desativa (padrão: 5)')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Protocolos lidos por consulta (padrão: 200)')
+        parser.add_argument('--since', help='Somente protocolos emitidos a partir desta data (AAAA-MM-DD)')
+        parser.add_argument('--unidade', choices=[valor for valor, _ in Protocolo.UNIDADE_CHOICES], help='Somente protocolos desta unidade')
+        parser.add_argument('--resume', action='store_true', help='Continua a partir do último lote concluído com os mesmos filtros')
+        parser.add_argument(
+            '--assincrono',
+            action='store_true',
+            help='Envia por um único event loop com o cliente assíncrono; --concurrency passa a ser o número de envios em andamento (ex.: 200)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Apenas conta os protocolos pendentes')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        chunk_size = options['chunk_size']
+        if concurrency < 1 or chunk_size < 1:
+            raise CommandError('--concurrency e --chunk-size devem ser maiores que zero.')
+
+        qs = Protocolo.objects.filter(tipo__in=TIPOS_FINALISTICOS).filter(
+            Q(protocolo_sitac__isnull=True) | Q(protocolo_sitac='')
+        )
+        if options['since']:
+            since = parse_date(options['since'])
+            if not since:
+                raise CommandError('--since deve estar no formato AAAA-MM-DD.')
+            qs = qs.filter(data_emissao__gte=since)
+        if options['unidade']:
+            qs = qs.filter(unidade_crea=options['unidade'])
+
+        checkpoint_key = f"reenviar_sitac:checkpoint:{options['since'] or ''}:{options['unidade'] or ''}"
+        ultimo_id = cache.get(checkpoint_key, 0) if options['resume'] else 0
+        if ultimo_id:
+            self.stdout.write(f'Retomando após o protocolo id {ultimo_id}.')
+        qs = qs.filter(pk__gt=ultimo_id).order_by('pk')
+
+        if options['dry_run']:
+            self.stdout.write(f'{qs.count()} protocolo(s) pendente(s).')
+            return
+
+        sitac_service = SITACService()
+        result = BulkResult()
+        limiter = RateLimiter(options['rate'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Reenviando ao SITAC (concorrência {concurrency}, até {options["rate"] or "∞"} envio(s)/s)...'
+        ))
+
+        # Resultado de cada protocolo do lote; o checkpoint só avança sobre
+        # envios concluídos em sequência, para --resume não pular falhas
+        resultados = {}
+
+        def registrar(protocolo, outcome):
+            resultados[protocolo.pk] = outcome
+
+        runner = None
+        if options['assincrono']:
+            # Um único loop para todos os lotes: as conexões do pool são reaproveitadas entre eles
+            runner = asyncio.Runner()
+            async_service = AsyncSITACService()
+
+            def enviar(lote):
+                runner.run(asubmit_many(
+                    lote, concurrency, sitac_service=async_service, result=result, limiter=limiter, on_done=registrar,
+                ))
+        else:
+            def enviar(lote):
+                submit_many(lote, concurrency, sitac_service=sitac_service, result=result, limiter=limiter, on_done=registrar)
+
+        checkpoint_id = ultimo_id
+        primeira_falha = None
+        try:
+            while True:
+                # Keyset por pk: cada lote é uma consulta barata, mesmo no fim da tabela.
+                # Os payloads são montados com os documentos pré-carregados (3 consultas por lote).
+                lote = list(sitac_service.iter_protocolo_data(qs.filter(pk__gt=ultimo_id)[:chunk_size], chunk_size))
+                if not lote:
+                    break
+                resultados.clear()
+                enviar(lote)
+                ultimo_id = lote[-1][0].pk
+                if primeira_falha is None:
+                    for protocolo, _ in lote:
+                        if resultados.get(protocolo.pk) not in (SENT, ALREADY_SENT):
+                            primeira_falha = protocolo.pk
+                            break
+                        checkpoint_id = protocolo.pk
+                    cache.set(checkpoint_key, checkpoint_id, None)
+                self.stdout.write(
+                    f'{result.total} processado(s) | {result.throughput:.1f}/s | '
+                    f'último id {ultimo_id} | {result.outcomes}'
+                )
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING(
+                f'Interrompido. Use --resume para continuar após o protocolo id {checkpoint_id}.'
+            ))
+        finally:
+            if runner:
+                runner.run(close_async_client())
+                runner.close()
+
+        if primeira_falha is not None:
+            self.stdout.write(self.style.WARNING(
+                f'O envio do protocolo id {primeira_falha} não foi concluído; o checkpoint ficou no id '
+                f'{checkpoint_id} e --resume tentará de novo a partir dele.'
+            ))
+        self._print_summary(result)
+
+    def _print_summary(self, result):
+        summary = result.summary()
+        outcomes = summary['outcomes']
+        self.stdout.write('')
+        self.stdout.write(f'Total processado: {summary["total"]}')
+        self.stdout.write(f'  enviados: {outcomes.get("sent", 0)}')
+        self.stdout.write(f'  já enviados anteriormente: {outcomes.get("already_sent", 0)}')
+        self.stdout.write(f'  em andamento em outro processo: {outcomes.get("in_flight", 0)}')
+        self.stdout.write(f'  falhas: {outcomes.get("failed", 0) + outcomes.get("error", 0)}')
+        self.stdout.write(f'Tempo total: {summary["elapsed"]:.1f}s | Vazão: {summary["throughput"]:.2f} protocolo(s)/s')
+        self.stdout.write(
+            f'Latência por envio: p50 {summary["p50"] * 1000:.0f} ms | '
+            f'p95 {summary["p95"] * 1000:.0f} ms | p99 {summary["p99"] * 1000:.0f} ms'
+        )
@@ -0,0 +1,47 @@
+"""
+Management command that runs a local fake SITAC webservice
+"""
+from django.core.management.base import BaseCommand
+
+from protocolos.sitac_fake import LATENCY_DISTRIBUTIONS, FakeSITACConfig, FakeSITACServer
+
+
+def add_fake_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Latência média por requisição em ms (padrão: 50)')
+    parser.add_argument('--latency-dist', choices=LATENCY_DISTRIBUTIONS, default='fixed', help='Distribuição da latência (padrão: fixed)')
+    parser.add_argument('--latency-jitter', type=float, default=0.5, help='Dispersão: ±fração (uniform) ou sigma (lognormal)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fração de requisições respondidas com erro (0 a 1)')
+    parser.add_argument('--error-status', type=int, default=503, help='Status HTTP dos erros simulados (padrão: 503)')
+    parser.add_argument('--token-ttl', type=int, default=1800, help='expires_in dos tokens emitidos, em segundos')
+
+
+def fake_config_from_options(options) -> FakeSITACConfig:
+    return FakeSITACConfig(
+        latency_ms=options['latency_ms'],
+        latency_distribution=options['latency_dist'],
+        latency_jitter=options['latency_jitter'],
+        error_rate=options['error_rate'],
+        error_status=options['error_status'],
+        token_ttl=options['token_ttl'],
+    )
+
+
+class Command(BaseCommand):
+    help = 'Executa um SITAC local (login, refresh-token e saveProtocolo) para testes de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        add_fake_arguments(parser)
+
+    def handle(self, *args, **options):
+        server = FakeSITACServer((options['host'], options['port']), fake_config_from_options(options))
+        self.stdout.write(self.style.SUCCESS(f'SITAC local em {server.base_url}'))
+        self.stdout.write(f'Use SITAC_BASE_URL={server.base_url} para apontar a aplicação para ele.')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'Requisições atendidas: {server.stats}')
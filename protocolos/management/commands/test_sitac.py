@@ -4,6 +4,9 @@ Management command to test SITAC integration
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from protocolos.sitac_service import SITACService
+from protocolos.sitac_ledger import ALREADY_SENT, IN_FLIGHT, SENT, submit_once
+from protocolos.sitac_transport import pool_stats
+from protocolos import sitac_resilience
 from protocolos.models import Protocolo
 import json
 
@@ -59,12 +62,16 @@ class Command(BaseCommand):
                 self.stdout.write('Protocolo data to be sent:')
                 self.stdout.write(json.dumps(protocolo_data, indent=2, ensure_ascii=False))
                 
-                # Submit to SITAC
-                success, response = sitac_service.submit_protocolo(protocolo_data)
+                # Submit to SITAC through the ledger (never sends the same protocolo twice)
+                outcome, response = submit_once(protocolo, sitac_service, protocolo_data)
                 
-                if success:
+                if outcome == SENT:
                     self.stdout.write(self.style.SUCCESS('✓ Protocolo submission successful'))
                     self.stdout.write(f'Response: {json.dumps(response, indent=2, ensure_ascii=False)}')
+                elif outcome == ALREADY_SENT:
+                    self.stdout.write(self.style.WARNING('Protocolo was already submitted to SITAC; nothing sent'))
+                elif outcome == IN_FLIGHT:
+                    self.stdout.write(self.style.WARNING('Protocolo is being submitted by another process; nothing sent'))
                 else:
                     self.stdout.write(self.style.ERROR('✗ Protocolo submission failed'))
                     
@@ -73,4 +80,14 @@ class Command(BaseCommand):
         else:
             self.stdout.write('No protocolo ID provided. Use --protocolo-id to test with a specific protocolo.')
         
+        stats = pool_stats()
+        self.stdout.write(
+            f'Connection pool: {stats["requests"]} requests, {stats["hits"]} reused, '
+            f'{stats["misses"]} new connections (pool size {stats["pool_size"]})'
+        )
+        breaker = sitac_resilience.get_breaker().snapshot()
+        self.stdout.write(
+            f'Circuit breaker: {breaker["state"]} ({breaker["successes"]} ok, '
+            f'{breaker["failures"]} failed, {breaker["rejected"]} rejected)'
+        )
         self.stdout.write(self.style.SUCCESS('SITAC integration test completed.'))
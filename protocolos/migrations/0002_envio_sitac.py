@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 23:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('protocolos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvioSITAC',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('enviado', 'Enviado'), ('erro', 'Erro')], default='pendente', max_length=20, verbose_name='Status')),
+                ('tentativas', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('disponivel_em', models.DateTimeField(default=django.utils.timezone.now, help_text='Momento a partir do qual o envio pode ser (re)processado', verbose_name='Disponível em')),
+                ('ultimo_erro', models.TextField(blank=True, verbose_name='Último erro')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('protocolo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='envios_sitac', to='protocolos.protocolo', verbose_name='Protocolo')),
+            ],
+            options={
+                'verbose_name': 'Envio ao SITAC',
+                'verbose_name_plural': 'Envios ao SITAC',
+                'ordering': ['disponivel_em', 'id'],
+                'indexes': [models.Index(fields=['status', 'disponivel_em'], name='envio_sitac_fila_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 23:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('protocolos', '0002_envio_sitac'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroEnvioSITAC',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload_hash', models.CharField(max_length=64, verbose_name='Hash do payload')),
+                ('payload', models.JSONField(verbose_name='Payload enviado')),
+                ('status', models.CharField(choices=[('enviando', 'Enviando'), ('enviado', 'Enviado'), ('falhou', 'Falhou')], default='enviando', max_length=20, verbose_name='Status')),
+                ('tentativas', models.PositiveIntegerField(default=1, verbose_name='Tentativas')),
+                ('resposta', models.JSONField(blank=True, null=True, verbose_name='Resposta do SITAC')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('protocolo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='registros_sitac', to='protocolos.protocolo', verbose_name='Protocolo')),
+            ],
+            options={
+                'verbose_name': 'Registro de Envio ao SITAC',
+                'verbose_name_plural': 'Registros de Envios ao SITAC',
+                'ordering': ['-criado_em'],
+                'constraints': [models.UniqueConstraint(fields=('protocolo', 'payload_hash'), name='registro_sitac_payload_unico'), models.UniqueConstraint(condition=models.Q(('status__in', ['enviando', 'enviado'])), fields=('protocolo',), name='registro_sitac_envio_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.5 on 2026-10-18 00:09
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Only PostgreSQL gets the trigger and the GIN indexes; other databases keep the
+# (empty) column and protocolos/search.py falls back to icontains.
+
+BUSCA_EXPRESSION = (
+    "setweight(to_tsvector('simple', coalesce({row}numero, '')), 'A') || "
+    "setweight(to_tsvector('portuguese', coalesce({row}observacoes, '')), 'B')"
+)
+
+CREATE_TRIGGER = [
+    f"""
+    CREATE OR REPLACE FUNCTION protocolos_protocolo_busca_trigger() RETURNS trigger AS $$
+    BEGIN
+        NEW.busca := {BUSCA_EXPRESSION.format(row='NEW.')};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS protocolos_protocolo_busca_update ON protocolos_protocolo",
+    """
+    CREATE TRIGGER protocolos_protocolo_busca_update
+        BEFORE INSERT OR UPDATE ON protocolos_protocolo
+        FOR EACH ROW EXECUTE FUNCTION protocolos_protocolo_busca_trigger()
+    """,
+]
+
+# Built without locking writes; the migration is non-atomic for that reason
+CREATE_INDEXES = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS protocolo_busca_gin_idx "
+    "ON protocolos_protocolo USING gin (busca)",
+    # Matches Django's icontains SQL: UPPER("numero"::text) LIKE UPPER(%s)
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS protocolo_numero_trgm_idx "
+    "ON protocolos_protocolo USING gin (UPPER(numero::text) gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS protocolo_cpf_cnpj_trgm_idx "
+    "ON protocolos_protocolo USING gin (cpf_cnpj gin_trgm_ops)",
+]
+
+DROP = [
+    "DROP INDEX CONCURRENTLY IF EXISTS protocolo_cpf_cnpj_trgm_idx",
+    "DROP INDEX CONCURRENTLY IF EXISTS protocolo_numero_trgm_idx",
+    "DROP INDEX CONCURRENTLY IF EXISTS protocolo_busca_gin_idx",
+    "DROP TRIGGER IF EXISTS protocolos_protocolo_busca_update ON protocolos_protocolo",
+    "DROP FUNCTION IF EXISTS protocolos_protocolo_busca_trigger()",
+]
+
+BACKFILL_BATCH = 10000
+
+
+def criar_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CREATE_TRIGGER:
+        schema_editor.execute(sql)
+
+    # Backfill in batches so each UPDATE commits on its own
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT coalesce(max(id), 0) FROM protocolos_protocolo")
+        max_id = cursor.fetchone()[0]
+        for start in range(0, max_id, BACKFILL_BATCH):
+            cursor.execute(
+                f"UPDATE protocolos_protocolo SET busca = {BUSCA_EXPRESSION.format(row='')} "
+                "WHERE id > %s AND id <= %s",
+                [start, start + BACKFILL_BATCH],
+            )
+
+    for sql in CREATE_INDEXES:
+        schema_editor.execute(sql)
+
+
+def remover_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in DROP:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('protocolos', '0003_registro_envio_sitac'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='protocolo',
+            name='busca',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Vetor de busca'),
+        ),
+        migrations.RunPython(criar_busca, remover_busca),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-18 00:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+from protocolos.operations import AddIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('protocolos', '0004_protocolo_busca'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='protocolo',
+            index=models.Index(fields=['-data_emissao', '-criado_em', 'id'], name='protocolo_lista_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='protocolo',
+            index=models.Index(fields=['unidade_crea', '-data_emissao', '-criado_em'], name='protocolo_unidade_lista_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='protocolo',
+            index=models.Index(fields=['tipo', '-data_emissao', '-criado_em'], name='protocolo_tipo_lista_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='protocolo',
+            index=models.Index(fields=['armario', 'prateleira', 'caixa'], name='protocolo_local_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='protocolo',
+            index=models.Index(condition=models.Q(('tipo__in', ['finalistico_pf', 'finalistico_pj']), models.Q(('protocolo_sitac__isnull', True), ('protocolo_sitac', ''), _connector='OR')), fields=['id'], name='protocolo_sitac_pendente_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 00:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+from protocolos.operations import AddIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('protocolos', '0005_protocolo_indices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='protocolo',
+            index=models.Index(fields=['cpf_cnpj'], name='protocolo_cpf_cnpj_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 00:35
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def preencher_estatisticas(apps, schema_editor):
+    Protocolo = apps.get_model('protocolos', 'Protocolo')
+    EstatisticaDiariaProtocolo = apps.get_model('protocolos', 'EstatisticaDiariaProtocolo')
+    linhas = (
+        Protocolo.objects.order_by()
+        .values_list('data_emissao', 'unidade_crea', 'tipo')
+        .annotate(total=Count('pk'))
+    )
+    EstatisticaDiariaProtocolo.objects.bulk_create(
+        [
+            EstatisticaDiariaProtocolo(data=data, unidade_crea=unidade, tipo=tipo, total=total)
+            for data, unidade, tipo, total in linhas
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('protocolos', '0006_protocolo_cpf_cnpj_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaDiariaProtocolo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data de Emissão')),
+                ('unidade_crea', models.CharField(choices=[('sede_palmas', 'SEDE - PALMAS'), ('inspetoria_araguaina', 'INSPETORIA DE ARAGUAÍNA'), ('inspetoria_augustinopolis', 'INSPETORIA DE AUGUSTINÓPOLIS'), ('inspetoria_dianopolis', 'INSPETORIA DE DIANÓPOLIS'), ('inspetoria_guarai', 'INSPETORIA DE GUARAÍ'), ('inspetoria_gurupi', 'INSPETORIA DE GURUPI'), ('inspetoria_paraiso_tocantins', 'INSPETORIA DE PARAÍSO DO TOCANTINS'), ('inspetoria_porto_nacional', 'INSPETORIA DE PORTO NACIONAL')], max_length=30, verbose_name='Unidade CREA-TO')),
+                ('tipo', models.CharField(choices=[('finalistico_pf', 'Processo Finalístico - Pessoa Física'), ('finalistico_pj', 'Processo Finalístico - Pessoa Jurídica'), ('administrativo', 'Processo Administrativo')], max_length=20, verbose_name='Tipo de Processo')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Estatística Diária de Protocolos',
+                'verbose_name_plural': 'Estatísticas Diárias de Protocolos',
+                'ordering': ['-data', 'unidade_crea', 'tipo'],
+                'constraints': [models.UniqueConstraint(fields=('data', 'unidade_crea', 'tipo'), name='estatistica_diaria_unica')],
+            },
+        ),
+        migrations.RunPython(preencher_estatisticas, migrations.RunPython.noop),
+    ]
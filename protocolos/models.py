@@ -1,7 +1,9 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings
 from django.core.validators import RegexValidator
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 import re
 
 class LocalArmazenamento(models.Model):
@@ -229,10 +231,33 @@ class Protocolo(models.Model):
     criado_em = models.DateTimeField("Criado em", auto_now_add=True)
     atualizado_em = models.DateTimeField("Atualizado em", auto_now=True)
 
+    # Vetor de busca textual (número + observações), mantido por trigger no PostgreSQL.
+    # Em outros bancos fica vazio e a busca usa icontains (ver protocolos/search.py).
+    busca = SearchVectorField("Vetor de busca", null=True, editable=False)
+
     class Meta:
         ordering = ["-data_emissao", "-criado_em"]
         verbose_name = "Protocolo"
         verbose_name_plural = "Protocolos"
+        indexes = [
+            # Lista sem filtros, intervalos de data_emissao e paginação por cursor
+            models.Index(fields=['-data_emissao', '-criado_em', 'id'], name='protocolo_lista_idx'),
+            # Filtros por unidade/tipo já na ordem da lista (sem sort)
+            models.Index(fields=['unidade_crea', '-data_emissao', '-criado_em'], name='protocolo_unidade_lista_idx'),
+            models.Index(fields=['tipo', '-data_emissao', '-criado_em'], name='protocolo_tipo_lista_idx'),
+            models.Index(fields=['armario', 'prateleira', 'caixa'], name='protocolo_local_idx'),
+            # Busca exata por CPF/CNPJ (protocolos/search.py)
+            models.Index(fields=['cpf_cnpj'], name='protocolo_cpf_cnpj_idx'),
+            # Finalísticos ainda não enviados ao SITAC (reenviar_sitac percorre por id)
+            models.Index(
+                fields=['id'],
+                name='protocolo_sitac_pendente_idx',
+                condition=(
+                    models.Q(tipo__in=['finalistico_pf', 'finalistico_pj'])
+                    & (models.Q(protocolo_sitac__isnull=True) | models.Q(protocolo_sitac=''))
+                ),
+            ),
+        ]
 
     def __str__(self):
         return f"Protocolo {self.numero} - {self.get_tipo_display()}"
@@ -301,12 +326,174 @@ class Protocolo(models.Model):
     @property
     def cpf_cnpj_formatado(self):
         """Retorna o CPF/CNPJ formatado"""
-        if not self.cpf_cnpj:
-            return "Não informado"
-        
-        cpf_cnpj_limpo = re.sub(r'[^\d]', '', self.cpf_cnpj)
-        if len(cpf_cnpj_limpo) == 11:
-            return f"{cpf_cnpj_limpo[:3]}.{cpf_cnpj_limpo[3:6]}.{cpf_cnpj_limpo[6:9]}-{cpf_cnpj_limpo[9:]}"
-        elif len(cpf_cnpj_limpo) == 14:
-            return f"{cpf_cnpj_limpo[:2]}.{cpf_cnpj_limpo[2:5]}.{cpf_cnpj_limpo[5:8]}/{cpf_cnpj_limpo[8:12]}-{cpf_cnpj_limpo[12:]}"
-        return self.cpf_cnpj
+        return formatar_cpf_cnpj(self.cpf_cnpj)
+
+
+def formatar_cpf_cnpj(cpf_cnpj):
+    """CPF/CNPJ com pontuação; também usado pelas linhas da lista (protocolos/rows.py)"""
+    if not cpf_cnpj:
+        return "Não informado"
+    
+    # Valores gravados já são só dígitos; a regex fica para dados antigos
+    cpf_cnpj_limpo = cpf_cnpj if cpf_cnpj.isdigit() else re.sub(r'[^\d]', '', cpf_cnpj)
+    if len(cpf_cnpj_limpo) == 11:
+        return f"{cpf_cnpj_limpo[:3]}.{cpf_cnpj_limpo[3:6]}.{cpf_cnpj_limpo[6:9]}-{cpf_cnpj_limpo[9:]}"
+    elif len(cpf_cnpj_limpo) == 14:
+        return f"{cpf_cnpj_limpo[:2]}.{cpf_cnpj_limpo[2:5]}.{cpf_cnpj_limpo[5:8]}/{cpf_cnpj_limpo[8:12]}-{cpf_cnpj_limpo[12:]}"
+    return cpf_cnpj
+
+
+class EnvioSITAC(models.Model):
+    """Fila persistente (outbox) de envios de protocolos ao SITAC.
+
+    Cada registro é criado na mesma transação que o Protocolo e é
+    consumido pelo comando ``processar_envios_sitac``.
+    """
+    STATUS_PENDENTE = 'pendente'
+    STATUS_PROCESSANDO = 'processando'
+    STATUS_ENVIADO = 'enviado'
+    STATUS_ERRO = 'erro'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, 'Pendente'),
+        (STATUS_PROCESSANDO, 'Processando'),
+        (STATUS_ENVIADO, 'Enviado'),
+        (STATUS_ERRO, 'Erro'),
+    ]
+
+    protocolo = models.ForeignKey(
+        Protocolo,
+        on_delete=models.CASCADE,
+        related_name='envios_sitac',
+        verbose_name="Protocolo"
+    )
+
+    status = models.CharField(
+        "Status",
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDENTE
+    )
+
+    tentativas = models.PositiveIntegerField("Tentativas", default=0)
+
+    disponivel_em = models.DateTimeField(
+        "Disponível em",
+        default=timezone.now,
+        help_text="Momento a partir do qual o envio pode ser (re)processado"
+    )
+
+    ultimo_erro = models.TextField("Último erro", blank=True)
+
+    criado_em = models.DateTimeField("Criado em", auto_now_add=True)
+    atualizado_em = models.DateTimeField("Atualizado em", auto_now=True)
+
+    class Meta:
+        verbose_name = "Envio ao SITAC"
+        verbose_name_plural = "Envios ao SITAC"
+        ordering = ['disponivel_em', 'id']
+        indexes = [
+            models.Index(fields=['status', 'disponivel_em'], name='envio_sitac_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.protocolo.numero} - {self.get_status_display()}"
+
+
+class RegistroEnvioSITAC(models.Model):
+    """Registro (ledger) do que foi efetivamente enviado ao SITAC.
+
+    Todo envio passa por este registro, identificado pelo protocolo e pelo
+    hash do payload, para que cada protocolo chegue ao SITAC uma única vez.
+    """
+    STATUS_ENVIANDO = 'enviando'
+    STATUS_ENVIADO = 'enviado'
+    STATUS_FALHOU = 'falhou'
+
+    STATUS_CHOICES = [
+        (STATUS_ENVIANDO, 'Enviando'),
+        (STATUS_ENVIADO, 'Enviado'),
+        (STATUS_FALHOU, 'Falhou'),
+    ]
+
+    protocolo = models.ForeignKey(
+        Protocolo,
+        on_delete=models.CASCADE,
+        related_name='registros_sitac',
+        verbose_name="Protocolo"
+    )
+
+    payload_hash = models.CharField("Hash do payload", max_length=64)
+
+    payload = models.JSONField("Payload enviado")
+
+    status = models.CharField(
+        "Status",
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_ENVIANDO
+    )
+
+    tentativas = models.PositiveIntegerField("Tentativas", default=1)
+
+    resposta = models.JSONField("Resposta do SITAC", null=True, blank=True)
+
+    criado_em = models.DateTimeField("Criado em", auto_now_add=True)
+    atualizado_em = models.DateTimeField("Atualizado em", auto_now=True)
+
+    class Meta:
+        verbose_name = "Registro de Envio ao SITAC"
+        verbose_name_plural = "Registros de Envios ao SITAC"
+        ordering = ['-criado_em']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['protocolo', 'payload_hash'],
+                name='registro_sitac_payload_unico'
+            ),
+            # No máximo um envio em andamento ou concluído por protocolo
+            models.UniqueConstraint(
+                fields=['protocolo'],
+                condition=models.Q(status__in=['enviando', 'enviado']),
+                name='registro_sitac_envio_unico'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.protocolo.numero} - {self.get_status_display()} ({self.payload_hash[:12]})"
+
+
+class EstatisticaDiariaProtocolo(models.Model):
+    """Quantidade de protocolos por dia de emissão, unidade e tipo.
+
+    Mantida incrementalmente pelos signals de Protocolo (protocolos/rollup.py)
+    e reconstruída/verificada pelo comando ``estatisticas_diarias``.
+    """
+    data = models.DateField("Data de Emissão")
+
+    unidade_crea = models.CharField(
+        "Unidade CREA-TO",
+        max_length=30,
+        choices=Protocolo.UNIDADE_CHOICES
+    )
+
+    tipo = models.CharField(
+        "Tipo de Processo",
+        max_length=20,
+        choices=Protocolo.TIPO_CHOICES
+    )
+
+    total = models.IntegerField("Total", default=0)
+
+    class Meta:
+        verbose_name = "Estatística Diária de Protocolos"
+        verbose_name_plural = "Estatísticas Diárias de Protocolos"
+        ordering = ['-data', 'unidade_crea', 'tipo']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['data', 'unidade_crea', 'tipo'],
+                name='estatistica_diaria_unica'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.data:%d/%m/%Y} - {self.get_unidade_crea_display()} - {self.get_tipo_display()}: {self.total}"
@@ -0,0 +1,152 @@
+"""
+Paginação por cursor (keyset)
+Cada página é buscada com ``WHERE (chave) após/antes do cursor ORDER BY chave
+LIMIT n+1``, então a página N custa o mesmo que a primeira e não há COUNT(*).
+Os cursores são opacos para o usuário (base64 de JSON com os valores da chave
+da borda da página).
+"""
+import base64
+import binascii
+import datetime
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+
+# Ordem da lista de protocolos; o id desempata registros criados no mesmo instante
+PROTOCOLO_KEYSET = ('-data_emissao', '-criado_em', 'id')
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(value: Any, field) -> Any:
+    """Valor do cursor convertido pelo campo; ValidationError se não for do tipo certo"""
+    if value is not None and not isinstance(value, (str, int, float)):
+        raise ValueError('valor de cursor inválido')
+    return field.to_python(value)
+
+
+def encode_cursor(direction: str, values: Sequence[Any]) -> str:
+    raw = json.dumps([direction, [_encode_value(value) for value in values]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str, fields) -> Tuple[str, List[Any]]:
+    """Retorna (direção, valores); ValueError se o cursor estiver malformado"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, values = json.loads(raw)
+        if direction not in (NEXT, PREVIOUS) or not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError('cursor inválido')
+        return direction, [_decode_value(value, field) for value, field in zip(values, fields)]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError, ValidationError) as e:
+        raise ValueError('cursor inválido') from e
+
+
+class KeysetPage:
+    """Página com a mesma interface usada pelo template para a paginação clássica"""
+
+    def __init__(self, object_list: List, has_next: bool, has_previous: bool, paginator: 'KeysetPaginator'):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.paginator = paginator
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        if not self._has_next or not self.object_list:
+            return None
+        return encode_cursor(NEXT, self.paginator.key(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self) -> Optional[str]:
+        if not self._has_previous or not self.object_list:
+            return None
+        return encode_cursor(PREVIOUS, self.paginator.key(self.object_list[0]))
+
+
+class KeysetPaginator:
+    """
+    Paginação por cursor sobre ``ordering`` (nomes de campos, ``-`` para
+    decrescente). A última chave deve ser única para que não haja empates.
+    """
+
+    def __init__(self, queryset: QuerySet, per_page: int, ordering: Sequence[str] = PROTOCOLO_KEYSET):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.fields = [queryset.model._meta.get_field(name) for name, _ in self.ordering]
+
+    def key(self, obj) -> List[Any]:
+        return [getattr(obj, field.attname) for field in self.fields]
+
+    def _beyond(self, values: Sequence[Any], reverse: bool) -> Q:
+        """
+        Registros estritamente depois de ``values`` na ordenação (antes, se
+        ``reverse``). O intervalo no primeiro campo vem na frente do OR para
+        que o PostgreSQL tenha uma condição de faixa no índice.
+        """
+        name, descending = self.ordering[0]
+        bound = Q(**{f'{name}__{"lte" if descending != reverse else "gte"}': values[0]})
+        condition = Q()
+        for i, (name, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != reverse else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for j, (previous_name, _) in enumerate(self.ordering[:i]):
+                term &= Q(**{previous_name: values[j]})
+            condition |= term
+        return bound & condition
+
+    def _order_by(self, reverse: bool) -> List[str]:
+        return [('-' if descending != reverse else '') + name for name, descending in self.ordering]
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        """Página depois/antes do ``cursor``; cursor vazio ou inválido retorna a primeira página"""
+        direction, values = NEXT, None
+        if cursor:
+            try:
+                direction, values = decode_cursor(cursor, self.fields)
+            except ValueError:
+                direction, values = NEXT, None
+
+        reverse = direction == PREVIOUS
+        qs = self.queryset.order_by(*self._order_by(reverse))
+        if values is not None:
+            qs = qs.filter(self._beyond(values, reverse))
+        rows = list(qs[:self.per_page + 1])
+        if values is not None and not rows:
+            # Cursor antigo ou além do fim (registros excluídos): volta para a primeira página
+            return self.page()
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if reverse:
+            rows.reverse()
+            return KeysetPage(rows, has_next=True, has_previous=more, paginator=self)
+        return KeysetPage(rows, has_next=more, has_previous=values is not None, paginator=self)
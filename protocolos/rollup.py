@@ -0,0 +1,107 @@
+"""
+Estatísticas diárias de protocolos (rollup)
+Uma linha de EstatisticaDiariaProtocolo por (data_emissao, unidade_crea,
+tipo) com a quantidade de protocolos. Os signals de Protocolo ajustam a
+linha afetada a cada criação, exclusão ou troca de unidade/tipo, então
+séries temporais leem algumas centenas de linhas em vez de agrupar o
+arquivo inteiro.
+
+Gravações que não disparam signals (update()/bulk_create) devem chamar
+``ajustar``/``reconstruir``; ``divergencias`` compara o rollup com uma
+agregação direta e é usado pelo comando ``estatisticas_diarias``.
+"""
+import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import EstatisticaDiariaProtocolo, Protocolo
+
+Chave = Tuple[datetime.date, str, str]
+
+CAMPOS_CHAVE = ('data_emissao', 'unidade_crea', 'tipo')
+
+
+def chave(protocolo: Protocolo) -> Optional[Chave]:
+    """(data_emissao, unidade_crea, tipo) do protocolo; None se algum campo não foi carregado"""
+    valores = tuple(protocolo.__dict__.get(campo) for campo in CAMPOS_CHAVE)
+    return None if None in valores else valores
+
+
+def ajustar(chave: Chave, delta: int) -> None:
+    """Soma ``delta`` ao total do dia/unidade/tipo, criando a linha se preciso"""
+    if not delta:
+        return
+    data, unidade_crea, tipo = chave
+    linhas = EstatisticaDiariaProtocolo.objects.filter(data=data, unidade_crea=unidade_crea, tipo=tipo)
+    if linhas.update(total=F('total') + delta):
+        return
+    try:
+        with transaction.atomic():
+            EstatisticaDiariaProtocolo.objects.create(data=data, unidade_crea=unidade_crea, tipo=tipo, total=delta)
+    except IntegrityError:
+        # Outra transação criou a linha entre o update e o insert
+        linhas.update(total=F('total') + delta)
+
+
+def ajustar_varios(chaves: Iterable[Chave], delta: int = 1) -> None:
+    """``ajustar`` agrupado, para cargas em lote (bulk_create não dispara signals)"""
+    contagem: Dict[Chave, int] = {}
+    for item in chaves:
+        contagem[item] = contagem.get(item, 0) + delta
+    for item, total in contagem.items():
+        ajustar(item, total)
+
+
+def contagem_real() -> Dict[Chave, int]:
+    """Totais agregados direto de Protocolo (varre a tabela)"""
+    linhas = (
+        Protocolo.objects.order_by()
+        .values_list(*CAMPOS_CHAVE)
+        .annotate(total=Count('pk'))
+    )
+    return {(data, unidade, tipo): total for data, unidade, tipo, total in linhas}
+
+
+def contagem_rollup() -> Dict[Chave, int]:
+    linhas = EstatisticaDiariaProtocolo.objects.exclude(total=0).values_list('data', 'unidade_crea', 'tipo', 'total')
+    return {(data, unidade, tipo): total for data, unidade, tipo, total in linhas}
+
+
+def divergencias() -> List[Tuple[Chave, int, int]]:
+    """(chave, total no rollup, total real) de cada linha que não confere"""
+    rollup, real = contagem_rollup(), contagem_real()
+    return sorted(
+        (item, rollup.get(item, 0), real.get(item, 0))
+        for item in rollup.keys() | real.keys()
+        if rollup.get(item, 0) != real.get(item, 0)
+    )
+
+
+@transaction.atomic
+def reconstruir() -> int:
+    """Recria o rollup a partir de Protocolo; devolve o número de linhas"""
+    EstatisticaDiariaProtocolo.objects.all().delete()
+    linhas = [
+        EstatisticaDiariaProtocolo(data=data, unidade_crea=unidade, tipo=tipo, total=total)
+        for (data, unidade, tipo), total in contagem_real().items()
+    ]
+    EstatisticaDiariaProtocolo.objects.bulk_create(linhas, batch_size=1000)
+    return len(linhas)
+
+
+def serie_diaria(
+    inicio: datetime.date,
+    fim: datetime.date,
+    unidade_crea: Optional[str] = None,
+    tipo: Optional[str] = None,
+) -> List[Tuple[datetime.date, int]]:
+    """[(data, total)] dos dias com protocolos entre ``inicio`` e ``fim``, inclusive"""
+    linhas = EstatisticaDiariaProtocolo.objects.filter(data__gte=inicio, data__lte=fim)
+    if unidade_crea:
+        linhas = linhas.filter(unidade_crea=unidade_crea)
+    if tipo:
+        linhas = linhas.filter(tipo=tipo)
+    serie = linhas.order_by('data').values('data').annotate(soma=Sum('total')).filter(soma__gt=0)
+    return [(linha['data'], linha['soma']) for linha in serie]
@@ -0,0 +1,66 @@
+"""
+Linhas leves da lista de protocolos
+A lista mostra poucas colunas, então busca só essas colunas (sem
+``observacoes``, ``busca`` etc.) com ``values_list(named=True)`` e monta uma
+linha com os textos de exibição já calculados, sem criar instâncias de
+Protocolo. As linhas têm ``id``/``data_emissao``/``criado_em``, então a
+paginação por cursor continua funcionando sobre elas.
+"""
+from dataclasses import dataclass
+import datetime
+from typing import Iterable, List, Optional
+
+from django.db.models import QuerySet
+
+from .models import Protocolo, formatar_cpf_cnpj
+
+LIST_FIELDS = (
+    'id', 'numero', 'tipo', 'cpf_cnpj', 'unidade_crea', 'armario', 'prateleira',
+    'caixa', 'data_emissao', 'criado_em', 'protocolo_sitac', 'criado_por_id',
+)
+
+TIPO_DISPLAY = dict(Protocolo.TIPO_CHOICES)
+UNIDADE_DISPLAY = dict(Protocolo.UNIDADE_CHOICES)
+
+
+@dataclass(frozen=True, slots=True)
+class ProtocoloRow:
+    id: int
+    numero: str
+    tipo: str
+    tipo_display: str
+    cpf_cnpj_formatado: str
+    unidade_crea_display: str
+    local: str  # "A1 - P2 - C3", vazio se incompleto
+    data_emissao: datetime.date
+    criado_em: datetime.datetime
+    protocolo_sitac: Optional[str]
+    criado_por_id: Optional[int]
+
+    @property
+    def pk(self) -> int:
+        return self.id
+
+
+def project(qs: QuerySet) -> QuerySet:
+    """Mesmo filtro e ordenação de ``qs``, buscando só as colunas da lista"""
+    return qs.values_list(*LIST_FIELDS, named=True)
+
+
+def build_rows(values: Iterable) -> List[ProtocoloRow]:
+    rows = []
+    for v in values:
+        rows.append(ProtocoloRow(
+            id=v.id,
+            numero=v.numero,
+            tipo=v.tipo,
+            tipo_display=TIPO_DISPLAY.get(v.tipo, v.tipo),
+            cpf_cnpj_formatado=formatar_cpf_cnpj(v.cpf_cnpj),
+            unidade_crea_display=UNIDADE_DISPLAY.get(v.unidade_crea, v.unidade_crea),
+            local=f"A{v.armario} - P{v.prateleira} - C{v.caixa}" if v.armario and v.prateleira and v.caixa else "",
+            data_emissao=v.data_emissao,
+            criado_em=v.criado_em,
+            protocolo_sitac=v.protocolo_sitac,
+            criado_por_id=v.criado_por_id,
+        ))
+    return rows
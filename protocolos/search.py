@@ -0,0 +1,120 @@
+"""
+Busca textual de protocolos
+Usada pelo filtro ``q`` da lista. Antes da busca textual, ``classify_query``
+reconhece os formatos mais comuns e os resolve com igualdade/prefixo em um
+índice B-tree:
+
+- ``PROT-123`` / ``PROT-123-4-2-7`` (identificador_local): chave primária
+- 11 ou 14 dígitos, com ou sem pontuação: CPF/CNPJ (ou número idêntico)
+- uma palavra com dígitos: prefixo do número; se nada começar assim, segue
+  para a busca textual, já que o número é livre e o formato é ambíguo
+
+A busca textual usa, no PostgreSQL, os índices da migração 0004:
+
+- número: trigramas sobre UPPER(numero) (icontains)
+- CPF/CNPJ: trigramas sobre cpf_cnpj, comparando apenas os dígitos digitados
+- observações: vetor ``busca`` (configuração portuguese) com índice GIN
+- armário/prateleira/caixa: igualdade (valores curtos demais para trigramas)
+
+Em outros bancos (SQLite nos testes) as observações usam icontains.
+Os resultados recebem a anotação ``relevancia`` e são ordenados por ela.
+"""
+import re
+from typing import Tuple
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, QuerySet, Value, When
+from django.db.models.functions import Coalesce
+
+SEARCH_CONFIG = 'portuguese'
+
+# Trigramas só ajudam a partir de 3 caracteres
+MIN_TRIGRAM_LENGTH = 3
+
+# Números mais curtos que isso costumam ser armário/prateleira/caixa
+MIN_NUMERO_LENGTH = 4
+
+IDENTIFICADOR = 'identificador'
+CPF_CNPJ = 'cpf_cnpj'
+NUMERO = 'numero'
+TEXTO = 'texto'
+
+IDENTIFICADOR_LOCAL = re.compile(r'PROT-(\d{1,18})(?:-[^-\s]+-[^-\s]+-[^-\s]+)?', re.IGNORECASE)
+DOCUMENTO = re.compile(r'[\d.\-/\s]+')
+
+
+def is_postgresql(qs: QuerySet) -> bool:
+    return connections[qs.db].vendor == 'postgresql'
+
+
+def classify_query(q: str) -> Tuple[str, str]:
+    """(formato, valor) de uma busca: IDENTIFICADOR, CPF_CNPJ, NUMERO ou TEXTO"""
+    match = IDENTIFICADOR_LOCAL.fullmatch(q)
+    if match:
+        return IDENTIFICADOR, match.group(1)
+    if DOCUMENTO.fullmatch(q):
+        digitos = re.sub(r'\D', '', q)
+        if len(digitos) in (11, 14):
+            return CPF_CNPJ, digitos
+    if (
+        len(q) >= MIN_NUMERO_LENGTH
+        and not any(c.isspace() for c in q)
+        and any(c.isdigit() for c in q)
+    ):
+        return NUMERO, q
+    return TEXTO, q
+
+
+def search_protocolos(qs: QuerySet, q: str) -> QuerySet:
+    """Filtra ``qs`` pelo texto ``q`` e ordena por relevância"""
+    q = q.strip()
+    if not q:
+        return qs
+    formato, valor = classify_query(q)
+
+    # Igualdades: o número também entra porque é livre (pode ser só dígitos)
+    if formato == IDENTIFICADOR:
+        return _exato(qs, Q(pk=int(valor)) | Q(numero=q), q)
+    if formato == CPF_CNPJ:
+        return _exato(qs, Q(cpf_cnpj=valor) | Q(numero=q), q)
+    if formato == NUMERO:
+        por_prefixo = Q(numero__startswith=valor)
+        if qs.filter(por_prefixo).exists():
+            return _exato(qs, por_prefixo, valor)
+    return _busca_textual(qs, q)
+
+
+def _exato(qs: QuerySet, filtro: Q, numero: str) -> QuerySet:
+    relevancia = Case(When(numero=numero, then=Value(2.0)), default=Value(1.0), output_field=FloatField())
+    return qs.filter(filtro).annotate(relevancia=relevancia).order_by(
+        '-relevancia', *qs.model._meta.ordering
+    )
+
+
+def _busca_textual(qs: QuerySet, q: str) -> QuerySet:
+    digitos = re.sub(r'\D', '', q)
+    postgresql = is_postgresql(qs)
+
+    filtro = Q(numero__icontains=q)
+    if len(digitos) >= MIN_TRIGRAM_LENGTH:
+        filtro |= Q(cpf_cnpj__contains=digitos)
+    if q.isdigit():
+        filtro |= Q(armario=q) | Q(prateleira=q) | Q(caixa=q)
+
+    relevancia = [When(numero__iexact=q, then=Value(4.0))]
+    if digitos:
+        relevancia.append(When(cpf_cnpj=digitos, then=Value(3.0)))
+    relevancia.append(When(numero__istartswith=q, then=Value(2.0)))
+    relevancia = Case(*relevancia, default=Value(1.0), output_field=FloatField())
+
+    if postgresql:
+        query = SearchQuery(q, config=SEARCH_CONFIG, search_type='websearch')
+        filtro |= Q(busca=query)
+        relevancia = relevancia + Coalesce(SearchRank(F('busca'), query), Value(0.0))
+    else:
+        filtro |= Q(observacoes__icontains=q)
+
+    return qs.filter(filtro).annotate(relevancia=relevancia).order_by(
+        '-relevancia', *qs.model._meta.ordering
+    )
@@ -1,23 +1,51 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
 
-from .models import Protocolo
-from .sitac_service import SITACService
+from .caching import invalidate
+from .models import Documento, Protocolo
+from .rollup import ajustar, chave
+from .sitac_outbox import enqueue_protocolo
 
 
 @receiver(post_save, sender=Protocolo)
-def submit_protocolo_to_sitac_on_create(sender, instance: Protocolo, created: bool, **kwargs):
-    # Only submit on create and only for finalistic types
-    if not created:
-        return
-    if instance.tipo not in ('finalistico_pf', 'finalistico_pj'):
+def enqueue_protocolo_for_sitac(sender, instance: Protocolo, created: bool, raw: bool = False, **kwargs):
+    # Single entry point for SITAC submissions: the outbox worker sends the
+    # protocolo through the ledger, which skips anything already accepted
+    # and payloads that did not change.
+    if raw:
         return
+    enqueue_protocolo(instance)
+
+
+@receiver(post_save, sender=Protocolo)
+@receiver(post_delete, sender=Protocolo)
+@receiver(post_save, sender=Documento)
+@receiver(post_delete, sender=Documento)
+def invalidate_protocolo_pages(sender, **kwargs):
+    # New data version: cached list/detail pages and facet counts stop being served
+    invalidate()
 
-    sitac_service = SITACService()
-    data = sitac_service.create_protocolo_data(instance)
-    success, response = sitac_service.submit_protocolo(data)
-    if success and response and 'protocolo' in response:
-        # Save SITAC protocol number if returned
-        Protocolo.objects.filter(pk=instance.pk).update(protocolo_sitac=response['protocolo'])
+
+@receiver(post_init, sender=Protocolo)
+def remember_rollup_key(sender, instance: Protocolo, **kwargs):
+    # Day/unidade/tipo as loaded, to move the count when a save changes them
+    instance._rollup_key = chave(instance)
+
+
+@receiver(post_save, sender=Protocolo)
+def update_daily_rollup(sender, instance: Protocolo, created: bool, **kwargs):
+    nova, antiga = chave(instance), instance._rollup_key
+    if created:
+        ajustar(nova, 1)
+    elif antiga and nova and antiga != nova:
+        # Deferred key fields (only()/defer()) leave antiga unknown; verify/rebuild covers those
+        ajustar(antiga, -1)
+        ajustar(nova, 1)
+    instance._rollup_key = nova
 
 
+@receiver(post_delete, sender=Protocolo)
+def remove_from_daily_rollup(sender, instance: Protocolo, **kwargs):
+    chave_atual = instance._rollup_key or chave(instance)
+    if chave_atual:
+        ajustar(chave_atual, -1)
@@ -0,0 +1,291 @@
+"""
+SITAC Async Client
+asyncio counterpart of SITACService for ASGI views and async workers.
+Requests go through one pooled httpx.AsyncClient per event loop and a
+per-loop semaphore bounds how many submissions are in flight, so a single
+loop can keep hundreds of submissions waiting on SITAC without a thread each.
+Breaker, adaptive timeouts, token cache and ledger are shared with the
+sync client.
+"""
+import asyncio
+import json
+import logging
+import time
+import weakref
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import sitac_metrics, sitac_resilience
+from .sitac_bulk import BulkResult, RateLimiter
+from .sitac_ledger import begin_submission, finish_submission
+from .sitac_service import SITACService
+from .sitac_transport import DEFAULT_HEADERS, get_timeout
+
+logger = logging.getLogger(__name__)
+
+# httpx clients and asyncio primitives belong to the loop that created them
+_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]' = weakref.WeakKeyDictionary()
+_semaphores: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[asyncio.Semaphore, int]]' = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Pooled keep-alive client shared by every AsyncSITACService on the running loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        pool_size = getattr(settings, 'SITAC_ASYNC_POOL_SIZE', 100)
+        connect_timeout, read_timeout = get_timeout()
+        client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+        _clients[loop] = client
+    return client
+
+
+def get_semaphore(at_least: int = 0) -> asyncio.Semaphore:
+    """
+    Bounds SITAC submissions in flight on the running loop: SITAC_ASYNC_CONCURRENCY,
+    raised to ``at_least`` when a caller such as asubmit_many() asks for more
+    """
+    loop = asyncio.get_running_loop()
+    semaphore, size = _semaphores.get(loop, (None, 0))
+    if semaphore is None:
+        size = getattr(settings, 'SITAC_ASYNC_CONCURRENCY', 100)
+        semaphore = asyncio.Semaphore(size)
+    for _ in range(at_least - size):
+        semaphore.release()
+    _semaphores[loop] = (semaphore, max(size, at_least))
+    return semaphore
+
+
+async def close_async_client() -> None:
+    """Close the running loop's client; call before the loop shuts down"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def _call(
+    endpoint: str,
+    send: Callable[[float], Awaitable[httpx.Response]],
+    idempotent: bool,
+) -> httpx.Response:
+    """sitac_resilience.call() for coroutines, with the same retry rules"""
+    attempts = sitac_resilience.Attempts(endpoint, idempotent)
+    while True:
+        with attempts.attempt() as read_timeout:
+            try:
+                response = await send(read_timeout)
+            except httpx.TransportError as e:
+                if not attempts.failed(isinstance(e, httpx.ConnectTimeout)):
+                    raise
+            else:
+                if not attempts.responded(response.status_code):
+                    return response
+        await asyncio.sleep(attempts.next_delay())
+
+
+class AsyncSITACService:
+    """Async service class for SITAC integration, mirroring SITACService"""
+
+    def __init__(self):
+        # Credentials, payload building and the token manager come from the sync client
+        self.sync_service = SITACService()
+        self.base_url = self.sync_service.base_url
+        self.token_manager = self.sync_service.token_manager
+        self.timeout = get_timeout()
+
+    async def _post(self, endpoint: str, headers: Dict[str, str], idempotent: bool, **kwargs) -> httpx.Response:
+        url = f"{self.base_url}{endpoint}"
+        client = get_async_client()
+        connect_timeout = self.timeout[0]
+        return await _call(
+            endpoint,
+            sitac_metrics.ainstrument(endpoint, lambda read_timeout: client.post(
+                url, headers=headers, timeout=httpx.Timeout(read_timeout, connect=connect_timeout), **kwargs
+            )),
+            idempotent=idempotent,
+        )
+
+    async def login(self) -> Tuple[bool, Optional[Dict]]:
+        """
+        Authenticate with SITAC and get access token
+        Returns: (success, token_data)
+        """
+        try:
+            logger.info(f"SITAC async login attempt to: {self.base_url}/auth/login")
+            response = await self._post('/auth/login', self.sync_service._get_auth_headers(), idempotent=True)
+            if response.status_code == 403:
+                logger.error("SITAC returned 403 Forbidden - check credentials")
+                return False, None
+            response.raise_for_status()
+
+            token_data = response.json()
+            await self.token_manager.astore(token_data)
+            logger.info("SITAC async login successful")
+            return True, token_data
+
+        except (httpx.HTTPError, sitac_resilience.CircuitOpenError) as e:
+            logger.error(f"SITAC async login failed: {str(e)}")
+            return False, None
+        except Exception as e:
+            logger.error(f"Unexpected error during SITAC async login: {str(e)}")
+            return False, None
+
+    async def refresh_token(self, refresh_token: str) -> Tuple[bool, Optional[Dict]]:
+        """
+        Refresh access token using refresh token
+        Returns: (success, token_data)
+        """
+        try:
+            headers = self.sync_service._get_bearer_headers(refresh_token)
+            response = await self._post('/auth/refresh-token', headers, idempotent=True)
+            response.raise_for_status()
+
+            token_data = response.json()
+            await self.token_manager.astore(token_data)
+            logger.info("SITAC async token refresh successful")
+            return True, token_data
+
+        except (httpx.HTTPError, sitac_resilience.CircuitOpenError) as e:
+            logger.error(f"SITAC async token refresh failed: {str(e)}")
+            return False, None
+        except Exception as e:
+            logger.error(f"Unexpected error during SITAC async token refresh: {str(e)}")
+            return False, None
+
+    async def get_valid_token(self) -> Optional[str]:
+        """Get a valid access token from the cache shared with SITACService"""
+        return await self.token_manager.aget_token()
+
+    async def submit_protocolo(self, protocolo_data: Dict) -> Tuple[bool, Optional[Dict]]:
+        """
+        Submit protocolo to SITAC
+        Waits for a slot on the loop's semaphore first.
+        Returns: (success, response_data)
+        """
+        async with get_semaphore():
+            try:
+                access_token = await self.get_valid_token()
+                if not access_token:
+                    logger.error("Could not obtain valid SITAC access token")
+                    return False, None
+
+                headers = self.sync_service._get_bearer_headers(access_token)
+                # Same bytes as SITACService sends
+                body = json.dumps(protocolo_data, allow_nan=False).encode('utf-8')
+                sitac_metrics.observe_payload('/protocolo/saveProtocolo', len(body))
+
+                # Not idempotent: only retried when the request never reached SITAC
+                response = await self._post(
+                    '/protocolo/saveProtocolo',
+                    headers,
+                    idempotent=False,
+                    content=body,
+                )
+                if response.status_code == 401:
+                    await self.token_manager.ainvalidate()
+                if response.is_error:
+                    logger.error(
+                        "SITAC submission error %s | payload=%s | response=%s",
+                        response.status_code,
+                        json.dumps(protocolo_data, ensure_ascii=False),
+                        response.text,
+                    )
+                response.raise_for_status()
+
+                response_data = response.json()
+                logger.info(f"SITAC protocolo submission successful: {response_data}")
+                return True, response_data
+
+            except (httpx.HTTPError, sitac_resilience.CircuitOpenError) as e:
+                logger.error(f"SITAC protocolo submission failed: {str(e)}")
+                return False, None
+            except Exception as e:
+                logger.error(f"Unexpected error during SITAC protocolo submission: {str(e)}")
+                return False, None
+
+    async def create_protocolo_data(self, protocolo) -> Dict:
+        """
+        Create SITAC protocolo data from Django Protocolo model
+        Runs SITACService.create_protocolo_data() in a thread, since it may
+        load the documentos.
+        """
+        return await sync_to_async(self.sync_service.create_protocolo_data)(protocolo)
+
+
+async def asubmit_once(
+    protocolo,
+    sitac_service: Optional[AsyncSITACService] = None,
+    protocolo_data: Optional[Dict] = None,
+) -> Tuple[str, Optional[Dict]]:
+    """
+    sitac_ledger.submit_once() for coroutines: the ledger work runs in a
+    thread, the HTTP call on the event loop.
+    Returns: (outcome, response_data)
+    """
+    sitac_service = sitac_service or AsyncSITACService()
+    outcome, registro, protocolo_data = await sync_to_async(begin_submission)(
+        protocolo, sitac_service.sync_service.create_protocolo_data, protocolo_data
+    )
+    if outcome:
+        return outcome, None
+
+    success, response = await sitac_service.submit_protocolo(protocolo_data)
+    return await sync_to_async(finish_submission)(protocolo, registro, success, response)
+
+
+async def asubmit_many(
+    protocolos: Iterable,
+    concurrency: int = 100,
+    rate: float = 0,
+    sitac_service: Optional[AsyncSITACService] = None,
+    result: Optional[BulkResult] = None,
+    limiter: Optional[RateLimiter] = None,
+    on_done: Optional[Callable] = None,
+) -> BulkResult:
+    """
+    sitac_bulk.submit_many() on one event loop: up to ``concurrency``
+    submissions in flight (the loop's semaphore is raised to match if
+    SITAC_ASYNC_CONCURRENCY is lower). Items may be protocolos or (protocolo, protocolo_data)
+    pairs as yielded by SITACService.iter_protocolo_data().
+    ``on_done(protocolo, outcome)`` is called after each one.
+    """
+    sitac_service = sitac_service or AsyncSITACService()
+    limiter = limiter or RateLimiter(rate)
+    result = result or BulkResult()
+    slots = asyncio.Semaphore(concurrency)
+    get_semaphore(concurrency)
+
+    async def work(protocolo, protocolo_data):
+        try:
+            await limiter.aacquire()
+            start = time.monotonic()
+            try:
+                outcome, _ = await asubmit_once(protocolo, sitac_service, protocolo_data)
+            except Exception as e:
+                logger.exception(f"SITAC bulk: unexpected error on protocolo {protocolo.pk}: {str(e)}")
+                outcome = 'error'
+            result.record(outcome, time.monotonic() - start)
+            if on_done:
+                on_done(protocolo, outcome)
+        finally:
+            slots.release()
+
+    tasks = set()
+    for item in protocolos:
+        protocolo, protocolo_data = item if isinstance(item, tuple) else (item, None)
+        await slots.acquire()
+        task = asyncio.create_task(work(protocolo, protocolo_data))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+    result.finished = time.monotonic()
+    return result
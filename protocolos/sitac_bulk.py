@@ -0,0 +1,149 @@
+"""
+SITAC Bulk Submission
+Helpers for submitting many protocolos concurrently: a client-side rate
+limiter and a bounded thread pool runner built on the submission ledger.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from django.db import connection
+
+from .sitac_ledger import submit_once
+from .sitac_service import SITACService
+from .utils import percentile
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing ``rate`` calls per second (0 disables)"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(int(rate), 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Take a token if available; otherwise return how long to wait for one"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self) -> None:
+        """acquire() for coroutines: waits without blocking the event loop"""
+        if self.rate <= 0:
+            return
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class BulkResult:
+    """Outcome counters and latencies collected by submit_many()"""
+
+    def __init__(self):
+        self.outcomes: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.started = time.monotonic()
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def record(self, outcome: str, latency: float) -> None:
+        with self.lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            self.latencies.append(latency)
+
+    @property
+    def total(self) -> int:
+        return sum(self.outcomes.values())
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        return self.total / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> Dict:
+        return {
+            'total': self.total,
+            'outcomes': dict(self.outcomes),
+            'elapsed': self.elapsed,
+            'throughput': self.throughput,
+            'p50': percentile(self.latencies, 50),
+            'p95': percentile(self.latencies, 95),
+            'p99': percentile(self.latencies, 99),
+        }
+
+
+def submit_many(
+    protocolos: Iterable,
+    concurrency: int = 4,
+    rate: float = 0,
+    sitac_service: Optional[SITACService] = None,
+    on_done: Optional[Callable] = None,
+    result: Optional[BulkResult] = None,
+    limiter: Optional[RateLimiter] = None,
+) -> BulkResult:
+    """
+    Submit protocolos through the ledger using a bounded thread pool.
+    Items may be protocolos or (protocolo, protocolo_data) pairs as yielded
+    by SITACService.iter_protocolo_data(), which skips building the payload
+    again in the worker.
+    ``on_done(protocolo, outcome)`` is called from the worker thread after each one.
+    At most ``concurrency * 2`` submissions are queued at once, so the
+    iterable is consumed lazily. Pass ``result`` and ``limiter`` to share
+    counters and the rate limit across several calls.
+    """
+    sitac_service = sitac_service or SITACService()
+    limiter = limiter or RateLimiter(rate)
+    result = result or BulkResult()
+    slots = threading.BoundedSemaphore(concurrency * 2)
+
+    def work(protocolo, protocolo_data):
+        try:
+            limiter.acquire()
+            start = time.monotonic()
+            try:
+                outcome, _ = submit_once(protocolo, sitac_service, protocolo_data)
+            except Exception as e:
+                logger.exception(f"SITAC bulk: unexpected error on protocolo {protocolo.pk}: {str(e)}")
+                outcome = 'error'
+            result.record(outcome, time.monotonic() - start)
+            if on_done:
+                on_done(protocolo, outcome)
+        finally:
+            connection.close()
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='sitac-bulk') as executor:
+        for item in protocolos:
+            protocolo, protocolo_data = item if isinstance(item, tuple) else (item, None)
+            slots.acquire()
+            executor.submit(work, protocolo, protocolo_data)
+
+    result.finished = time.monotonic()
+    return result
@@ -0,0 +1,183 @@
+"""
+Fake SITAC Server
+Local stand-in for the SITAC webservice implementing /auth/login,
+/auth/refresh-token and /protocolo/saveProtocolo with the JSON shapes
+SITACService expects, plus configurable latency, error rate and token
+expiry. Used by the ``sitac_fake`` and ``benchmark_sitac`` commands.
+"""
+import base64
+import json
+import math
+import random
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+
+
+@dataclass
+class FakeSITACConfig:
+    latency_ms: float = 50.0            # mean latency per request
+    latency_distribution: str = 'fixed'  # fixed | uniform | lognormal
+    latency_jitter: float = 0.5          # spread: +-fraction (uniform) or sigma (lognormal)
+    error_rate: float = 0.0              # fraction of requests answered with error_status
+    error_status: int = 503
+    token_ttl: int = 1800                # expires_in returned by login/refresh
+    username: str = ''                   # when set, login requires these credentials
+    password: str = ''
+
+    def sample_latency(self) -> float:
+        """Latency in seconds for one request"""
+        mean = self.latency_ms / 1000.0
+        if mean <= 0:
+            return 0.0
+        if self.latency_distribution == 'uniform':
+            return random.uniform(mean * (1 - self.latency_jitter), mean * (1 + self.latency_jitter))
+        if self.latency_distribution == 'lognormal':
+            # lognormal with the requested mean: mu = ln(mean) - sigma^2 / 2
+            sigma = self.latency_jitter
+            return random.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma)
+        return mean
+
+
+class FakeSITACServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog: load tests open many connections at once
+
+    def __init__(self, address, config: Optional[FakeSITACConfig] = None):
+        super().__init__(address, FakeSITACHandler)
+        self.config = config or FakeSITACConfig()
+        self.lock = threading.Lock()
+        self.access_tokens: Dict[str, float] = {}
+        self.refresh_tokens: Dict[str, float] = {}
+        self.sequence = 0
+        self.stats = {'login': 0, 'refresh': 0, 'save': 0, 'errors': 0, 'unauthorized': 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/app/webservices"
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.stats[key] += 1
+
+    def issue_token(self) -> Dict:
+        now = time.time()
+        access_token = secrets.token_hex(16)
+        refresh_token = secrets.token_hex(16)
+        with self.lock:
+            self.access_tokens[access_token] = now + self.config.token_ttl
+            self.refresh_tokens[refresh_token] = now + self.config.token_ttl * 2
+        return {
+            'access_token': access_token,
+            'refresh_token': refresh_token,
+            'token_type': 'bearer',
+            'expires_in': self.config.token_ttl,
+        }
+
+    def token_valid(self, token: str, refresh: bool = False) -> bool:
+        tokens = self.refresh_tokens if refresh else self.access_tokens
+        with self.lock:
+            expires_at = tokens.get(token)
+        return bool(expires_at and expires_at > time.time())
+
+    def next_protocolo(self) -> str:
+        with self.lock:
+            self.sequence += 1
+            sequence = self.sequence
+        return f"{time.strftime('%Y')}/{sequence:06d}"
+
+    def start_in_thread(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name='sitac-fake', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class FakeSITACHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real webservice
+    disable_nagle_algorithm = True  # headers and body are written separately
+    server: FakeSITACServer
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, data: Dict) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _bearer(self) -> str:
+        authorization = self.headers.get('Authorization', '')
+        return authorization[7:] if authorization.startswith('Bearer ') else ''
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+        config = self.server.config
+
+        time.sleep(config.sample_latency())
+
+        if config.error_rate and random.random() < config.error_rate:
+            self.server.count('errors')
+            self._send_json(config.error_status, {'message': 'Erro simulado pelo SITAC local'})
+            return
+
+        if self.path.endswith('/auth/login'):
+            self._login()
+        elif self.path.endswith('/auth/refresh-token'):
+            self._refresh()
+        elif self.path.endswith('/protocolo/saveProtocolo'):
+            self._save(raw_body)
+        else:
+            self._send_json(404, {'message': 'Endpoint não encontrado'})
+
+    def _login(self):
+        config = self.server.config
+        authorization = self.headers.get('Authorization', '')
+        if not authorization.startswith('Basic '):
+            self._send_json(403, {'message': 'Credenciais ausentes'})
+            return
+        if config.username:
+            credentials = base64.b64decode(authorization[6:]).decode('utf-8')
+            if credentials != f"{config.username}:{config.password}":
+                self._send_json(403, {'message': 'Credenciais inválidas'})
+                return
+        self.server.count('login')
+        self._send_json(200, self.server.issue_token())
+
+    def _refresh(self):
+        if not self.server.token_valid(self._bearer(), refresh=True):
+            self.server.count('unauthorized')
+            self._send_json(401, {'message': 'Refresh token inválido ou expirado'})
+            return
+        self.server.count('refresh')
+        self._send_json(200, self.server.issue_token())
+
+    def _save(self, raw_body: bytes):
+        if not self.server.token_valid(self._bearer()):
+            self.server.count('unauthorized')
+            self._send_json(401, {'message': 'Token inválido ou expirado'})
+            return
+        try:
+            data = json.loads(raw_body or b'{}')
+        except ValueError:
+            self._send_json(400, {'message': 'JSON inválido'})
+            return
+        missing = [key for key in ('interessados', 'assunto', 'data_emissao', 'descricao', 'despachos') if key not in data]
+        if missing:
+            self._send_json(422, {'message': f"Campos obrigatórios ausentes: {', '.join(missing)}"})
+            return
+        self.server.count('save')
+        self._send_json(200, {'protocolo': self.server.next_protocolo(), 'message': 'Protocolo cadastrado'})
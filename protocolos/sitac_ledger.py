@@ -0,0 +1,167 @@
+"""
+SITAC Submission Ledger
+Every submission to SITAC goes through submit_once(), which records the
+payload hash per protocolo so the same protocolo is never sent twice.
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import invalidate
+from .models import Protocolo, RegistroEnvioSITAC
+from .sitac_service import SITACService
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of submit_once()
+SENT = 'sent'                  # SITAC accepted the protocolo now
+ALREADY_SENT = 'already_sent'  # protocolo had already been accepted; nothing sent
+IN_FLIGHT = 'in_flight'        # another worker is submitting this protocolo; nothing sent
+FAILED = 'failed'              # submission attempted and failed; may be retried
+
+
+def _claim_timeout() -> int:
+    return getattr(settings, 'SITAC_LEDGER_CLAIM_TIMEOUT', 600)
+
+
+def payload_hash(protocolo_data: Dict) -> str:
+    """Stable SHA-256 of a payload built by SITACService.create_protocolo_data"""
+    canonical = json.dumps(protocolo_data, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def is_submitted(protocolo: Protocolo) -> bool:
+    """True when SITAC has already accepted this protocolo"""
+    if protocolo.protocolo_sitac:
+        return True
+    return RegistroEnvioSITAC.objects.filter(
+        protocolo=protocolo, status=RegistroEnvioSITAC.STATUS_ENVIADO
+    ).exists()
+
+
+def _claim(protocolo: Protocolo, digest: str, protocolo_data: Dict) -> Optional[RegistroEnvioSITAC]:
+    """
+    Mark (protocolo, payload) as being sent.
+    Returns None when another submission for this protocolo is in flight or done;
+    the partial unique constraint on the ledger enforces this across processes.
+    """
+    try:
+        with transaction.atomic():
+            registro, created = RegistroEnvioSITAC.objects.get_or_create(
+                protocolo=protocolo,
+                payload_hash=digest,
+                defaults={'payload': protocolo_data},
+            )
+            if created:
+                return registro
+            if registro.status != RegistroEnvioSITAC.STATUS_FALHOU:
+                return None
+            updated = RegistroEnvioSITAC.objects.filter(
+                pk=registro.pk, status=RegistroEnvioSITAC.STATUS_FALHOU
+            ).update(
+                status=RegistroEnvioSITAC.STATUS_ENVIANDO,
+                tentativas=F('tentativas') + 1,
+                atualizado_em=timezone.now(),
+            )
+            return registro if updated else None
+    except IntegrityError:
+        return None
+
+
+def _release_stale_claims(protocolo: Protocolo) -> int:
+    """
+    Mark claims left in 'enviando' for longer than SITAC_LEDGER_CLAIM_TIMEOUT
+    as failed, so they can be claimed again. These come from workers killed
+    between begin_submission() and finish_submission(); the timeout must be
+    longer than a submission with all its retries can take.
+    """
+    released = RegistroEnvioSITAC.objects.filter(
+        protocolo=protocolo,
+        status=RegistroEnvioSITAC.STATUS_ENVIANDO,
+        atualizado_em__lt=timezone.now() - timedelta(seconds=_claim_timeout()),
+    ).update(status=RegistroEnvioSITAC.STATUS_FALHOU, atualizado_em=timezone.now())
+    if released:
+        logger.warning(f"SITAC ledger: released {released} stale claim(s) for protocolo {protocolo.numero}")
+    return released
+
+
+def begin_submission(
+    protocolo: Protocolo,
+    build: Callable[[Protocolo], Dict],
+    protocolo_data: Optional[Dict] = None,
+) -> Tuple[Optional[str], Optional[RegistroEnvioSITAC], Optional[Dict]]:
+    """
+    Ledger checks before calling SITAC, shared by the sync and async clients.
+    Returns (outcome, None, None) when nothing must be sent, otherwise
+    (None, registro, protocolo_data) with the ledger row claimed.
+    """
+    if is_submitted(protocolo):
+        return ALREADY_SENT, None, None
+
+    if protocolo_data is None:
+        protocolo_data = build(protocolo)
+    digest = payload_hash(protocolo_data)
+
+    registro = _claim(protocolo, digest, protocolo_data)
+    if registro is None and _release_stale_claims(protocolo):
+        registro = _claim(protocolo, digest, protocolo_data)
+    if registro is None:
+        if is_submitted(protocolo):
+            return ALREADY_SENT, None, None
+        logger.info(f"SITAC ledger: protocolo {protocolo.numero} is already being submitted")
+        return IN_FLIGHT, None, None
+    return None, registro, protocolo_data
+
+
+def finish_submission(
+    protocolo: Protocolo,
+    registro: RegistroEnvioSITAC,
+    success: bool,
+    response: Optional[Dict],
+) -> Tuple[str, Optional[Dict]]:
+    """Record the SITAC answer for a claimed ledger row"""
+    if not success:
+        RegistroEnvioSITAC.objects.filter(pk=registro.pk).update(
+            status=RegistroEnvioSITAC.STATUS_FALHOU, atualizado_em=timezone.now()
+        )
+        return FAILED, None
+
+    with transaction.atomic():
+        RegistroEnvioSITAC.objects.filter(pk=registro.pk).update(
+            status=RegistroEnvioSITAC.STATUS_ENVIADO, resposta=response, atualizado_em=timezone.now()
+        )
+        if response and 'protocolo' in response:
+            # update() avoids re-running save()/clean() and post_save receivers
+            Protocolo.objects.filter(pk=protocolo.pk).update(protocolo_sitac=response['protocolo'])
+            protocolo.protocolo_sitac = response['protocolo']
+            # ...so the cached list/detail pages must be invalidated by hand
+            invalidate()
+    logger.info(f"SITAC ledger: protocolo {protocolo.numero} submitted")
+    return SENT, response
+
+
+def submit_once(
+    protocolo: Protocolo,
+    sitac_service: Optional[SITACService] = None,
+    protocolo_data: Optional[Dict] = None,
+) -> Tuple[str, Optional[Dict]]:
+    """
+    Submit a protocolo to SITAC unless it was already submitted.
+    Returns: (outcome, response_data)
+    """
+    sitac_service = sitac_service or SITACService()
+    outcome, registro, protocolo_data = begin_submission(
+        protocolo, sitac_service.create_protocolo_data, protocolo_data
+    )
+    if outcome:
+        return outcome, None
+
+    success, response = sitac_service.submit_protocolo(protocolo_data)
+    return finish_submission(protocolo, registro, success, response)
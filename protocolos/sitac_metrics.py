@@ -0,0 +1,222 @@
+"""
+SITAC Metrics
+In-process counters and histograms for outbound SITAC calls, rendered in the
+Prometheus text exposition format. Every process (web worker, outbox worker)
+keeps its own registry: the web one is scraped through the ``sitac_metrics``
+view, the outbox worker through ``processar_envios_sitac --metrics-port``.
+"""
+import random
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from django.conf import settings
+
+from . import sitac_resilience
+from .sitac_transport import pool_stats
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PAYLOAD_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 65536)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (le = upper bound, inclusive)"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Thread-safe set of labelled counters and histograms"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self.help[name] = help_text
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, buckets: Sequence[float], **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def value(self, name: str, **labels) -> float:
+        with self.lock:
+            return self.counters.get(name, {}).get(tuple(sorted(labels.items())), 0)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self) -> List[str]:
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                lines += self._header(name, 'counter')
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            for name, series in sorted(self.histograms.items()):
+                lines += self._header(name, 'histogram')
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else _number(bound)
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(histogram.sum)}")
+                    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return lines
+
+    def _header(self, name: str, kind: str) -> List[str]:
+        lines = []
+        if name in self.help:
+            lines.append(f"# HELP {name} {self.help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+registry = Registry()
+registry.describe('sitac_request_duration_seconds', 'Latency of each HTTP attempt to SITAC')
+registry.describe('sitac_responses_total', 'HTTP attempts to SITAC by endpoint and status (error = no response)')
+registry.describe('sitac_payload_bytes', 'Size of protocolo payloads sent to SITAC')
+registry.describe('sitac_token_requests_total', 'Access token lookups served from the cache (hit) or not (miss)')
+registry.describe('sitac_token_fetches_total', 'Tokens obtained from SITAC by method (refresh or login)')
+
+
+def observe_response(endpoint: str, status: str, latency: float) -> None:
+    registry.observe('sitac_request_duration_seconds', latency, LATENCY_BUCKETS, endpoint=endpoint)
+    registry.inc('sitac_responses_total', endpoint=endpoint, status=status)
+
+
+def observe_payload(endpoint: str, size: int) -> None:
+    registry.observe('sitac_payload_bytes', size, PAYLOAD_BUCKETS, endpoint=endpoint)
+
+
+def token_lookup(hit: bool) -> None:
+    registry.inc('sitac_token_requests_total', result='hit' if hit else 'miss')
+
+
+def token_fetched(method: str) -> None:
+    registry.inc('sitac_token_fetches_total', method=method)
+
+
+def instrument(endpoint: str, send: Callable) -> Callable:
+    """Wrap a sitac_resilience.call() ``send`` so every attempt is timed and counted"""
+    def timed(read_timeout):
+        start = time.monotonic()
+        try:
+            response = send(read_timeout)
+        except Exception:
+            observe_response(endpoint, 'error', time.monotonic() - start)
+            raise
+        observe_response(endpoint, str(response.status_code), time.monotonic() - start)
+        return response
+    return timed
+
+
+def ainstrument(endpoint: str, send: Callable) -> Callable:
+    """instrument() for the async client's coroutine ``send``"""
+    async def timed(read_timeout):
+        start = time.monotonic()
+        try:
+            response = await send(read_timeout)
+        except Exception:
+            observe_response(endpoint, 'error', time.monotonic() - start)
+            raise
+        observe_response(endpoint, str(response.status_code), time.monotonic() - start)
+        return response
+    return timed
+
+
+def sample_debug() -> bool:
+    """Whether to emit verbose debug logging for this call (SITAC_DEBUG_LOG_SAMPLE_RATE, 0 to 1)"""
+    rate = getattr(settings, 'SITAC_DEBUG_LOG_SAMPLE_RATE', 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def render() -> str:
+    """All SITAC metrics of this process, including breaker and pool state"""
+    lines = registry.render()
+
+    breaker = sitac_resilience.get_breaker().snapshot()
+    lines += [
+        '# HELP sitac_circuit_open Whether the SITAC circuit breaker is open (1) or half open (0.5)',
+        '# TYPE sitac_circuit_open gauge',
+        f"sitac_circuit_open {_number({'open': 1, 'half_open': 0.5}.get(breaker['state'], 0))}",
+        '# HELP sitac_circuit_calls_total Calls seen by the SITAC circuit breaker',
+        '# TYPE sitac_circuit_calls_total counter',
+    ]
+    for result in ('successes', 'failures', 'rejected'):
+        lines.append(f'sitac_circuit_calls_total{{result="{result}"}} {breaker[result]}')
+
+    pool = pool_stats()
+    lines += [
+        '# HELP sitac_pool_connections_total Connection checkouts from the SITAC pool (hit = reused)',
+        '# TYPE sitac_pool_connections_total counter',
+        f'sitac_pool_connections_total{{result="hit"}} {pool["hits"]}',
+        f'sitac_pool_connections_total{{result="miss"}} {pool["misses"]}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_http_server(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Serve render() on http://host:port/ from a daemon thread (for non-web processes)"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='sitac-metrics', daemon=True).start()
+    return server
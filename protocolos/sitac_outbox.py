@@ -0,0 +1,155 @@
+"""
+SITAC Outbox
+Persistent queue of protocolo submissions to SITAC, drained by the
+``processar_envios_sitac`` management command.
+"""
+import logging
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EnvioSITAC, Protocolo
+from .sitac_ledger import ALREADY_SENT, IN_FLIGHT, SENT, is_submitted, submit_once
+from .sitac_service import SITACService
+
+logger = logging.getLogger(__name__)
+
+TIPOS_FINALISTICOS = ('finalistico_pf', 'finalistico_pj')
+
+
+def _lease_seconds() -> int:
+    return getattr(settings, 'SITAC_OUTBOX_LEASE_SECONDS', 300)
+
+
+def _max_attempts() -> int:
+    return getattr(settings, 'SITAC_OUTBOX_MAX_TENTATIVAS', 10)
+
+
+def _retry_delay(tentativas: int) -> timedelta:
+    """Exponential backoff between attempts, capped at one hour"""
+    base = getattr(settings, 'SITAC_OUTBOX_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(base * (2 ** max(tentativas - 1, 0)), 3600))
+
+
+def enqueue_protocolo(protocolo: Protocolo) -> Optional[EnvioSITAC]:
+    """
+    Add a protocolo to the outbox.
+    Called from the post_save receiver, inside the transaction that saves the
+    protocolo, so both rows are committed (or rolled back) together.
+    Returns the outbox entry, or None for non-finalístico protocolos and
+    protocolos SITAC has already accepted.
+    """
+    if protocolo.tipo not in TIPOS_FINALISTICOS:
+        return None
+    if is_submitted(protocolo):
+        return None
+    # Coalesce with an entry that has not been processed yet
+    existing = EnvioSITAC.objects.filter(
+        protocolo=protocolo,
+        status__in=[EnvioSITAC.STATUS_PENDENTE, EnvioSITAC.STATUS_PROCESSANDO],
+    ).first()
+    if existing:
+        return existing
+    return EnvioSITAC.objects.create(protocolo=protocolo)
+
+
+def claim_batch(limit: int = 10) -> List[EnvioSITAC]:
+    """
+    Reserve up to ``limit`` due entries for this worker.
+
+    Rows are locked with ``SELECT ... FOR UPDATE SKIP LOCKED`` so several
+    workers can run concurrently without picking the same entry. The
+    reservation is a lease: entries left in ``processando`` by a crashed
+    worker become available again once ``disponivel_em`` passes.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        envios = list(
+            EnvioSITAC.objects
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('protocolo')
+            .filter(
+                status__in=[EnvioSITAC.STATUS_PENDENTE, EnvioSITAC.STATUS_PROCESSANDO],
+                disponivel_em__lte=now,
+            )
+            .order_by('disponivel_em', 'id')[:limit]
+        )
+        if envios:
+            EnvioSITAC.objects.filter(pk__in=[envio.pk for envio in envios]).update(
+                status=EnvioSITAC.STATUS_PROCESSANDO,
+                disponivel_em=now + timedelta(seconds=_lease_seconds()),
+                tentativas=F('tentativas') + 1,
+            )
+            for envio in envios:
+                envio.tentativas += 1
+    return envios
+
+
+def _record_failure(envio: EnvioSITAC, message: str) -> None:
+    """Schedule a retry with backoff, or give up after the maximum attempts"""
+    if envio.tentativas >= _max_attempts():
+        status = EnvioSITAC.STATUS_ERRO
+        disponivel_em = timezone.now()
+    else:
+        status = EnvioSITAC.STATUS_PENDENTE
+        disponivel_em = timezone.now() + _retry_delay(envio.tentativas)
+
+    EnvioSITAC.objects.filter(pk=envio.pk).update(
+        status=status,
+        disponivel_em=disponivel_em,
+        ultimo_erro=message,
+        atualizado_em=timezone.now(),
+    )
+    logger.warning(
+        f"SITAC outbox: protocolo {envio.protocolo.numero} failed "
+        f"(attempt {envio.tentativas}/{_max_attempts()}, status={status})"
+    )
+
+
+def process_envio(envio: EnvioSITAC, sitac_service: Optional[SITACService] = None) -> bool:
+    """
+    Submit a claimed entry to SITAC through the ledger and record the outcome.
+    Returns True when SITAC accepted the protocolo (now or earlier).
+    """
+    outcome, _ = submit_once(envio.protocolo, sitac_service)
+
+    if outcome in (SENT, ALREADY_SENT):
+        EnvioSITAC.objects.filter(pk=envio.pk).update(
+            status=EnvioSITAC.STATUS_ENVIADO, ultimo_erro='', atualizado_em=timezone.now()
+        )
+        return True
+
+    if outcome == IN_FLIGHT:
+        _record_failure(envio, 'Envio em andamento por outro processo')
+    else:
+        _record_failure(envio, 'Falha ao enviar protocolo ao SITAC')
+    return False
+
+
+def process_batch(limit: int = 10, sitac_service: Optional[SITACService] = None) -> Tuple[int, int]:
+    """
+    Claim and process one batch of entries.
+    Returns: (submitted, failed)
+    """
+    envios = claim_batch(limit)
+    if not envios:
+        return 0, 0
+
+    sitac_service = sitac_service or SITACService()
+    submitted = failed = 0
+    for envio in envios:
+        try:
+            ok = process_envio(envio, sitac_service)
+        except Exception as e:
+            logger.exception(f"SITAC outbox: unexpected error on entry {envio.pk}: {str(e)}")
+            _record_failure(envio, str(e))
+            ok = False
+        if ok:
+            submitted += 1
+        else:
+            failed += 1
+    return submitted, failed
@@ -0,0 +1,295 @@
+"""
+SITAC Resilience
+Process-wide circuit breaker, latency-adaptive read timeouts and jittered
+exponential retries used by SITACService for every outbound call.
+"""
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+import requests
+from django.conf import settings
+
+from .utils import percentile
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling SITAC while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker over a rolling window of recent calls.
+
+    closed    -> calls flow; opens when the failure rate over the last
+                 ``window`` calls reaches ``failure_threshold`` (with at
+                 least ``min_calls`` observed).
+    open      -> calls fail fast for ``open_seconds``.
+    half_open -> up to ``half_open_max`` probe calls are let through; a
+                 success closes the circuit, a failure opens it again.
+
+    Every allowed call must end in ``record_success``, ``record_failure``
+    or ``release``; otherwise a half-open probe slot is never given back.
+    """
+
+    def __init__(self, window=50, min_calls=10, failure_threshold=0.5, open_seconds=30, half_open_max=1):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max = half_open_max
+
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.results = deque(maxlen=window)
+        self.opened_at = 0.0
+        self.half_open_in_flight = 0
+        self.counters = {
+            'calls': 0,
+            'successes': 0,
+            'failures': 0,
+            'rejected': 0,
+            'opened': 0,
+        }
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted now"""
+        with self.lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self.half_open_in_flight = 0
+            if self.state == OPEN or (
+                self.state == HALF_OPEN and self.half_open_in_flight >= self.half_open_max
+            ):
+                self.counters['rejected'] += 1
+                return False
+            if self.state == HALF_OPEN:
+                self.half_open_in_flight += 1
+            self.counters['calls'] += 1
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.counters['successes'] += 1
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.results.clear()
+            self.results.append(True)
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.counters['failures'] += 1
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self.results.append(False)
+            failures = self.results.count(False)
+            if len(self.results) >= self.min_calls and failures / len(self.results) >= self.failure_threshold:
+                self._open()
+
+    def release(self) -> None:
+        """End an allowed call without a verdict (cancelled, unexpected error)"""
+        with self.lock:
+            if self.state == HALF_OPEN and self.half_open_in_flight:
+                self.half_open_in_flight -= 1
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.results.clear()
+        self.counters['opened'] += 1
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            failures = self.results.count(False)
+            return {
+                'state': self.state,
+                'window_calls': len(self.results),
+                'window_failure_rate': failures / len(self.results) if self.results else 0.0,
+                **self.counters,
+            }
+
+
+class AdaptiveTimeout:
+    """
+    Read timeout derived from observed latencies:
+    ``p99 * multiplier`` clamped to [minimum, maximum], falling back to
+    ``maximum`` until ``min_samples`` successful calls were observed.
+    """
+
+    def __init__(self, minimum=5.0, maximum=30.0, multiplier=3.0, samples=200, min_samples=20):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=samples)
+        self.lock = threading.Lock()
+
+    def observe(self, latency: float) -> None:
+        with self.lock:
+            self.latencies.append(latency)
+
+    def current(self) -> float:
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return self.maximum
+            p99 = percentile(list(self.latencies), 99)
+        return min(max(p99 * self.multiplier, self.minimum), self.maximum)
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            latencies = list(self.latencies)
+        return {
+            'timeout': self.current(),
+            'samples': len(latencies),
+            'p50': percentile(latencies, 50),
+            'p99': percentile(latencies, 99),
+        }
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for the given retry number (0-based)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+_lock = threading.Lock()
+_breaker: Optional[CircuitBreaker] = None
+_timeouts: Dict[str, AdaptiveTimeout] = {}
+
+
+def get_breaker() -> CircuitBreaker:
+    """The circuit breaker shared by every SITAC call in this process"""
+    global _breaker
+    if _breaker is None:
+        with _lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(
+                    window=getattr(settings, 'SITAC_BREAKER_WINDOW', 50),
+                    min_calls=getattr(settings, 'SITAC_BREAKER_MIN_CALLS', 10),
+                    failure_threshold=getattr(settings, 'SITAC_BREAKER_FAILURE_RATE', 0.5),
+                    open_seconds=getattr(settings, 'SITAC_BREAKER_OPEN_SECONDS', 30),
+                )
+    return _breaker
+
+
+def get_timeout(endpoint: str) -> AdaptiveTimeout:
+    """Adaptive read timeout for one SITAC endpoint"""
+    timeout = _timeouts.get(endpoint)
+    if timeout is None:
+        with _lock:
+            timeout = _timeouts.setdefault(endpoint, AdaptiveTimeout(
+                minimum=getattr(settings, 'SITAC_MIN_READ_TIMEOUT', 5),
+                maximum=getattr(settings, 'SITAC_READ_TIMEOUT', 30),
+            ))
+    return timeout
+
+
+def reset() -> None:
+    """Forget breaker state and latency history (used by tests)"""
+    global _breaker
+    with _lock:
+        _breaker = None
+        _timeouts.clear()
+
+
+def snapshot() -> Dict:
+    """Breaker state, counters and current timeouts for monitoring"""
+    return {
+        'breaker': get_breaker().snapshot(),
+        'timeouts': {endpoint: timeout.snapshot() for endpoint, timeout in list(_timeouts.items())},
+    }
+
+
+class Attempts:
+    """
+    Breaker, adaptive timeout and retry bookkeeping for one logical SITAC
+    call; the loop around it lives in ``call()`` and in the async client,
+    which only differ in how they send and sleep.
+
+    Idempotent calls are retried on transport errors and 5xx responses;
+    non-idempotent calls only when the connection could not be established
+    (the request never reached SITAC).
+    """
+
+    def __init__(self, endpoint: str, idempotent: bool):
+        self.endpoint = endpoint
+        self.idempotent = idempotent
+        self.breaker = get_breaker()
+        self.adaptive = get_timeout(endpoint)
+        self.retries = getattr(settings, 'SITAC_MAX_RETRIES', 2)
+        self.base = getattr(settings, 'SITAC_RETRY_BASE_DELAY', 0.5)
+        self.cap = getattr(settings, 'SITAC_RETRY_MAX_DELAY', 5.0)
+        self.number = 0
+        self.start = 0.0
+        self.recorded = False
+
+    @contextmanager
+    def attempt(self) -> Iterator[float]:
+        """
+        Take a breaker slot and yield the read timeout for this attempt.
+        If the body ends without calling ``failed``/``responded`` (cancelled,
+        unexpected exception) the slot is released, so a half-open probe
+        can't leave the breaker stuck.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"SITAC circuit breaker is open; skipping {self.endpoint}")
+        self.start = time.monotonic()
+        self.recorded = False
+        try:
+            yield self.adaptive.current()
+        finally:
+            if not self.recorded:
+                self.breaker.release()
+
+    def failed(self, connect_error: bool) -> bool:
+        """Record a transport error; whether the call should be retried"""
+        self.recorded = True
+        self.breaker.record_failure()
+        return (self.idempotent or connect_error) and self.number < self.retries
+
+    def responded(self, status_code: int) -> bool:
+        """Record an HTTP response; whether the call should be retried"""
+        self.recorded = True
+        if status_code < 500:
+            # 4xx means SITAC is up and answering; not a breaker failure
+            self.breaker.record_success()
+            self.adaptive.observe(time.monotonic() - self.start)
+            return False
+        self.breaker.record_failure()
+        return self.idempotent and self.number < self.retries
+
+    def next_delay(self) -> float:
+        """Backoff before the next attempt"""
+        delay = backoff_delay(self.number, self.base, self.cap)
+        self.number += 1
+        return delay
+
+
+def call(
+    endpoint: str,
+    send: Callable[[float], requests.Response],
+    idempotent: bool,
+) -> requests.Response:
+    """
+    Perform one logical SITAC call through the breaker, retrying as
+    described in ``Attempts``. ``send(read_timeout)`` issues the HTTP request.
+    """
+    attempts = Attempts(endpoint, idempotent)
+    while True:
+        with attempts.attempt() as read_timeout:
+            try:
+                response = send(read_timeout)
+            except requests.exceptions.RequestException as e:
+                if not attempts.failed(isinstance(e, requests.exceptions.ConnectTimeout)):
+                    raise
+            else:
+                if not attempts.responded(response.status_code):
+                    return response
+        time.sleep(attempts.next_delay())
@@ -5,10 +5,12 @@ Handles authentication and protocolo submission to SITAC system
 import requests
 import json
 import logging
-from datetime import datetime, timedelta
 from django.conf import settings
-from django.core.cache import cache
-from typing import Dict, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import sitac_metrics, sitac_resilience
+from .sitac_token import SITACTokenManager
+from .sitac_transport import get_session, get_timeout
 
 logger = logging.getLogger(__name__)
 
@@ -19,19 +21,25 @@ class SITACService:
         self.base_url = getattr(settings, 'SITAC_BASE_URL', 'https://crea-to.sitac.com.br/app/webservices')
         self.username = getattr(settings, 'SITAC_USERNAME', '')
         self.password = getattr(settings, 'SITAC_PASSWORD', '')
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none'
-        })
+        self.token_manager = SITACTokenManager(self)
+        # Shared per-process pool: keeps TCP/TLS connections alive between calls
+        self.session = get_session()
+        self.timeout = get_timeout()
+    
+    def _post(self, endpoint: str, headers: Dict[str, str], idempotent: bool, **kwargs) -> requests.Response:
+        """
+        POST to a SITAC endpoint through the process-wide circuit breaker,
+        with a latency-adaptive read timeout and jittered retries
+        """
+        url = f"{self.base_url}{endpoint}"
+        connect_timeout = self.timeout[0]
+        return sitac_resilience.call(
+            endpoint,
+            sitac_metrics.instrument(endpoint, lambda read_timeout: self.session.post(
+                url, headers=headers, timeout=(connect_timeout, read_timeout), **kwargs
+            )),
+            idempotent=idempotent,
+        )
     
     def _get_auth_headers(self) -> Dict[str, str]:
         """Get basic authentication headers"""
@@ -60,11 +68,12 @@ class SITACService:
             logger.info(f"Username: {self.username}")
             logger.info(f"Password length: {len(self.password)} characters")
             
-            response = self.session.post(url, headers=headers, timeout=30)
+            response = self._post('/auth/login', headers, idempotent=True)
             
             # Log response details for debugging
             logger.info(f"Response status: {response.status_code}")
-            logger.info(f"Response headers: {dict(response.headers)}")
+            if sitac_metrics.sample_debug():
+                logger.debug(f"Response headers: {dict(response.headers)}")
             
             if response.status_code == 403:
                 logger.error("SITAC returned 403 Forbidden - check credentials")
@@ -74,10 +83,8 @@ class SITACService:
             
             token_data = response.json()
             
-            # Cache the token with expiration time
-            expires_in = token_data.get('expires_in', 1800)
-            cache_timeout = expires_in - 60  # Cache for 1 minute less than expiration
-            cache.set('sitac_access_token', token_data, cache_timeout)
+            # Share the token with every process through the token manager
+            self.token_manager.store(token_data)
             
             logger.info("SITAC login successful")
             return True, token_data
@@ -97,18 +104,15 @@ class SITACService:
         Returns: (success, token_data)
         """
         try:
-            url = f"{self.base_url}/auth/refresh-token"
             headers = self._get_bearer_headers(refresh_token)
             
-            response = self.session.post(url, headers=headers, timeout=30)
+            response = self._post('/auth/refresh-token', headers, idempotent=True)
             response.raise_for_status()
             
             token_data = response.json()
             
-            # Cache the new token
-            expires_in = token_data.get('expires_in', 1800)
-            cache_timeout = expires_in - 60
-            cache.set('sitac_access_token', token_data, cache_timeout)
+            # Share the new token with every process
+            self.token_manager.store(token_data)
             
             logger.info("SITAC token refresh successful")
             return True, token_data
@@ -123,25 +127,12 @@ class SITACService:
     def get_valid_token(self) -> Optional[str]:
         """
         Get a valid access token, refreshing if necessary
+        The token is shared through the cache and refreshed in the
+        background shortly before it expires.
         Returns: access_token or None
         """
-        # Check cache first
-        cached_token = cache.get('sitac_access_token')
-        if cached_token and cached_token.get('access_token'):
-            return cached_token['access_token']
-        
-        # Try to refresh if we have a refresh token
-        if cached_token and cached_token.get('refresh_token'):
-            success, new_token_data = self.refresh_token(cached_token['refresh_token'])
-            if success and new_token_data.get('access_token'):
-                return new_token_data['access_token']
-        
-        # If refresh fails, try to login
-        success, token_data = self.login()
-        if success and token_data.get('access_token'):
-            return token_data['access_token']
-        
-        return None
+        # Single-flight across processes: only one caller logs in or refreshes
+        return self.token_manager.get_token()
     
     def submit_protocolo(self, protocolo_data: Dict) -> Tuple[bool, Optional[Dict]]:
         """
@@ -155,15 +146,22 @@ class SITACService:
                 logger.error("Could not obtain valid SITAC access token")
                 return False, None
             
-            url = f"{self.base_url}/protocolo/saveProtocolo"
             headers = self._get_bearer_headers(access_token)
             
-            response = self.session.post(
-                url,
-                headers=headers,
-                json=protocolo_data,
-                timeout=30,
+            # Serialized once (as requests' json= would) so the payload size can be recorded
+            body = json.dumps(protocolo_data, allow_nan=False).encode('utf-8')
+            sitac_metrics.observe_payload('/protocolo/saveProtocolo', len(body))
+
+            # Not idempotent: only retried when the request never reached SITAC
+            response = self._post(
+                '/protocolo/saveProtocolo',
+                headers,
+                idempotent=False,
+                data=body,
             )
+            if response.status_code == 401:
+                # Token rejected: drop it so the next call logs in again
+                self.token_manager.invalidate()
             try:
                 response.raise_for_status()
             except requests.exceptions.HTTPError as http_err:
@@ -188,6 +186,31 @@ class SITACService:
             logger.error(f"Unexpected error during SITAC protocolo submission: {str(e)}")
             return False, None
     
+    @staticmethod
+    def _documentos(protocolo) -> List:
+        """
+        Documentos of a protocolo, newest first, with their tipo loaded.
+        Uses the prefetch cache when the protocolo came from
+        iter_protocolo_data(); otherwise fetches them in one query.
+        Ties on criado_em are broken by id so both paths agree.
+        """
+        if 'documentos' in getattr(protocolo, '_prefetched_objects_cache', {}):
+            documentos = protocolo.documentos.all()
+        else:
+            documentos = protocolo.documentos.select_related('tipo_documento')
+        return sorted(documentos, key=lambda doc: (doc.criado_em, doc.pk), reverse=True)
+
+    def iter_protocolo_data(self, queryset, chunk_size: int = 500) -> Iterator[Tuple[Any, Dict]]:
+        """
+        Stream (protocolo, protocolo_data) pairs for a Protocolo queryset.
+        Documentos and their tipos are prefetched per chunk of ``chunk_size``
+        protocolos, so the query count depends on the number of chunks and
+        not on the number of protocolos or documentos.
+        """
+        queryset = queryset.prefetch_related('documentos__tipo_documento')
+        for protocolo in queryset.iterator(chunk_size=chunk_size):
+            yield protocolo, self.create_protocolo_data(protocolo)
+
     def create_protocolo_data(self, protocolo) -> Dict:
         """
         Create SITAC protocolo data from Django Protocolo model
@@ -220,7 +243,7 @@ class SITACService:
 
         # Append additional documents (Nome: Observação) if any
         documentos_extra = []
-        for doc in getattr(protocolo, 'documentos', []).all():
+        for doc in self._documentos(protocolo):
             observacao = (doc.observacoes or '').strip()
             observacao_fmt = observacao if observacao else ''
             documentos_extra.append(
@@ -0,0 +1,189 @@
+"""
+SITAC Token Manager
+Keeps the SITAC access token in the shared cache so every process reuses
+the same token, with a cache-based lock so only one caller logs in or
+refreshes at a time.
+"""
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+from . import sitac_metrics
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_KEY = 'sitac_access_token'
+LOCK_CACHE_KEY = 'sitac_access_token_lock'
+
+# Only one background refresh per process at a time
+_background_refresh_running = threading.Lock()
+
+
+class SITACTokenManager:
+    """Single-flight, cross-process access token manager for SITACService"""
+
+    def __init__(self, sitac_service):
+        self.sitac_service = sitac_service
+        self.cache = caches[getattr(settings, 'SITAC_TOKEN_CACHE', 'default')]
+        # Tokens are namespaced by base URL so a local/fake SITAC never shares them with production
+        namespace = hashlib.sha1(sitac_service.base_url.encode('utf-8')).hexdigest()[:12]
+        self.token_key = f"{TOKEN_CACHE_KEY}:{namespace}"
+        self.lock_key = f"{LOCK_CACHE_KEY}:{namespace}"
+        # Refresh this many seconds before the access token expires
+        self.refresh_margin = getattr(settings, 'SITAC_TOKEN_REFRESH_MARGIN', 120)
+        # Keep the token data around this long after expiry so the refresh token can still be used
+        self.refresh_grace = getattr(settings, 'SITAC_TOKEN_REFRESH_GRACE', 1800)
+        # How long the lock holder may take to log in before the lock expires
+        self.lock_timeout = getattr(settings, 'SITAC_TOKEN_LOCK_TIMEOUT', 90)
+        # How long other callers wait for the lock holder's result
+        self.lock_wait = getattr(settings, 'SITAC_TOKEN_LOCK_WAIT', 65)
+        self.poll_interval = 0.2
+
+    def _entry(self, token_data: Dict) -> Tuple[Dict, int]:
+        expires_in = int(token_data.get('expires_in', 1800))
+        data = dict(token_data)
+        data['expires_at'] = time.time() + expires_in
+        return data, expires_in + self.refresh_grace
+
+    def store(self, token_data: Dict) -> Dict:
+        """Store token data returned by /auth/login or /auth/refresh-token"""
+        data, timeout = self._entry(token_data)
+        self.cache.set(self.token_key, data, timeout)
+        return data
+
+    async def astore(self, token_data: Dict) -> Dict:
+        """store() for async callers"""
+        data, timeout = self._entry(token_data)
+        await self.cache.aset(self.token_key, data, timeout)
+        return data
+
+    def invalidate(self) -> None:
+        """Drop the cached token (e.g. after SITAC rejected it)"""
+        self.cache.delete(self.token_key)
+
+    async def ainvalidate(self) -> None:
+        await self.cache.adelete(self.token_key)
+
+    def _is_valid(self, data: Optional[Dict]) -> bool:
+        return bool(data and data.get('access_token') and data.get('expires_at', 0) > time.time())
+
+    def get_token(self) -> Optional[str]:
+        """
+        Get a valid access token.
+        Returns the cached token when valid, starting a background refresh
+        when it is close to expiring; otherwise blocks until one caller
+        (in any process) has logged in or refreshed.
+        """
+        data = self.cache.get(self.token_key)
+        if self._is_valid(data):
+            sitac_metrics.token_lookup(hit=True)
+            if data['expires_at'] - time.time() < self.refresh_margin:
+                self._refresh_in_background()
+            return data['access_token']
+        sitac_metrics.token_lookup(hit=False)
+        return self._obtain_token()
+
+    async def aget_token(self) -> Optional[str]:
+        """
+        get_token() for async callers.
+        A fresh cached token is returned without leaving the event loop;
+        logging in or refreshing goes through the single-flight sync path
+        in a worker thread, which only happens once per token lifetime.
+        """
+        data = await self.cache.aget(self.token_key)
+        if self._is_valid(data) and data['expires_at'] - time.time() >= self.refresh_margin:
+            sitac_metrics.token_lookup(hit=True)
+            return data['access_token']
+        return await sync_to_async(self.get_token)()
+
+    def _acquire_lock(self) -> Optional[str]:
+        owner = uuid.uuid4().hex
+        if self.cache.add(self.lock_key, owner, self.lock_timeout):
+            return owner
+        return None
+
+    def _release_lock(self, owner: str) -> None:
+        if self.cache.get(self.lock_key) == owner:
+            self.cache.delete(self.lock_key)
+
+    def _fetch_token(self) -> Optional[Dict]:
+        """
+        Refresh using the refresh token when available, falling back to login.
+        SITACService.login/refresh_token store the new token through store().
+        """
+        data = self.cache.get(self.token_key)
+        if data and data.get('refresh_token'):
+            success, token_data = self.sitac_service.refresh_token(data['refresh_token'])
+            if success and token_data and token_data.get('access_token'):
+                sitac_metrics.token_fetched('refresh')
+                return token_data
+
+        success, token_data = self.sitac_service.login()
+        if success and token_data and token_data.get('access_token'):
+            sitac_metrics.token_fetched('login')
+            return token_data
+        return None
+
+    def _obtain_token(self) -> Optional[str]:
+        deadline = time.monotonic() + self.lock_wait
+        while True:
+            owner = self._acquire_lock()
+            if owner:
+                try:
+                    # Another caller may have finished just before we got the lock
+                    data = self.cache.get(self.token_key)
+                    if not self._is_valid(data):
+                        data = self._fetch_token()
+                    return data['access_token'] if data else None
+                finally:
+                    self._release_lock(owner)
+
+            # Someone else is logging in: wait for their result
+            time.sleep(self.poll_interval)
+            data = self.cache.get(self.token_key)
+            if self._is_valid(data):
+                return data['access_token']
+            if time.monotonic() >= deadline:
+                logger.warning("Timed out waiting for SITAC token lock holder")
+                return None
+
+    def refresh_if_needed(self) -> None:
+        """
+        Refresh the cached token now if it is expired or inside the refresh margin.
+        Does nothing when no token was ever obtained; get_token() handles that.
+        """
+        data = self.cache.get(self.token_key)
+        if not data or (self._is_valid(data) and data['expires_at'] - time.time() >= self.refresh_margin):
+            return
+        owner = self._acquire_lock()
+        if not owner:
+            return  # another process is already refreshing
+        try:
+            data = self.cache.get(self.token_key)
+            if not self._is_valid(data) or data['expires_at'] - time.time() < self.refresh_margin:
+                self._fetch_token()
+        finally:
+            self._release_lock(owner)
+
+    def _refresh_in_background(self) -> None:
+        if not _background_refresh_running.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.refresh_if_needed()
+            except Exception as e:
+                logger.error(f"SITAC background token refresh failed: {str(e)}")
+            finally:
+                connection.close()
+                _background_refresh_running.release()
+
+        threading.Thread(target=run, name='sitac-token-refresh', daemon=True).start()
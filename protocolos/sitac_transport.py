@@ -0,0 +1,110 @@
+"""
+SITAC HTTP Transport
+Process-wide pooled ``requests.Session`` shared by every SITACService, so
+TCP/TLS connections to SITAC are kept alive and reused between calls.
+"""
+import os
+import threading
+from typing import Dict, Tuple
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+DEFAULT_HEADERS = {
+    'Content-Type': 'application/json',
+    'Accept': 'application/json',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none'
+}
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+
+_stats_lock = threading.Lock()
+_stats = {'requests': 0, 'misses': 0}
+
+
+class _CountingPoolMixin:
+    """Counts connection checkouts and new connections opened by the pool"""
+
+    def _get_conn(self, timeout=None):
+        with _stats_lock:
+            _stats['requests'] += 1
+        return super()._get_conn(timeout=timeout)
+
+    def _new_conn(self):
+        with _stats_lock:
+            _stats['misses'] += 1
+        return super()._new_conn()
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+def get_timeout() -> Tuple[float, float]:
+    """(connect, read) timeouts for SITAC calls"""
+    return (
+        getattr(settings, 'SITAC_CONNECT_TIMEOUT', 5),
+        getattr(settings, 'SITAC_READ_TIMEOUT', 30),
+    )
+
+
+def _build_session() -> requests.Session:
+    pool_size = getattr(settings, 'SITAC_POOL_SIZE', 10)
+    adapter = _PooledAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Return the session shared by this process.
+    A new one is built after fork so workers never share sockets with their parent.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                _session = _build_session()
+                _session_pid = pid
+    return _session
+
+
+def pool_stats() -> Dict[str, int]:
+    """Connection pool counters: checkouts, reused connections (hits) and new connections (misses)"""
+    with _stats_lock:
+        requests_count = _stats['requests']
+        misses = _stats['misses']
+    return {
+        'requests': requests_count,
+        'hits': max(requests_count - misses, 0),
+        'misses': misses,
+        'pool_size': getattr(settings, 'SITAC_POOL_SIZE', 10),
+    }
@@ -1,10 +1,53 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.test import TestCase, SimpleTestCase, TransactionTestCase, override_settings
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
-from .models import Protocolo
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from unittest import mock, skipUnless
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from .models import Protocolo, Documento, TipoDocumento, EnvioSITAC, RegistroEnvioSITAC, EstatisticaDiariaProtocolo
+from .sitac_outbox import enqueue_protocolo, claim_batch, process_batch
+from .sitac_service import SITACService
+from .utils import percentile
+from .dashboard import dashboard_stats
+from .rollup import divergencias, serie_diaria
+from .search import CPF_CNPJ, IDENTIFICADOR, NUMERO, TEXTO, classify_query, search_protocolos
+from .pagination import NEXT, KeysetPaginator, encode_cursor
+from .counting import Contagem, contar
+from .rows import ProtocoloRow
+from .facets import facet_counts
+from .filters import ProtocoloFiltros
+from .caching import MARCA_ACOES, data_version
+from .export import csv_stream, export_rows
+from . import cpf_cnpj, importacao, sitac_async, sitac_metrics, sitac_resilience
+from .forms import _validate_cnpj, _validate_cpf
+from .sitac_fake import FakeSITACConfig, FakeSITACServer
+from .sitac_async import AsyncSITACService, asubmit_many, close_async_client
+from .sitac_ledger import ALREADY_SENT, FAILED, IN_FLIGHT, SENT, finish_submission, payload_hash, submit_once
+from .sitac_transport import get_timeout, pool_stats
+from .sitac_token import SITACTokenManager
 
 User = get_user_model()
 
+# Cache em memória para testes que contam consultas (o cache em banco também faz SQL)
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 class ProtocoloModelTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -98,3 +141,1378 @@ class ProtocoloModelTest(TestCase):
         protocolos = Protocolo.objects.all()
         self.assertEqual(protocolos[0], protocolo2)  # Mais recente primeiro
         self.assertEqual(protocolos[1], protocolo1)
+
+
+class EnvioSITACOutboxTest(TestCase):
+    def setUp(self):
+        self.protocolo = Protocolo.objects.create(
+            numero='PROT100',
+            tipo='finalistico_pf',
+            cpf_cnpj='52998224725',
+            armario='1',
+            prateleira='2',
+            caixa='3',
+        )
+
+    def _service(self, success, response=None):
+        service = mock.Mock()
+        service.create_protocolo_data.return_value = {'descricao': 'teste'}
+        service.submit_protocolo.return_value = (success, response)
+        return service
+
+    def test_enfileira_somente_finalisticos(self):
+        """Protocolos administrativos não entram na fila do SITAC"""
+        administrativo = Protocolo.objects.create(numero='PROT101', tipo='administrativo')
+        self.assertIsNone(enqueue_protocolo(administrativo))
+        self.assertIsNotNone(enqueue_protocolo(self.protocolo))
+        self.assertEqual(EnvioSITAC.objects.count(), 1)
+
+    def test_envio_com_sucesso_grava_protocolo_sitac(self):
+        """Envio aceito grava o número do SITAC e marca a fila como enviada"""
+        envio = enqueue_protocolo(self.protocolo)
+        enviados, falhas = process_batch(10, self._service(True, {'protocolo': '2025/000123'}))
+
+        self.assertEqual((enviados, falhas), (1, 0))
+        envio.refresh_from_db()
+        self.protocolo.refresh_from_db()
+        self.assertEqual(envio.status, EnvioSITAC.STATUS_ENVIADO)
+        self.assertEqual(self.protocolo.protocolo_sitac, '2025/000123')
+
+    def test_falha_reagenda_com_backoff(self):
+        """Falha no envio devolve o item à fila para uma nova tentativa futura"""
+        envio = enqueue_protocolo(self.protocolo)
+        enviados, falhas = process_batch(10, self._service(False))
+
+        self.assertEqual((enviados, falhas), (0, 1))
+        envio.refresh_from_db()
+        self.assertEqual(envio.status, EnvioSITAC.STATUS_PENDENTE)
+        self.assertEqual(envio.tentativas, 1)
+        self.assertGreater(envio.disponivel_em, timezone.now())
+        # Ainda não está disponível para outro worker
+        self.assertEqual(claim_batch(10), [])
+
+
+class SITACTokenManagerTest(TestCase):
+    def setUp(self):
+        self.service = mock.Mock(base_url='https://sitac.example/app/webservices')
+        self.manager = SITACTokenManager(self.service)
+        cache.delete(self.manager.token_key)
+        cache.delete(self.manager.lock_key)
+        self.service.login.side_effect = lambda: (
+            True, self.manager.store({'access_token': 'abc', 'refresh_token': 'r1', 'expires_in': 1800})
+        )
+
+    def tearDown(self):
+        cache.delete(self.manager.token_key)
+        cache.delete(self.manager.lock_key)
+
+    def test_login_unico_reaproveita_token(self):
+        """Chamadas seguintes usam o token compartilhado sem novo login"""
+        self.assertEqual(self.manager.get_token(), 'abc')
+        self.assertEqual(SITACTokenManager(mock.Mock(base_url=self.service.base_url)).get_token(), 'abc')
+        self.assertEqual(self.service.login.call_count, 1)
+
+    def test_aguarda_quem_detem_o_lock(self):
+        """Com o lock ocupado por outro processo, não faz login em paralelo"""
+        cache.add(self.manager.lock_key, 'outro-processo', 60)
+        self.manager.poll_interval = 0.01
+        self.manager.lock_wait = 0.05
+        self.assertIsNone(self.manager.get_token())
+        self.service.login.assert_not_called()
+
+    def test_refresh_proativo_perto_de_expirar(self):
+        """Token dentro da margem de renovação é renovado via refresh token"""
+        self.manager.store({'access_token': 'velho', 'refresh_token': 'r1', 'expires_in': 30})
+        self.service.refresh_token.side_effect = lambda token: (
+            True, self.manager.store({'access_token': 'novo', 'expires_in': 1800})
+        )
+        self.manager.refresh_if_needed()
+        self.service.refresh_token.assert_called_once_with('r1')
+        self.assertEqual(self.manager.get_token(), 'novo')
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        body = b'{}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class SITACTransportTest(SimpleTestCase):
+    def test_sessao_compartilhada_reutiliza_conexao(self):
+        """Serviços diferentes usam a mesma sessão e a conexão é reaproveitada"""
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/auth/login'
+            self.assertIs(SITACService().session, SITACService().session)
+            antes = pool_stats()
+            for _ in range(3):
+                SITACService().session.post(url, timeout=get_timeout())
+            depois = pool_stats()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(depois['requests'] - antes['requests'], 3)
+        self.assertEqual(depois['misses'] - antes['misses'], 1)
+
+
+class RegistroEnvioSITACTest(TestCase):
+    def setUp(self):
+        self.protocolo = Protocolo.objects.create(
+            numero='PROT200',
+            tipo='finalistico_pj',
+            cpf_cnpj='11222333000181',
+            armario='4',
+            prateleira='5',
+            caixa='6',
+        )
+        self.service = mock.Mock()
+        self.service.create_protocolo_data.side_effect = SITACService().create_protocolo_data
+        self.service.submit_protocolo.return_value = (True, {'protocolo': '2025/000200'})
+
+    def test_post_save_enfileira_protocolo(self):
+        """Criar um protocolo finalístico grava o envio na fila"""
+        self.assertEqual(self.protocolo.envios_sitac.count(), 1)
+
+    def test_protocolo_enviado_uma_unica_vez(self):
+        """Reenvios do mesmo protocolo não chegam ao SITAC"""
+        self.assertEqual(submit_once(self.protocolo, self.service)[0], SENT)
+        self.assertEqual(submit_once(self.protocolo, self.service)[0], ALREADY_SENT)
+        self.protocolo.refresh_from_db()
+        self.assertEqual(submit_once(self.protocolo, self.service)[0], ALREADY_SENT)
+        self.assertEqual(self.service.submit_protocolo.call_count, 1)
+        self.assertEqual(self.protocolo.protocolo_sitac, '2025/000200')
+
+    def test_edicao_sem_mudanca_no_payload_nao_reenvia(self):
+        """Salvar novamente com o mesmo payload não gera novo envio"""
+        self.service.submit_protocolo.return_value = (False, None)
+        self.assertEqual(submit_once(self.protocolo, self.service)[0], FAILED)
+        EnvioSITAC.objects.update(status=EnvioSITAC.STATUS_ERRO)
+
+        self.service.submit_protocolo.return_value = (True, {'protocolo': '2025/000201'})
+        self.assertEqual(submit_once(self.protocolo, self.service)[0], SENT)
+
+        self.protocolo.refresh_from_db()
+        self.protocolo.save()
+        self.assertFalse(
+            self.protocolo.envios_sitac.filter(status=EnvioSITAC.STATUS_PENDENTE).exists()
+        )
+        registro = self.protocolo.registros_sitac.get()
+        self.assertEqual(registro.tentativas, 2)
+        self.assertEqual(registro.payload_hash, payload_hash(SITACService().create_protocolo_data(self.protocolo)))
+
+    def test_envio_em_andamento_bloqueia_outro_payload(self):
+        """Outro payload do mesmo protocolo não é enviado enquanto há um envio em andamento"""
+        RegistroEnvioSITAC.objects.create(protocolo=self.protocolo, payload_hash='x' * 64, payload={})
+        self.assertEqual(submit_once(self.protocolo, self.service)[0], IN_FLIGHT)
+        self.service.submit_protocolo.assert_not_called()
+
+    @override_settings(SITAC_LEDGER_CLAIM_TIMEOUT=600)
+    def test_envio_abandonado_por_worker_e_retomado(self):
+        """Um worker que morreu no meio do envio não bloqueia o protocolo para sempre"""
+        digest = payload_hash(SITACService().create_protocolo_data(self.protocolo))
+        registro = RegistroEnvioSITAC.objects.create(protocolo=self.protocolo, payload_hash=digest, payload={})
+        self.assertEqual(submit_once(self.protocolo, self.service)[0], IN_FLIGHT)
+
+        RegistroEnvioSITAC.objects.filter(pk=registro.pk).update(
+            atualizado_em=timezone.now() - datetime.timedelta(minutes=11)
+        )
+        self.assertEqual(submit_once(self.protocolo, self.service)[0], SENT)
+        registro.refresh_from_db()
+        self.assertEqual(registro.status, RegistroEnvioSITAC.STATUS_ENVIADO)
+        self.assertEqual(registro.tentativas, 2)
+        self.service.submit_protocolo.assert_called_once()
+
+    def test_envio_abandonado_com_outro_payload(self):
+        registro = RegistroEnvioSITAC.objects.create(protocolo=self.protocolo, payload_hash='x' * 64, payload={})
+        RegistroEnvioSITAC.objects.filter(pk=registro.pk).update(
+            atualizado_em=timezone.now() - datetime.timedelta(days=1)
+        )
+        self.assertEqual(submit_once(self.protocolo, self.service)[0], SENT)
+        registro.refresh_from_db()
+        self.assertEqual(registro.status, RegistroEnvioSITAC.STATUS_FALHOU)
+
+
+class SITACPayloadBatchTest(TestCase):
+    def setUp(self):
+        self.service = SITACService()
+        tipos = [
+            TipoDocumento.objects.create(categoria='finalistico_pf', nome=f'Documento {i}')
+            for i in range(3)
+        ]
+        self.tipos = tipos
+
+    def _criar(self, quantidade, documentos=2):
+        for i in range(quantidade):
+            protocolo = Protocolo.objects.create(
+                numero=f'LOTE{Protocolo.objects.count():04d}',
+                tipo='finalistico_pf',
+                cpf_cnpj='529.982.247-25',
+                armario='1',
+                prateleira='2',
+                caixa=str(i),
+            )
+            for tipo in self.tipos[:documentos]:
+                Documento.objects.create(protocolo=protocolo, tipo_documento=tipo, observacoes=f'obs {i}')
+
+    def test_payload_em_lote_identico_ao_individual(self):
+        """iter_protocolo_data gera exatamente o mesmo payload que create_protocolo_data"""
+        self._criar(4, documentos=3)
+        for protocolo, data in self.service.iter_protocolo_data(Protocolo.objects.order_by('pk')):
+            individual = self.service.create_protocolo_data(Protocolo.objects.get(pk=protocolo.pk))
+            self.assertEqual(payload_hash(data), payload_hash(individual))
+
+    def test_numero_de_consultas_nao_cresce_com_o_lote(self):
+        """Protocolos, documentos e tipos são lidos em três consultas por bloco"""
+        self._criar(2)
+        with self.assertNumQueries(3):
+            list(self.service.iter_protocolo_data(Protocolo.objects.all()))
+        self._criar(20)
+        with self.assertNumQueries(3):
+            list(self.service.iter_protocolo_data(Protocolo.objects.all()))
+
+
+class ReenviarSITACCommandTest(TransactionTestCase):
+    def setUp(self):
+        for i in range(5):
+            Protocolo.objects.create(
+                numero=f'PROT3{i:02d}',
+                tipo='finalistico_pf',
+                cpf_cnpj='52998224725',
+                unidade_crea='inspetoria_gurupi' if i % 2 else 'sede_palmas',
+            )
+
+    def test_reenvia_pendentes_com_filtro_de_unidade(self):
+        """Somente os pendentes da unidade filtrada são enviados, uma vez cada"""
+        contador = iter(range(1000))
+        with mock.patch.object(
+            SITACService, 'submit_protocolo',
+            side_effect=lambda data: (True, {'protocolo': f'S{next(contador)}'})
+        ) as submit:
+            out = StringIO()
+            call_command('reenviar_sitac', '--unidade', 'inspetoria_gurupi', '--concurrency', '2', '--rate', '0', stdout=out)
+            call_command('reenviar_sitac', '--unidade', 'inspetoria_gurupi', '--rate', '0', stdout=StringIO())
+
+        self.assertEqual(submit.call_count, 2)
+        self.assertIn('p95', out.getvalue())
+        self.assertEqual(
+            Protocolo.objects.filter(unidade_crea='inspetoria_gurupi', protocolo_sitac__isnull=True).count(), 0
+        )
+        self.assertEqual(Protocolo.objects.filter(protocolo_sitac__isnull=True).count(), 3)
+
+    def test_resume_nao_pula_envios_que_falharam(self):
+        """O checkpoint para antes do primeiro envio que falhou"""
+        # Um envio por vez: o teste é sobre o avanço do checkpoint, não sobre gravações concorrentes no SQLite
+        cache.delete('reenviar_sitac:checkpoint::')
+        pks = list(Protocolo.objects.order_by('pk').values_list('pk', flat=True))
+        numero_que_falha = Protocolo.objects.get(pk=pks[1]).numero
+
+        def submit(data):
+            if numero_que_falha in data['descricao']:
+                return False, None
+            return True, {'protocolo': f"S{data['descricao']}"}
+
+        with mock.patch.object(SITACService, 'submit_protocolo', side_effect=submit):
+            out = StringIO()
+            call_command('reenviar_sitac', '--rate', '0', '--chunk-size', '2', '--concurrency', '1', stdout=out)
+        self.assertEqual(cache.get('reenviar_sitac:checkpoint::'), pks[0])
+        self.assertIn(f'protocolo id {pks[1]} não foi concluído', out.getvalue())
+        self.assertEqual(list(Protocolo.objects.filter(protocolo_sitac__isnull=True).values_list('pk', flat=True)), [pks[1]])
+
+        with mock.patch.object(
+            SITACService, 'submit_protocolo', return_value=(True, {'protocolo': 'S-retomado'})
+        ) as retomado:
+            call_command('reenviar_sitac', '--rate', '0', '--resume', '--concurrency', '1', stdout=StringIO())
+        retomado.assert_called_once()
+        self.assertEqual(Protocolo.objects.get(pk=pks[1]).protocolo_sitac, 'S-retomado')
+        self.assertEqual(cache.get('reenviar_sitac:checkpoint::'), pks[1])
+
+
+class PercentileTest(SimpleTestCase):
+    def test_percentis(self):
+        valores = list(range(1, 101))
+        self.assertEqual(percentile(valores, 50), 50)
+        self.assertEqual(percentile(valores, 95), 95)
+        self.assertEqual(percentile(valores, 99), 99)
+        self.assertEqual(percentile([], 50), 0.0)
+
+
+class SITACResilienceTest(SimpleTestCase):
+    def setUp(self):
+        sitac_resilience.reset()
+        self.addCleanup(sitac_resilience.reset)
+
+    def _response(self, status):
+        response = mock.Mock()
+        response.status_code = status
+        return response
+
+    def test_breaker_abre_e_recupera_em_half_open(self):
+        """Abre ao atingir a taxa de erro e fecha após uma sonda bem-sucedida"""
+        breaker = sitac_resilience.CircuitBreaker(window=10, min_calls=4, failure_threshold=0.5, open_seconds=0.05)
+        for _ in range(4):
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+        self.assertEqual(breaker.snapshot()['state'], sitac_resilience.OPEN)
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())   # sonda
+        self.assertFalse(breaker.allow())  # apenas uma sonda por vez
+        breaker.record_success()
+        self.assertEqual(breaker.snapshot()['state'], sitac_resilience.CLOSED)
+
+    def test_sonda_interrompida_libera_o_half_open(self):
+        """Uma sonda que termina com exceção inesperada não trava o breaker em half-open"""
+        breaker = sitac_resilience.get_breaker()
+        breaker.open_seconds = 0
+        breaker._open()
+
+        send = mock.Mock(side_effect=ValueError('resposta ilegível'))
+        with self.assertRaises(ValueError):
+            sitac_resilience.call('/auth/login', send, idempotent=True)
+        self.assertEqual(breaker.snapshot()['state'], sitac_resilience.HALF_OPEN)
+
+        send = mock.Mock(return_value=self._response(200))
+        self.assertEqual(sitac_resilience.call('/auth/login', send, idempotent=True).status_code, 200)
+        self.assertEqual(breaker.snapshot()['state'], sitac_resilience.CLOSED)
+
+    def test_sonda_assincrona_cancelada_libera_o_half_open(self):
+        """O cliente assíncrono segue a mesma regra quando a sonda é cancelada"""
+        breaker = sitac_resilience.get_breaker()
+        breaker.open_seconds = 0
+        breaker._open()
+
+        async def send(read_timeout):
+            raise asyncio.CancelledError
+
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(sitac_async._call('/auth/login', send, idempotent=True))
+        self.assertTrue(breaker.allow())
+
+    @override_settings(SITAC_RETRY_BASE_DELAY=0, SITAC_MAX_RETRIES=2)
+    def test_retry_apenas_em_chamadas_idempotentes(self):
+        """Erros 5xx são repetidos no login, mas não no envio de protocolo"""
+        send = mock.Mock(side_effect=[self._response(503), self._response(503), self._response(200)])
+        self.assertEqual(sitac_resilience.call('/auth/login', send, idempotent=True).status_code, 200)
+        self.assertEqual(send.call_count, 3)
+
+        send = mock.Mock(return_value=self._response(503))
+        self.assertEqual(sitac_resilience.call('/protocolo/saveProtocolo', send, idempotent=False).status_code, 503)
+        self.assertEqual(send.call_count, 1)
+
+    def test_timeout_adaptativo(self):
+        """O timeout acompanha o p99 observado, dentro dos limites"""
+        timeout = sitac_resilience.AdaptiveTimeout(minimum=1, maximum=30, multiplier=3, min_samples=5)
+        self.assertEqual(timeout.current(), 30)
+        for _ in range(10):
+            timeout.observe(0.5)
+        self.assertEqual(timeout.current(), 1.5)
+        timeout.observe(20)
+        self.assertEqual(timeout.current(), 30)
+
+
+class FakeSITACServerTest(TestCase):
+    def setUp(self):
+        sitac_resilience.reset()
+        self.addCleanup(sitac_resilience.reset)
+        self.server = FakeSITACServer(('127.0.0.1', 0), FakeSITACConfig(latency_ms=0))
+        self.server.start_in_thread()
+        self.addCleanup(self.server.stop)
+
+    def test_fluxo_completo_com_sitac_local(self):
+        """Login, envio e expiração de token seguem o formato esperado pelo SITACService"""
+        protocolo = Protocolo.objects.create(
+            numero='PROT400', tipo='finalistico_pf', cpf_cnpj='52998224725',
+            armario='1', prateleira='1', caixa='1',
+        )
+        with override_settings(SITAC_BASE_URL=self.server.base_url):
+            service = SITACService()
+            self.assertEqual(submit_once(protocolo, service)[0], SENT)
+            self.assertEqual(self.server.stats['login'], 1)
+
+            # Token revogado no servidor: 401 descarta o token e o próximo envio faz novo login
+            self.server.access_tokens.clear()
+            data = service.create_protocolo_data(protocolo)
+            self.assertEqual(service.submit_protocolo(data), (False, None))
+            self.assertTrue(service.submit_protocolo(data)[0])
+            self.assertEqual(self.server.stats['login'], 2)
+            service.token_manager.invalidate()
+
+        protocolo.refresh_from_db()
+        self.assertTrue(protocolo.protocolo_sitac)
+
+
+class AsyncSITACServiceTest(TransactionTestCase):
+    def setUp(self):
+        sitac_resilience.reset()
+        self.addCleanup(sitac_resilience.reset)
+        self.server = FakeSITACServer(('127.0.0.1', 0), FakeSITACConfig(latency_ms=100))
+        self.server.start_in_thread()
+        self.addCleanup(self.server.stop)
+
+    def _run(self, coro):
+        async def run():
+            try:
+                return await coro
+            finally:
+                await close_async_client()
+        return asyncio.run(run())
+
+    def test_envios_simultaneos_em_um_event_loop(self):
+        """Os envios ficam em andamento ao mesmo tempo e cada protocolo é enviado uma vez"""
+        protocolos = [
+            Protocolo.objects.create(
+                numero=f'PROT5{i:02d}', tipo='finalistico_pf', cpf_cnpj='52998224725',
+                armario='1', prateleira='1', caixa=str(i),
+            )
+            for i in range(20)
+        ]
+        with override_settings(SITAC_BASE_URL=self.server.base_url):
+            service = AsyncSITACService()
+            self.assertTrue(self._run(service.login())[0])
+            pares = list(service.sync_service.iter_protocolo_data(Protocolo.objects.all()))
+            result = self._run(asubmit_many(pares, concurrency=20, sitac_service=service))
+            repetido = self._run(asubmit_many(protocolos[:5], sitac_service=service))
+            service.token_manager.invalidate()
+
+        self.assertEqual(result.outcomes, {SENT: 20})
+        self.assertEqual(repetido.outcomes, {ALREADY_SENT: 5})
+        # 20 envios de 100 ms em sequência levariam 2 s
+        self.assertLess(result.elapsed, 1.5)
+        self.assertEqual(self.server.stats['login'], 1)
+        self.assertEqual(Protocolo.objects.filter(protocolo_sitac__isnull=True).count(), 0)
+
+
+    @override_settings(SITAC_ASYNC_CONCURRENCY=2)
+    def test_concurrency_acima_do_limite_do_loop(self):
+        """asubmit_many(concurrency=N) eleva o semáforo do loop para N"""
+        async def run():
+            await asubmit_many([], concurrency=10, sitac_service=mock.Mock())
+            semaphore = sitac_async.get_semaphore()
+            for _ in range(10):
+                await asyncio.wait_for(semaphore.acquire(), 0.1)
+            return semaphore.locked()
+
+        self.assertTrue(asyncio.run(run()))
+
+
+class SITACMetricsTest(TestCase):
+    def setUp(self):
+        sitac_resilience.reset()
+        sitac_metrics.registry.reset()
+        self.addCleanup(sitac_resilience.reset)
+        self.server = FakeSITACServer(('127.0.0.1', 0), FakeSITACConfig(latency_ms=0))
+        self.server.start_in_thread()
+        self.addCleanup(self.server.stop)
+
+    def test_metricas_de_envio_e_token(self):
+        """Latência, status, tamanho do payload e uso do token são registrados"""
+        protocolo = Protocolo.objects.create(
+            numero='PROT600', tipo='finalistico_pf', cpf_cnpj='52998224725',
+            armario='1', prateleira='1', caixa='1',
+        )
+        with override_settings(SITAC_BASE_URL=self.server.base_url):
+            service = SITACService()
+            data = service.create_protocolo_data(protocolo)
+            self.assertTrue(service.submit_protocolo(data)[0])
+            self.assertTrue(service.submit_protocolo(data)[0])
+            service.token_manager.invalidate()
+
+        registry = sitac_metrics.registry
+        self.assertEqual(registry.value('sitac_responses_total', endpoint='/protocolo/saveProtocolo', status='200'), 2)
+        self.assertEqual(registry.value('sitac_token_requests_total', result='miss'), 1)
+        self.assertEqual(registry.value('sitac_token_requests_total', result='hit'), 1)
+        self.assertEqual(registry.value('sitac_token_fetches_total', method='login'), 1)
+
+        texto = sitac_metrics.render()
+        self.assertIn('sitac_request_duration_seconds_bucket{endpoint="/auth/login",le="+Inf"} 1', texto)
+        self.assertIn('sitac_payload_bytes_count{endpoint="/protocolo/saveProtocolo"} 2', texto)
+        self.assertIn('sitac_circuit_open 0', texto)
+
+    @override_settings(SITAC_METRICS_TOKEN='segredo')
+    def test_endpoint_exige_staff_ou_token(self):
+        url = reverse('protocolos:sitac_metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer errado').status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+
+class BuscaProtocoloTest(TestCase):
+    def setUp(self):
+        self.exato = Protocolo.objects.create(
+            numero='2024123', tipo='finalistico_pf', cpf_cnpj='52998224725',
+            armario='1', prateleira='2', caixa='3',
+        )
+        self.prefixo = Protocolo.objects.create(
+            numero='2024123-A', tipo='administrativo',
+            armario='7', prateleira='7', caixa='7',
+            observacoes='Documentos de arquivo morto',
+        )
+        self.outro = Protocolo.objects.create(
+            numero='X-2024123', tipo='finalistico_pj', cpf_cnpj='11222333000181',
+            armario='9', prateleira='9', caixa='9',
+        )
+
+    def _buscar(self, q):
+        return list(search_protocolos(Protocolo.objects.all(), q))
+
+    def test_relevancia_numero_exato_primeiro(self):
+        """Número exato, depois prefixo; o trecho só entra na busca textual"""
+        self.assertEqual(self._buscar('2024123'), [self.exato, self.prefixo])
+        self.assertEqual(self._buscar('x-2024'), [self.outro])
+
+    def test_cpf_cnpj_com_pontuacao(self):
+        self.assertEqual(self._buscar('529.982.247-25'), [self.exato])
+        self.assertEqual(self._buscar('11.222.333/0001-81'), [self.outro])
+
+    def test_local_por_igualdade_e_observacoes(self):
+        self.assertEqual(self._buscar('7'), [self.prefixo])
+        self.assertEqual(self._buscar('arquivo'), [self.prefixo])
+
+    @skipUnless(connection.vendor == 'postgresql', 'busca full-text mantida por trigger no PostgreSQL')
+    def test_full_text_em_portugues(self):
+        """O trigger preenche o vetor e a busca usa o radical das palavras"""
+        self.assertEqual(self._buscar('documento'), [self.prefixo])
+        self.assertIn('protocolo_busca_gin_idx', connection.introspection.get_constraints(
+            connection.cursor(), Protocolo._meta.db_table
+        ))
+
+
+class BuscaInteligenteTest(TestCase):
+    def setUp(self):
+        self.pf = Protocolo.objects.create(
+            numero='BI-001', tipo='finalistico_pf', cpf_cnpj='52998224725',
+            armario='1', prateleira='2', caixa='3',
+        )
+        self.adm = Protocolo.objects.create(
+            numero='7788', tipo='administrativo', armario='4', prateleira='4', caixa='4',
+        )
+
+    def _buscar(self, q):
+        with CaptureQueriesContext(connection) as ctx:
+            resultado = list(search_protocolos(Protocolo.objects.all(), q))
+        return resultado, [query['sql'] for query in ctx.captured_queries]
+
+    def test_classifica_formatos(self):
+        self.assertEqual(classify_query('PROT-12-1-2-3'), (IDENTIFICADOR, '12'))
+        self.assertEqual(classify_query('prot-12'), (IDENTIFICADOR, '12'))
+        self.assertEqual(classify_query('529.982.247-25'), (CPF_CNPJ, '52998224725'))
+        self.assertEqual(classify_query('11222333000181'), (CPF_CNPJ, '11222333000181'))
+        self.assertEqual(classify_query('2024/0001'), (NUMERO, '2024/0001'))
+        self.assertEqual(classify_query('12'), (TEXTO, '12'))
+        self.assertEqual(classify_query('arquivo morto'), (TEXTO, 'arquivo morto'))
+
+    def test_cpf_e_identificador_por_igualdade(self):
+        for q in ('529.982.247-25', self.pf.identificador_local):
+            resultado, sqls = self._buscar(q)
+            self.assertEqual(resultado, [self.pf])
+            self.assertEqual(len(sqls), 1)
+            self.assertNotIn('LIKE', sqls[0].upper())
+
+    def test_prefixo_do_numero(self):
+        resultado, sqls = self._buscar('7788')
+        self.assertEqual(resultado, [self.adm])
+        self.assertNotIn('%7788%', ' '.join(sqls))
+
+    def test_numero_sem_prefixo_cai_na_busca_textual(self):
+        resultado, _ = self._buscar('001')
+        self.assertEqual(resultado, [self.pf])
+
+
+class PaginacaoCursorTest(TestCase):
+    def setUp(self):
+        for i in range(23):
+            Protocolo.objects.create(
+                numero=f'PAG{i:03d}', tipo='administrativo',
+                armario='1', prateleira='1', caixa=str(i % 3),
+            )
+        self.esperado = list(Protocolo.objects.order_by('-data_emissao', '-criado_em', 'id'))
+
+    def test_percorre_para_frente_e_para_tras(self):
+        """Os cursores percorrem a lista inteira nos dois sentidos, uma consulta por página"""
+        paginator = KeysetPaginator(Protocolo.objects.all(), 5)
+        paginas = []
+        cursor = None
+        while True:
+            with self.assertNumQueries(1):
+                pagina = paginator.page(cursor)
+                paginas.append(list(pagina))
+            if not pagina.has_next():
+                break
+            cursor = pagina.next_cursor
+        self.assertEqual([p for pagina in paginas for p in pagina], self.esperado)
+        self.assertEqual([len(pagina) for pagina in paginas], [5, 5, 5, 5, 3])
+
+        voltando = []
+        while pagina.has_previous():
+            pagina = paginator.page(pagina.previous_cursor)
+            voltando.append(list(pagina))
+        self.assertEqual(voltando, paginas[-2::-1])
+
+    def test_cursor_com_faixa_na_primeira_chave(self):
+        """O filtro do cursor começa por uma faixa em data_emissao, fora do OR"""
+        paginator = KeysetPaginator(Protocolo.objects.all(), 5)
+        segunda = paginator.page(paginator.page().next_cursor)
+        for cursor, operador in ((segunda.next_cursor, '<='), (segunda.previous_cursor, '>=')):
+            with self.subTest(operador=operador), CaptureQueriesContext(connection) as ctx:
+                paginator.page(cursor)
+            where = ctx.captured_queries[0]['sql'].split(' WHERE ', 1)[1]
+            self.assertRegex(where, rf'^\("[a-z_]+"\."data_emissao" {operador} \S+ AND \(')
+
+    def test_cursor_alem_do_fim_volta_para_a_primeira_pagina(self):
+        """Um cursor cujas linhas seguintes foram excluídas não gera página vazia nem erro"""
+        paginator = KeysetPaginator(Protocolo.objects.all(), 5)
+        pagina = paginator.page(paginator.page().next_cursor)
+        cursor = pagina.next_cursor
+        Protocolo.objects.filter(pk__in=[p.pk for p in self.esperado[10:]]).delete()
+
+        self.assertEqual(list(paginator.page(cursor)), self.esperado[:5])
+        response = self.client.get(reverse('protocolos:lista'), {'paginacao': 'cursor', 'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_cursor_adulterado_volta_para_a_primeira_pagina(self):
+        """Valores do cursor que não convertem para o tipo do campo são tratados como cursor inválido"""
+        borda = self.esperado[4]
+        paginator = KeysetPaginator(Protocolo.objects.all(), 5)
+        for valores in (
+            [borda.data_emissao, borda.criado_em, 'abc'],
+            [borda.data_emissao, 'ontem', borda.pk],
+            ['2024-13-45', borda.criado_em, borda.pk],
+            [borda.data_emissao, borda.criado_em, {'id': 1}],
+        ):
+            with self.subTest(valores=valores):
+                self.assertEqual(list(paginator.page(encode_cursor(NEXT, valores))), self.esperado[:5])
+        response = self.client.get(reverse('protocolos:lista'), {
+            'paginacao': 'cursor', 'cursor': encode_cursor(NEXT, [borda.data_emissao, borda.criado_em, 'abc']),
+        })
+        self.assertEqual(response.status_code, 200)
+
+    def test_cursor_invalido_volta_para_a_primeira_pagina(self):
+        paginator = KeysetPaginator(Protocolo.objects.all(), 5)
+        self.assertEqual(list(paginator.page('nao-e-um-cursor')), self.esperado[:5])
+
+    def test_lista_em_modo_cursor_e_janela_de_paginas(self):
+        url = reverse('protocolos:lista')
+        response = self.client.get(url, {'paginacao': 'cursor', 'tipo': 'administrativo'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['modo_cursor'])
+        self.assertContains(response, f'cursor={response.context["page_obj"].next_cursor}')
+
+        response = self.client.get(url, {'page': 1})
+        self.assertFalse(response.context['modo_cursor'])
+        self.assertEqual(list(response.context['page_range']), [1, 2, 3])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ContagemTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(12):
+            Protocolo.objects.create(
+                numero=f'CNT{i:03d}', tipo='administrativo' if i % 2 else 'finalistico_pf',
+                cpf_cnpj=None if i % 2 else '52998224725', armario='1', prateleira='1', caixa='1',
+            )
+
+    def test_formatacao(self):
+        self.assertEqual(str(Contagem(12345)), '12.345')
+        self.assertEqual(str(Contagem(10000, limitada=True)), '10.000+')
+        self.assertEqual(str(Contagem(1500000, estimada=True)), '~1.500.000')
+        self.assertFalse(Contagem(10, limitada=True).exata)
+
+    @override_settings(PROTOCOLOS_COUNT_CAP=5)
+    def test_contagem_limitada_com_filtro(self):
+        qs = Protocolo.objects.filter(tipo='finalistico_pf')
+        self.assertEqual(contar(qs, filtrado=True), Contagem(5, limitada=True))
+        self.assertEqual(contar(qs, filtrado=True, exata=True), Contagem(6))
+
+    @override_settings(PROTOCOLOS_COUNT_CAP=50)
+    def test_abaixo_do_limite_e_exata(self):
+        self.assertEqual(contar(Protocolo.objects.all(), filtrado=False), Contagem(12))
+
+    @override_settings(PROTOCOLOS_COUNT_CAP=5)
+    def test_lista_nao_faz_count_completo(self):
+        """A lista limita a contagem e só conta tudo com ?contagem=exata"""
+        url = reverse('protocolos:lista')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'caixa': '1'})
+        self.assertEqual(str(response.context['total_protocolos']), '5+')
+        self.assertContains(response, 'contagem=exata')
+        contagens = [q['sql'] for q in queries.captured_queries if 'COUNT(*)' in q['sql'].upper()]
+        self.assertEqual(len(contagens), 1)
+        self.assertIn('LIMIT 6', contagens[0].upper())
+
+        response = self.client.get(url, {'caixa': '1', 'contagem': 'exata'})
+        self.assertEqual(response.context['total_protocolos'], Contagem(12))
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 2)
+
+
+    @override_settings(PROTOCOLOS_COUNT_CAP=5)
+    def test_paginas_alem_do_limite_da_contagem(self):
+        """Com a contagem limitada as páginas seguem até o fim real, inclusive na busca textual"""
+        url = reverse('protocolos:lista')
+        for filtro in ({'caixa': '1'}, {'q': 'CNT'}):
+            with self.subTest(filtro=filtro):
+                primeira = self.client.get(url, filtro).context['page_obj']
+                self.assertTrue(primeira.has_next())
+                self.assertEqual(len(primeira), 10)
+
+                segunda = self.client.get(url, {**filtro, 'page': 2}).context['page_obj']
+                self.assertEqual(segunda.number, 2)
+                self.assertEqual(len(segunda), 2)
+                self.assertFalse(segunda.has_next())
+
+                # Página além do fim real: a última conhecida, como no Paginator
+                self.assertEqual(self.client.get(url, {**filtro, 'page': 9}).context['page_obj'].number, 1)
+
+class IndicesProtocoloTest(TestCase):
+    """Cada combinação de filtros da lista deve usar um dos índices de Protocolo (EXPLAIN)"""
+
+    def setUp(self):
+        for i in range(60):
+            tipo = ('finalistico_pf', 'finalistico_pj', 'administrativo')[i % 3]
+            Protocolo.objects.create(
+                numero=f'IDX{i:03d}', tipo=tipo,
+                cpf_cnpj=('52998224725', '11222333000181', None)[i % 3],
+                unidade_crea=('sede_palmas', 'inspetoria_gurupi')[i % 2],
+                armario=str(i % 5), prateleira=str(i % 4), caixa=str(i % 7),
+                protocolo_sitac=None if i % 2 else f'S{i}',
+            )
+
+    def plano(self, qs):
+        if connection.vendor == 'postgresql':
+            # Com poucas linhas o planejador preferiria seq scan
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return qs.explain()
+
+    def test_filtros_da_lista_usam_indices(self):
+        hoje = timezone.localdate()
+        casos = [
+            ('protocolo_lista_idx', {}),
+            ('protocolo_lista_idx', {'data_emissao__gte': hoje}),
+            ('protocolo_unidade_lista_idx', {'unidade_crea': 'sede_palmas'}),
+            ('protocolo_unidade_lista_idx', {'unidade_crea': 'sede_palmas', 'data_emissao__lte': hoje}),
+            ('protocolo_tipo_lista_idx', {'tipo': 'administrativo'}),
+            ('protocolo_local_idx', {'armario': '1', 'prateleira': '2', 'caixa': '3'}),
+            ('protocolo_local_idx', {'armario': '1'}),
+        ]
+        for indice, filtros in casos:
+            with self.subTest(filtros=filtros):
+                self.assertIn(indice, self.plano(Protocolo.objects.filter(**filtros)[:10]))
+
+    @skipUnless(connection.vendor == 'postgresql', 'índice parcial só é escolhido pelo planejador do PostgreSQL')
+    def test_pendentes_sitac_usam_indice_parcial(self):
+        qs = Protocolo.objects.filter(tipo__in=('finalistico_pf', 'finalistico_pj')).filter(
+            Q(protocolo_sitac__isnull=True) | Q(protocolo_sitac='')
+        ).filter(pk__gt=0).order_by('pk')[:10]
+        self.assertIn('protocolo_sitac_pendente_idx', self.plano(qs))
+
+
+class QueryBudgetMixin:
+    """
+    Fixa quantas consultas uma view pode fazer. Um N+1 que volte a aparecer
+    estoura o orçamento e o teste falha listando o SQL executado.
+    """
+
+    def assertQueryBudget(self, budget, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        executadas = len(queries.captured_queries)
+        if executadas > budget:
+            sql = '\n'.join(f"{i}. {q['sql']}" for i, q in enumerate(queries.captured_queries, 1))
+            self.fail(f'{executadas} consultas para {url} (orçamento {budget}):\n{sql}')
+        return response
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class OrcamentoConsultasTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        from usuarios.models import PerfilUsuario
+
+        self.user = User.objects.create_user(username='orcamento', password='senha-de-teste')
+        PerfilUsuario.objects.create(user=self.user, cpf='529.982.247-25', conta_aprovada=True)
+        outro = User.objects.create_user(username='outro', password='senha-de-teste')
+        for i in range(110):
+            Protocolo.objects.create(
+                numero=f'ORC{i:03d}', tipo='administrativo',
+                armario='1', prateleira='1', caixa='1',
+                criado_por=self.user if i % 2 else outro,
+            )
+        self.protocolo = Protocolo.objects.first()
+        tipos = [
+            TipoDocumento.objects.create(categoria='administrativo', nome=f'Tipo {i}')
+            for i in range(3)
+        ]
+        for i in range(6):
+            Documento.objects.create(protocolo=self.protocolo, tipo_documento=tipos[i % 3])
+
+    def test_lista_anonima(self):
+        self.assertQueryBudget(3, reverse('protocolos:lista'), {'itens_por_pagina': 100})
+
+    def test_lista_autenticada_nao_depende_do_tamanho_da_pagina(self):
+        self.client.force_login(self.user)
+        url = reverse('protocolos:lista')
+        self.assertQueryBudget(6, url, {'itens_por_pagina': 10})
+        response = self.assertQueryBudget(6, url, {'itens_por_pagina': 100})
+        # Botões de edição só nos protocolos criados pelo usuário
+        self.assertContains(response, 'data-protocolo-id=', count=50)
+
+    def test_detalhe(self):
+        self.client.force_login(self.user)
+        response = self.assertQueryBudget(5, reverse('protocolos:detalhe', args=[self.protocolo.pk]))
+        self.assertContains(response, 'Tipo 2', count=2)
+
+    def test_dashboard(self):
+        self.client.force_login(self.user)
+        self.assertQueryBudget(5, reverse('usuarios:dashboard'))
+        # Estatísticas em cache: sobram sessão, usuário, perfil e recentes
+        self.assertQueryBudget(4, reverse('usuarios:dashboard'))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class EstatisticasDashboardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        Protocolo.objects.create(
+            numero='DSH001', tipo='finalistico_pf', cpf_cnpj='52998224725',
+            unidade_crea='inspetoria_gurupi', protocolo_sitac='S-1',
+        )
+        Protocolo.objects.create(numero='DSH002', tipo='finalistico_pj', cpf_cnpj='11222333000181')
+        Protocolo.objects.create(numero='DSH003', tipo='administrativo')
+
+    def test_metricas_em_uma_consulta(self):
+        with self.assertNumQueries(1):
+            stats = dashboard_stats()
+        self.assertEqual(stats['total'], 3)
+        self.assertEqual(stats['criados_hoje'], 3)
+        self.assertEqual(stats['sitac_enviados'], 1)
+        self.assertEqual(stats['sitac_pendentes'], 1)
+        por_tipo = {valor: total for valor, _, total in stats['por_tipo']}
+        self.assertEqual(por_tipo, {'finalistico_pf': 1, 'finalistico_pj': 1, 'administrativo': 1})
+        por_unidade = {valor: total for valor, _, total in stats['por_unidade'] if total}
+        self.assertEqual(por_unidade, {'sede_palmas': 2, 'inspetoria_gurupi': 1})
+        self.assertEqual(dashboard_stats(hoje=timezone.localdate() + datetime.timedelta(days=1))['criados_hoje'], 0)
+
+    def test_cache_invalidado_ao_gravar(self):
+        dashboard_stats()
+        with self.assertNumQueries(0):
+            dashboard_stats()
+        Protocolo.objects.get(numero='DSH002').delete()
+        self.assertEqual(dashboard_stats()['total'], 2)
+
+
+class CriarProtocoloDocumentosTest(TestCase):
+    def setUp(self):
+        from usuarios.models import PerfilUsuario
+
+        self.user = User.objects.create_user(username='publicador', password='senha-de-teste')
+        PerfilUsuario.objects.create(user=self.user, cpf='529.982.247-25', conta_aprovada=True, pode_publicar=True)
+        self.client.force_login(self.user)
+        self.tipos = [
+            TipoDocumento.objects.create(categoria='administrativo', nome=f'Ofício {i}')
+            for i in range(3)
+        ]
+        self.inativo = TipoDocumento.objects.create(categoria='administrativo', nome='Antigo', ativo=False)
+        self.outra_categoria = TipoDocumento.objects.create(categoria='finalistico_pf', nome='RG')
+
+    def _post(self, tipos):
+        data = {'numero': 'CRD001', 'tipo': 'administrativo', 'unidade_crea': 'sede_palmas'}
+        for i, tipo in enumerate(tipos):
+            data[f'documentos[{i}][tipo_documento]'] = str(tipo.pk)
+            data[f'documentos[{i}][observacoes]'] = f'obs {i}'
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('protocolos:criar'), data)
+        return response, [query['sql'] for query in ctx.captured_queries]
+
+    def test_documentos_em_lote(self):
+        response, sqls = self._post(self.tipos * 4)
+        protocolo = Protocolo.objects.get(numero='CRD001')
+        self.assertRedirects(response, reverse('protocolos:detalhe', args=[protocolo.pk]), fetch_redirect_response=False)
+        self.assertEqual(protocolo.documentos.count(), 12)
+        tabela_tipos = TipoDocumento._meta.db_table
+        tabela_documentos = Documento._meta.db_table
+        self.assertEqual(sum(1 for sql in sqls if sql.startswith('SELECT') and f'FROM "{tabela_tipos}"' in sql), 1)
+        self.assertEqual(sum(1 for sql in sqls if sql.startswith(f'INSERT INTO "{tabela_documentos}"')), 1)
+
+    def test_tipo_invalido_nao_grava_nada(self):
+        for tipo in (self.inativo, self.outra_categoria):
+            response, _ = self._post([self.tipos[0], tipo])
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'tipos de documento inválidos')
+            self.assertFalse(Protocolo.objects.filter(numero='CRD001').exists())
+        self.assertFalse(Documento.objects.exists())
+
+
+class EstatisticaDiariaTest(TestCase):
+    def _total(self, unidade, tipo):
+        linha = EstatisticaDiariaProtocolo.objects.filter(
+            data=timezone.localdate(), unidade_crea=unidade, tipo=tipo
+        ).first()
+        return linha.total if linha else 0
+
+    def test_criacao_troca_e_exclusao(self):
+        a = Protocolo.objects.create(numero='RLP001', tipo='administrativo')
+        Protocolo.objects.create(numero='RLP002', tipo='administrativo')
+        self.assertEqual(self._total('sede_palmas', 'administrativo'), 2)
+
+        a = Protocolo.objects.get(pk=a.pk)
+        a.unidade_crea = 'inspetoria_gurupi'
+        a.save()
+        self.assertEqual(self._total('sede_palmas', 'administrativo'), 1)
+        self.assertEqual(self._total('inspetoria_gurupi', 'administrativo'), 1)
+
+        # Salvar sem mudar a chave não altera o rollup
+        a.observacoes = 'sem efeito'
+        a.save()
+        self.assertEqual(self._total('inspetoria_gurupi', 'administrativo'), 1)
+
+        Protocolo.objects.filter(numero='RLP002').delete()
+        a.delete()
+        self.assertEqual(self._total('sede_palmas', 'administrativo'), 0)
+        self.assertEqual(self._total('inspetoria_gurupi', 'administrativo'), 0)
+        self.assertEqual(divergencias(), [])
+
+    def test_serie_diaria(self):
+        Protocolo.objects.create(numero='RLP003', tipo='finalistico_pj', cpf_cnpj='11222333000181')
+        Protocolo.objects.create(numero='RLP004', tipo='administrativo')
+        hoje = timezone.localdate()
+        self.assertEqual(serie_diaria(hoje, hoje), [(hoje, 2)])
+        self.assertEqual(serie_diaria(hoje, hoje, tipo='finalistico_pj'), [(hoje, 1)])
+        self.assertEqual(serie_diaria(hoje, hoje, unidade_crea='inspetoria_gurupi'), [])
+
+    def test_comando_verifica_e_reconstroi(self):
+        Protocolo.objects.create(numero='RLP005', tipo='administrativo')
+        # update() não dispara signals: o rollup fica desatualizado
+        Protocolo.objects.filter(numero='RLP005').update(tipo='finalistico_pf', cpf_cnpj='52998224725')
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('estatisticas_diarias', '--verificar', stdout=out)
+        self.assertIn('rollup 1, real 0', out.getvalue())
+
+        call_command('estatisticas_diarias', stdout=StringIO())
+        self.assertEqual(self._total('sede_palmas', 'finalistico_pf'), 1)
+        self.assertEqual(self._total('sede_palmas', 'administrativo'), 0)
+        call_command('estatisticas_diarias', '--verificar', stdout=StringIO())
+
+
+class LinhasListaTest(TestCase):
+    def setUp(self):
+        Protocolo.objects.create(
+            numero='LIN001', tipo='finalistico_pf', cpf_cnpj='52998224725',
+            unidade_crea='inspetoria_gurupi', armario='1', prateleira='2', caixa='3',
+            observacoes='texto longo ' * 500,
+        )
+        Protocolo.objects.create(numero='LIN002', tipo='administrativo')
+
+    def test_lista_busca_so_as_colunas_exibidas(self):
+        url = reverse('protocolos:lista')
+        for params in ({}, {'paginacao': 'cursor'}):
+            with self.subTest(params=params), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            pagina = [q['sql'] for q in queries.captured_queries if 'ORDER BY' in q['sql']]
+            self.assertEqual(len(pagina), 1)
+            self.assertNotIn('observacoes', pagina[0])
+            linhas = {linha.numero: linha for linha in response.context['page_obj']}
+            self.assertIsInstance(linhas['LIN001'], ProtocoloRow)
+            self.assertEqual(linhas['LIN001'].cpf_cnpj_formatado, '529.982.247-25')
+            self.assertEqual(linhas['LIN001'].unidade_crea_display, 'INSPETORIA DE GURUPI')
+            self.assertEqual(linhas['LIN002'].local, '')
+            self.assertContains(response, 'A1 - P2 - C3')
+
+    def test_busca_mantem_a_ordem_por_relevancia(self):
+        response = self.client.get(reverse('protocolos:lista'), {'q': 'LIN002'})
+        self.assertEqual([linha.numero for linha in response.context['page_obj']], ['LIN002'])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class FacetasTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(9):
+            Protocolo.objects.create(
+                numero=f'FAC{i:03d}', tipo='administrativo' if i < 6 else 'finalistico_pf',
+                cpf_cnpj=None if i < 6 else '52998224725',
+                unidade_crea='sede_palmas' if i % 3 else 'inspetoria_gurupi',
+            )
+        # Um protocolo emitido no mês anterior
+        antigo = Protocolo.objects.get(numero='FAC000')
+        self.hoje = timezone.localdate()
+        self.mes_anterior = (self.hoje.replace(day=1) - datetime.timedelta(days=1)).replace(day=1)
+        Protocolo.objects.filter(pk=antigo.pk).update(data_emissao=self.mes_anterior)
+
+    def test_cada_faceta_ignora_o_proprio_filtro(self):
+        filtros = ProtocoloFiltros(tipo='administrativo')
+        with self.assertNumQueries(1):
+            facetas = facet_counts(filtros, self.hoje)
+        tipos = {valor: total for valor, _, total in facetas['tipo']}
+        self.assertEqual(tipos['administrativo'], 6)
+        self.assertEqual(tipos['finalistico_pf'], 3)
+        unidades = {valor: total for valor, _, total in facetas['unidade_crea']}
+        self.assertEqual(unidades['inspetoria_gurupi'], 2)
+        self.assertEqual(unidades['sede_palmas'], 4)
+        meses = {inicio: total for inicio, _, total in facetas['mes']}
+        self.assertEqual(meses[self.hoje.replace(day=1)], 5)
+        self.assertEqual(meses[self.mes_anterior], 1)
+
+        # Em cache até o TTL
+        with self.assertNumQueries(0):
+            self.assertEqual(facet_counts(filtros, self.hoje), facetas)
+
+    def test_periodo_filtra_as_outras_facetas(self):
+        filtros = ProtocoloFiltros(data_inicio=self.hoje.replace(day=1).isoformat())
+        facetas = facet_counts(filtros, self.hoje)
+        self.assertEqual(sum(total for _, _, total in facetas['tipo']), 8)
+        self.assertEqual({inicio: total for inicio, _, total in facetas['mes']}[self.mes_anterior], 1)
+
+    def test_lista_mostra_as_facetas(self):
+        response = self.client.get(reverse('protocolos:lista'), {'unidade_crea': 'inspetoria_gurupi'})
+        self.assertContains(response, 'Processo Administrativo (2)')
+        self.assertContains(response, 'SEDE - PALMAS (6)')
+        self.assertContains(response, f'data_inicio={self.mes_anterior.isoformat()}')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CacheRespostasTest(TestCase):
+    def setUp(self):
+        from usuarios.models import PerfilUsuario
+
+        cache.clear()
+        self.dono = User.objects.create_user(username='dono', password='senha-de-teste')
+        PerfilUsuario.objects.create(user=self.dono, cpf='529.982.247-25', conta_aprovada=True)
+        self.outro = User.objects.create_user(username='visitante', password='senha-de-teste')
+        PerfilUsuario.objects.create(user=self.outro, cpf='111.444.777-35', conta_aprovada=True)
+        self.meu = Protocolo.objects.create(numero='CAC001', tipo='administrativo', criado_por=self.dono)
+        self.alheio = Protocolo.objects.create(numero='CAC002', tipo='administrativo')
+        self.url = reverse('protocolos:lista')
+
+    def test_anonimo_recebe_a_pagina_do_cache_ate_uma_gravacao(self):
+        primeira = self.client.get(self.url)
+        self.assertNotContains(primeira, 'csrfmiddlewaretoken')
+        with self.assertNumQueries(0):
+            segunda = self.client.get(self.url)
+        self.assertEqual(segunda.content, primeira.content)
+
+        Protocolo.objects.create(numero='CAC003', tipo='administrativo')
+        self.assertContains(self.client.get(self.url), 'CAC003')
+
+    def test_etag_permite_304(self):
+        response = self.client.get(self.url)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        Documento.objects.create(
+            protocolo=self.meu,
+            tipo_documento=TipoDocumento.objects.create(categoria='administrativo', nome='Ofício'),
+        )
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_detalhe_anonimo_em_cache(self):
+        url = reverse('protocolos:detalhe', args=[self.meu.pk])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(url), 'CAC001')
+
+    def test_fragmento_compartilhado_com_botoes_por_usuario(self):
+        self.client.force_login(self.dono)
+        response = self.client.get(self.url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertContains(response, f'data-protocolo-id="{self.meu.pk}"')
+        self.assertNotContains(response, f'data-protocolo-id="{self.alheio.pk}"')
+        self.assertNotContains(response, MARCA_ACOES)
+
+        self.client.force_login(self.outro)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertFalse([q for q in queries.captured_queries if 'protocolos_protocolo' in q['sql']])
+        self.assertNotContains(response, 'data-protocolo-id=')
+        self.assertContains(response, 'CAC002')
+
+    def test_mensagem_apos_redirect_nao_vira_304(self):
+        """Edição negada redireciona para o detalhe, que mostra a mensagem em vez de responder 304"""
+        self.client.force_login(self.outro)
+        url = reverse('protocolos:detalhe', args=[self.meu.pk])
+        self.client.get(url)  # recebe o cookie CSRF
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(reverse('protocolos:editar', args=[self.meu.pk]), HTTP_IF_NONE_MATCH=etag, follow=True)
+        self.assertEqual(response.redirect_chain, [(url, 302)])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Você não tem permissão para editar este protocolo.')
+
+        # Mensagem exibida: a revalidação volta a valer
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_etag_muda_com_nova_sessao(self):
+        """Um novo login (nova sessão e token CSRF) não recebe 304 da página com o token antigo"""
+        self.client.force_login(self.dono)
+        self.client.get(self.url)  # recebe o cookie CSRF
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.logout()
+        self.client.force_login(self.dono)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_resposta_do_sitac_invalida_o_cache(self):
+        versao = data_version()
+        registro = RegistroEnvioSITAC.objects.create(protocolo=self.meu, payload_hash='x', payload={})
+        finish_submission(self.meu, registro, True, {'protocolo': 'SITAC-1'})
+        self.assertGreater(data_version(), versao)
+
+
+class ExportacaoTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auditor', password='senha-de-teste')
+        tipo = TipoDocumento.objects.create(categoria='finalistico_pf', nome='RG')
+        outro = TipoDocumento.objects.create(categoria='finalistico_pf', nome='Comprovante; endereço')
+        for i in range(7):
+            protocolo = Protocolo.objects.create(
+                numero=f'EXP{i:03d}', tipo='finalistico_pf', cpf_cnpj='52998224725',
+                unidade_crea='sede_palmas' if i < 5 else 'inspetoria_gurupi',
+            )
+            Documento.objects.create(protocolo=protocolo, tipo_documento=tipo)
+            Documento.objects.create(protocolo=protocolo, tipo_documento=outro)
+
+    def _conteudo(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_exige_login(self):
+        response = self.client.get(reverse('protocolos:exportar'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_csv_com_filtros_da_lista_e_documentos(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('protocolos:exportar'), {'unidade_crea': 'sede_palmas'})
+        self.assertTrue(response.streaming)
+        linhas = list(csv.reader(io.StringIO(self._conteudo(response).decode('utf-8-sig')), delimiter=';'))
+        self.assertEqual(linhas[0][0], 'Número')
+        self.assertEqual(len(linhas), 6)
+        self.assertEqual(linhas[1][2], '529.982.247-25')
+        self.assertEqual(linhas[1][-1], 'RG; Comprovante; endereço')
+
+    def test_csv_neutraliza_formulas(self):
+        """Textos que o Excel leria como fórmula saem com "'" na frente, só no CSV"""
+        TipoDocumento.objects.filter(nome='RG').update(nome='=HYPERLINK("http://x")')
+        Protocolo.objects.filter(numero='EXP000').update(numero='@SUM(1)', protocolo_sitac='-1+1')
+        linhas = list(csv.reader(
+            io.StringIO(''.join(csv_stream(export_rows(Protocolo.objects.filter(numero='@SUM(1)')))).lstrip('\ufeff')),
+            delimiter=';',
+        ))
+        self.assertEqual(linhas[1][0], "'@SUM(1)")
+        self.assertEqual(linhas[1][8], "'-1+1")
+        self.assertEqual(linhas[1][-1], '\'=HYPERLINK("http://x"); Comprovante; endereço')
+        self.assertEqual(linhas[1][2], '529.982.247-25')
+
+    def test_documentos_uma_consulta_por_lote(self):
+        qs = Protocolo.objects.all()
+        with self.assertNumQueries(1 + 3):  # um cursor de protocolos + documentos de cada lote de 3
+            linhas = list(export_rows(qs, chunk_size=3))
+        self.assertEqual(len(linhas), 8)
+
+    def test_xlsx_valido(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('protocolos:exportar'), {'formato': 'xlsx', 'q': 'EXP00'})
+        with zipfile.ZipFile(io.BytesIO(self._conteudo(response))) as xlsx:
+            self.assertIsNone(xlsx.testzip())
+            planilha = xlsx.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(planilha.count('<row>'), 8)
+        self.assertIn('Comprovante; endereço', planilha)
+
+
+class ImportacaoTest(TestCase):
+    def setUp(self):
+        self.rg = TipoDocumento.objects.create(categoria='finalistico_pf', nome='RG')
+        TipoDocumento.objects.create(categoria='finalistico_pf', nome='Antigo', ativo=False)
+        Protocolo.objects.create(numero='IMP-EXISTE', tipo='administrativo')
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def _arquivo(self, nome, conteudo):
+        caminho = os.path.join(self.dir.name, nome)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        return caminho
+
+    def _importar(self, caminho, *args):
+        out = StringIO()
+        call_command('importar_protocolos', caminho, *args, stdout=out)
+        return out.getvalue()
+
+    def _jsonl(self):
+        registros = [
+            {'numero': 'IMP001', 'tipo': 'finalistico_pf', 'cpf_cnpj': '529.982.247-25',
+             'unidade': 'inspetoria_gurupi', 'armario': '1', 'prateleira': '2', 'caixa': '3', 'documentos': ['rg']},
+            {'numero': 'IMP002', 'tipo': 'Processo Administrativo', 'unidade': 'SEDE - PALMAS'},
+            {'numero': 'IMP003', 'tipo': 'administrativo', 'cpf_cnpj': '52998224725', 'unidade': 'sede_palmas'},
+            {'numero': 'IMP004', 'tipo': 'finalistico_pj', 'unidade': 'sede_palmas'},
+            {'numero': 'IMP005', 'tipo': 'administrativo', 'unidade': 'sede_palmas', 'armario': 'A'},
+            {'numero': 'IMP001', 'tipo': 'administrativo', 'unidade': 'sede_palmas'},
+            {'numero': 'IMP-EXISTE', 'tipo': 'administrativo', 'unidade': 'sede_palmas'},
+            {'numero': 'IMP006', 'tipo': 'finalistico_pf', 'cpf_cnpj': '52998224725',
+             'unidade': 'sede_palmas', 'documentos': 'Antigo'},
+            {'numero': 'IMP007', 'tipo': 'desconhecido', 'unidade': 'sede_palmas'},
+        ]
+        linhas = [json.dumps(registro) for registro in registros] + ['{quebrado']
+        return self._arquivo('protocolos.jsonl', '\n'.join(linhas) + '\n')
+
+    def test_valida_como_o_cadastro_e_relata_por_linha(self):
+        relatorio = os.path.join(self.dir.name, 'erros.csv')
+        saida = self._importar(self._jsonl(), '--relatorio', relatorio, '--chunk-size', '4')
+        self.assertIn('Registros lidos: 10', saida)
+        self.assertIn('importados: 2', saida)
+        self.assertIn('com erro: 8', saida)
+
+        importado = Protocolo.objects.get(numero='IMP001')
+        self.assertEqual(importado.cpf_cnpj, '52998224725')
+        self.assertEqual(importado.unidade_crea, 'inspetoria_gurupi')
+        self.assertEqual([d.tipo_documento for d in importado.documentos.all()], [self.rg])
+        self.assertEqual(Protocolo.objects.get(numero='IMP002').tipo, 'administrativo')
+        # bulk_create não dispara signals: o envio ao SITAC só com --enviar-sitac
+        self.assertFalse(EnvioSITAC.objects.exists())
+        self.assertEqual(divergencias(), [])
+
+        with open(relatorio, encoding='utf-8-sig') as arquivo:
+            erros = {(int(linha), campo) for linha, campo, _ in list(csv.reader(arquivo, delimiter=';'))[1:]}
+        self.assertEqual(erros, {
+            (3, 'cpf_cnpj'), (4, 'cpf_cnpj'), (5, 'armario'), (6, 'numero'), (7, 'numero'),
+            (8, 'documentos'), (9, 'tipo'), (10, '__all__'),
+        })
+
+    def test_dry_run_nao_grava(self):
+        versao = data_version()
+        saida = self._importar(self._jsonl(), '--dry-run')
+        self.assertIn('seriam importados): 2', saida)
+        self.assertEqual(Protocolo.objects.count(), 1)
+        self.assertEqual(data_version(), versao)
+
+    def test_csv_da_exportacao(self):
+        outro = Protocolo.objects.create(
+            numero='IMP-CSV', tipo='finalistico_pf', cpf_cnpj='52998224725',
+            unidade_crea='inspetoria_gurupi', armario='4', prateleira='5', caixa='6',
+        )
+        Documento.objects.create(protocolo=outro, tipo_documento=self.rg)
+        Protocolo.objects.filter(pk=outro.pk).update(data_emissao=datetime.date(2023, 11, 20))
+        conteudo = ''.join(csv_stream(export_rows(Protocolo.objects.filter(numero='IMP-CSV'))))
+        outro.delete()
+
+        caminho = self._arquivo('exportado.csv', conteudo)
+        saida = self._importar(caminho, '--enviar-sitac')
+        self.assertIn('importados: 1', saida)
+        importado = Protocolo.objects.get(numero='IMP-CSV')
+        self.assertEqual((importado.armario, importado.prateleira, importado.caixa), ('4', '5', '6'))
+        self.assertEqual(importado.unidade_crea, 'inspetoria_gurupi')
+        self.assertEqual(importado.data_emissao, datetime.date(2023, 11, 20))
+        self.assertEqual(importado.documentos.count(), 1)
+        self.assertTrue(EnvioSITAC.objects.filter(protocolo=importado).exists())
+
+    def test_data_de_emissao_do_arquivo(self):
+        """data_emissao é opcional; quando vem no arquivo, vale para o protocolo e para o rollup"""
+        amanha = (timezone.localdate() + datetime.timedelta(days=1)).isoformat()
+        registros = [
+            {'numero': 'DAT001', 'tipo': 'administrativo', 'unidade': 'sede_palmas', 'data_emissao': '2024-03-05'},
+            {'numero': 'DAT002', 'tipo': 'administrativo', 'unidade': 'sede_palmas', 'data de emissão': '06/03/2024'},
+            {'numero': 'DAT003', 'tipo': 'administrativo', 'unidade': 'sede_palmas'},
+            {'numero': 'DAT004', 'tipo': 'administrativo', 'unidade': 'sede_palmas', 'data_emissao': '31/02/2024'},
+            {'numero': 'DAT005', 'tipo': 'administrativo', 'unidade': 'sede_palmas', 'data_emissao': amanha},
+        ]
+        caminho = self._arquivo('datas.jsonl', '\n'.join(json.dumps(registro) for registro in registros))
+        saida = self._importar(caminho)
+        self.assertIn('importados: 3', saida)
+        self.assertIn('Linha 4 [data_emissao]', saida)
+        self.assertIn('Linha 5 [data_emissao]', saida)
+
+        datas = dict(Protocolo.objects.filter(numero__startswith='DAT').values_list('numero', 'data_emissao'))
+        self.assertEqual(datas, {
+            'DAT001': datetime.date(2024, 3, 5),
+            'DAT002': datetime.date(2024, 3, 6),
+            'DAT003': timezone.localdate(),
+        })
+        self.assertEqual(divergencias(), [])
+
+    def test_validacao_em_paralelo(self):
+        linhas = '\n'.join(
+            json.dumps({'numero': f'PAR{i:03d}', 'tipo': 'administrativo', 'unidade': 'sede_palmas'})
+            for i in range(30)
+        )
+        saida = self._importar(self._arquivo('paralelo.jsonl', linhas), '--workers', '2', '--chunk-size', '7')
+        self.assertIn('importados: 30', saida)
+        self.assertEqual(Protocolo.objects.filter(numero__startswith='PAR').count(), 30)
+
+
+    def test_validacao_em_paralelo_le_o_arquivo_aos_poucos(self):
+        """Com processos, no máximo workers * 2 lotes são lidos à frente do que já foi gravado"""
+        lidos = []
+
+        def lotes():
+            for i in range(20):
+                lidos.append(i)
+                yield [(i, {'numero': f'LOT{i:03d}', 'tipo': 'administrativo', 'unidade': 'sede_palmas'})]
+
+        resultados = importacao._validar(lotes(), 2, '')
+        self.assertEqual(next(resultados)[0][0], 0)
+        self.assertLessEqual(len(lidos), 4)
+        self.assertEqual([lote[0][0] for lote in resultados], list(range(1, 20)))
+
+class ValidacaoCpfCnpjLoteTest(TestCase):
+    VALORES = [
+        '52998224725', '529.982.247-25', '52998224724', '11111111111', '5299822472', '',
+        None, 'abc', '11222333000181', '11.222.333/0001-81', '11222333000182', '00000000000000',
+        '١١١٤٤٤٧٧٧٣٥', '111.444.777-35', '12345678909', '45723174000110',
+    ]
+
+    def _confere(self):
+        self.assertEqual(cpf_cnpj.validate_cpf_batch(self.VALORES), [_validate_cpf(valor) for valor in self.VALORES])
+        self.assertEqual(cpf_cnpj.validate_cnpj_batch(self.VALORES), [_validate_cnpj(valor) for valor in self.VALORES])
+        self.assertEqual(
+            cpf_cnpj.validate_cpf_cnpj_batch(['529.982.247-25', '11222333000181', '123', '11222333000182']),
+            [True, True, False, False],
+        )
+
+    @skipUnless(cpf_cnpj.np is not None, 'NumPy não instalado')
+    def test_vetorizado_concorda_com_os_validadores_escalares(self):
+        self._confere()
+
+    def test_fallback_sem_numpy(self):
+        with mock.patch.object(cpf_cnpj, 'np', None):
+            self._confere()
+
+    def test_auditoria(self):
+        Protocolo.objects.create(numero='AUD001', tipo='finalistico_pf', cpf_cnpj='52998224725')
+        Protocolo.objects.create(numero='AUD002', tipo='finalistico_pj', cpf_cnpj='11222333000181')
+        ruim_pf = Protocolo.objects.create(numero='AUD003', tipo='finalistico_pf', cpf_cnpj='52998224725')
+        ruim_pj = Protocolo.objects.create(numero='AUD004', tipo='finalistico_pj', cpf_cnpj='11222333000181')
+        adm = Protocolo.objects.create(numero='AUD005', tipo='administrativo')
+        # Dados antigos gravados sem passar pelas validações
+        Protocolo.objects.filter(pk=ruim_pf.pk).update(cpf_cnpj='52998224724')
+        Protocolo.objects.filter(pk=ruim_pj.pk).update(cpf_cnpj='11222333000182')
+        Protocolo.objects.filter(pk=adm.pk).update(cpf_cnpj='52998224725')
+
+        out = StringIO()
+        call_command('auditar_cpf_cnpj', '--chunk-size', '2', stdout=out)
+        saida = out.getvalue()
+        self.assertIn('verificados: 5', saida)
+        self.assertIn('AUD003', saida)
+        self.assertIn('AUD004', saida)
+        self.assertIn('AUD005', saida)
+        self.assertNotIn('AUD001', saida)
+        self.assertIn('3 protocolo(s) com CPF/CNPJ a corrigir', saida)
@@ -0,0 +1,11 @@
+import math
+from typing import List
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile (p in 0..100) of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
@@ -1,24 +1,74 @@
+import hmac
+from urllib.parse import urlencode
+
+from django.core.cache import cache
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Prefetch
 from django.shortcuts import render, get_object_or_404, redirect
-from django.utils.dateparse import parse_date
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from .models import Protocolo, LocalArmazenamento, TipoDocumento, Documento
 from .forms import ProtocoloForm
-from .sitac_service import SITACService
+from . import sitac_metrics, sitac_resilience
+from .cadastro import criar_protocolo
+from .caching import (
+    conditional_page, fill_actions, has_pending_messages, response_cache_key, response_ttl,
+    revalidate, split_fragment,
+)
+from .counting import ContagemPaginator, contar
+from .export import csv_stream, export_rows, xlsx_stream
+from .facets import facet_counts
+from .filters import ProtocoloFiltros
+from .pagination import KeysetPaginator
+from .rows import build_rows, project
+from .sitac_outbox import TIPOS_FINALISTICOS
+from .sitac_transport import pool_stats
+
+def _lista_tabela(filtros_lista, filtros, itens_por_pagina, modo_cursor, cursor, page_number):
+    """Consultas da tabela da lista: contagem, página atual e janela de páginas"""
+    qs = filtros_lista.apply(Protocolo.objects.all())
+
+    # Total barato: estimativa sem filtros, limitado com filtros; exato só a pedido
+    total_protocolos = contar(qs, filtros_lista.ativo, exata=bool(filtros["contagem"]))
+
+    # Só as colunas exibidas, em linhas leves com os textos já formatados
+    linhas = project(qs)
+    if modo_cursor:
+        page_obj = KeysetPaginator(linhas, itens_por_pagina).page(cursor)
+        page_range = None
+    else:
+        paginator = ContagemPaginator(linhas, itens_por_pagina, total_protocolos)
+        page_obj = paginator.get_page(page_number)
+        # Janela de páginas com reticências em vez de um link por página
+        page_range = list(paginator.get_elided_page_range(page_obj.number, on_each_side=2, on_ends=1))
+    page_obj.object_list = build_rows(page_obj.object_list)
+
+    return {
+        "page_obj": page_obj,
+        "page_range": page_range,
+        "ellipsis": Paginator.ELLIPSIS,
+        "total_protocolos": total_protocolos,
+    }
 
+@conditional_page
 def protocolo_list(request):
     """Lista todos os protocolos com filtros e paginação"""
-    q = request.GET.get("q", "").strip()
-    tipo = request.GET.get("tipo", "")
-    unidade_crea = request.GET.get("unidade_crea", "")
-    armario = request.GET.get("armario", "").strip()
-    prateleira = request.GET.get("prateleira", "").strip()
-    caixa = request.GET.get("caixa", "").strip()
-    data_inicio = request.GET.get("data_inicio", "")
-    data_fim = request.GET.get("data_fim", "")
+    # Anônimos recebem a página inteira do cache (exceto com mensagens pendentes)
+    anonimo = not request.user.is_authenticated
+    usar_cache = anonimo and not has_pending_messages(request)
+    if usar_cache:
+        chave_cache = response_cache_key("lista", request)
+        conteudo = cache.get(chave_cache)
+        if conteudo is not None:
+            return revalidate(HttpResponse(conteudo), request)
+
+    filtros_lista = ProtocoloFiltros.from_query(request.GET)
     itens_por_pagina = request.GET.get("itens_por_pagina", "10")
     
     try:
@@ -28,63 +78,38 @@ def protocolo_list(request):
     except ValueError:
         itens_por_pagina = 10
     
-    qs = Protocolo.objects.all()
-    
-    if q:
-        qs = qs.filter(
-            Q(numero__icontains=q) |
-            Q(cpf_cnpj__icontains=q) |
-            Q(armario__icontains=q) |
-            Q(prateleira__icontains=q) |
-            Q(caixa__icontains=q) |
-            Q(observacoes__icontains=q)
-        )
-    
-    if tipo:
-        qs = qs.filter(tipo=tipo)
+    q = filtros_lista.q
     
-    if unidade_crea:
-        qs = qs.filter(unidade_crea=unidade_crea)
-    
-    if armario:
-        qs = qs.filter(armario=armario)
-    
-    if prateleira:
-        qs = qs.filter(prateleira=prateleira)
-    
-    if caixa:
-        qs = qs.filter(caixa=caixa)
-    
-    if data_inicio:
-        try:
-            data_inicio_parsed = parse_date(data_inicio)
-            if data_inicio_parsed:
-                qs = qs.filter(data_emissao__gte=data_inicio_parsed)
-        except (ValueError, TypeError):
-            pass
-    
-    if data_fim:
-        try:
-            data_fim_parsed = parse_date(data_fim)
-            if data_fim_parsed:
-                qs = qs.filter(data_emissao__lte=data_fim_parsed)
-        except (ValueError, TypeError):
-            pass
-    
-    paginator = Paginator(qs, itens_por_pagina)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    # Paginação por cursor: custo constante em qualquer profundidade, sem COUNT(*).
+    # A busca textual é ordenada por relevância, então usa sempre a paginação numerada.
+    modo_cursor = request.GET.get("paginacao") == "cursor" and not q
+    filtros = {
+        **filtros_lista.as_dict(),
+        "itens_por_pagina": itens_por_pagina,
+        "contagem": "exata" if request.GET.get("contagem") == "exata" else "",
+    }
+    filtros_query_paginas = urlencode({chave: valor for chave, valor in filtros.items() if valor})
+    filtros_query = f"paginacao=cursor&{filtros_query_paginas}" if modo_cursor else filtros_query_paginas
+
+    # Quantos protocolos cada opção de filtro retornaria (uma consulta, em cache)
+    facetas = facet_counts(filtros_lista)
+    sem_periodo = {
+        chave: valor for chave, valor in filtros.items()
+        if valor and chave not in ("data_inicio", "data_fim", "contagem")
+    }
+    facetas_mes = [
+        (inicio, total, urlencode({**sem_periodo, "data_inicio": inicio.isoformat(), "data_fim": fim.isoformat()}))
+        for inicio, fim, total in facetas["mes"]
+        if total
+    ]
     
     context = {
-        "page_obj": page_obj,
-        "q": q,
-        "tipo": tipo,
-        "unidade_crea": unidade_crea,
-        "armario": armario,
-        "prateleira": prateleira,
-        "caixa": caixa,
-        "data_inicio": data_inicio,
-        "data_fim": data_fim,
+        "modo_cursor": modo_cursor,
+        "filtros_query": filtros_query,
+        "filtros_query_paginas": filtros_query_paginas,
+        "facetas": facetas,
+        "facetas_mes": facetas_mes,
+        **filtros_lista.as_dict(),
         "itens_por_pagina": itens_por_pagina,
         "tipos": Protocolo.TIPO_CHOICES,
         "unidades_crea": Protocolo.UNIDADE_CHOICES,
@@ -92,20 +117,99 @@ def protocolo_list(request):
         "user_can_edit": request.user.is_authenticated and hasattr(request.user, 'perfil') and request.user.perfil.can_edit,
         "user_can_publish": request.user.is_authenticated and hasattr(request.user, 'perfil') and request.user.perfil.can_publish,
     }
-    return render(request, "protocolos/lista.html", context)
+    tabela_args = (
+        filtros_lista, filtros, itens_por_pagina, modo_cursor,
+        request.GET.get("cursor"), request.GET.get("page"),
+    )
+
+    if anonimo:
+        context.update(_lista_tabela(*tabela_args))
+        response = revalidate(render(request, "protocolos/lista.html", context), request)
+        if usar_cache:
+            cache.set(chave_cache, response.content, response_ttl())
+        return response
+
+    # Autenticados: a tabela vem do cache sem os botões, preenchidos por usuário
+    chave_tabela = response_cache_key("lista-tabela", request)
+    fragmento = cache.get(chave_tabela)
+    if fragmento is None:
+        tabela = _lista_tabela(*tabela_args)
+        html = render_to_string("protocolos/_tabela.html", {**context, **tabela, "marcar_acoes": True}, request)
+        fragmento = split_fragment(html, tabela["page_obj"])
+        cache.set(chave_tabela, fragmento, response_ttl())
+    context["tabela_html"] = mark_safe(fill_actions(fragmento, request.user, context["user_can_edit"]))
+    return revalidate(render(request, "protocolos/lista.html", context), request)
 
+@conditional_page
 def protocolo_detail(request, pk):
     """Visualiza detalhes de um protocolo específico"""
-    protocolo = get_object_or_404(Protocolo, pk=pk)
-    
+    usar_cache = not request.user.is_authenticated and not has_pending_messages(request)
+    if usar_cache:
+        chave_cache = response_cache_key("detalhe", request, pk)
+        conteudo = cache.get(chave_cache)
+        if conteudo is not None:
+            return revalidate(HttpResponse(conteudo), request)
 
+    # Número fixo de consultas: criador no JOIN, documentos e seus tipos em um prefetch
+    protocolo = get_object_or_404(
+        Protocolo.objects.select_related("criado_por").prefetch_related(
+            Prefetch("documentos", queryset=Documento.objects.select_related("tipo_documento"))
+        ),
+        pk=pk,
+    )
     
     context = {
         "protocolo": protocolo,
         "user_can_edit": request.user.is_authenticated and hasattr(request.user, 'perfil') and request.user.perfil.can_edit,
         "user_can_publish": request.user.is_authenticated and hasattr(request.user, 'perfil') and request.user.perfil.can_publish,
     }
-    return render(request, "protocolos/detalhe.html", context)
+    response = revalidate(render(request, "protocolos/detalhe.html", context), request)
+    if usar_cache:
+        cache.set(chave_cache, response.content, response_ttl())
+    return response
+
+@login_required
+def protocolo_export(request):
+    """Exporta em CSV ou XLSX todos os protocolos com os filtros da lista, em streaming"""
+    formato = request.GET.get("formato", "csv")
+    if formato not in ("csv", "xlsx"):
+        formato = "csv"
+    qs = ProtocoloFiltros.from_query(request.GET).apply(Protocolo.objects.all())
+    linhas = export_rows(qs)
+
+    if formato == "xlsx":
+        response = StreamingHttpResponse(
+            xlsx_stream(linhas),
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+    else:
+        response = StreamingHttpResponse(csv_stream(linhas), content_type="text/csv; charset=utf-8")
+    nome = f"protocolos-{timezone.localdate():%Y%m%d}.{formato}"
+    response["Content-Disposition"] = f'attachment; filename="{nome}"'
+    return response
+
+def _documentos_enviados(post):
+    """Documentos do formulário dinâmico (``documentos[0][tipo_documento]``), na ordem enviada"""
+    documentos_data = {}
+    for key, value in post.items():
+        if key.startswith('documentos[') and ']' in key:
+            # Extrair índice e campo do formato: documentos[0][tipo_documento]
+            parts = key.split('[')
+            if len(parts) >= 3:
+                index = parts[1].rstrip(']')
+                field = parts[2].rstrip(']')
+                documentos_data.setdefault(index, {})[field] = value
+    return [doc_data for doc_data in documentos_data.values() if doc_data.get('tipo_documento')]
+
+
+def _tipos_documento(documentos_data, categoria):
+    """Tipos de documento por id, em uma consulta; None se algum não existe, está inativo ou é de outra categoria"""
+    ids = {doc_data['tipo_documento'] for doc_data in documentos_data}
+    if not all(tipo_id.isdigit() for tipo_id in ids):
+        return None
+    tipos = TipoDocumento.objects.filter(categoria=categoria, ativo=True).in_bulk({int(tipo_id) for tipo_id in ids})
+    return tipos if len(tipos) == len(ids) else None
+
 
 @login_required
 def protocolo_create(request):
@@ -117,56 +221,29 @@ def protocolo_create(request):
     if request.method == 'POST':
         form = ProtocoloForm(request.POST, user=request.user)
         if form.is_valid():
-            protocolo = form.save(commit=False)
-            protocolo.criado_por = request.user
-            protocolo.save()
-            
-            # Processar documentos enviados via JavaScript
-            documentos_data = {}
-            for key, value in request.POST.items():
-                if key.startswith('documentos[') and ']' in key:
-                    # Extrair índice e campo do formato: documentos[0][tipo_documento]
-                    parts = key.split('[')
-                    if len(parts) >= 3:
-                        index = parts[1].rstrip(']')
-                        field = parts[2].rstrip(']')
-                        
-                        if index not in documentos_data:
-                            documentos_data[index] = {}
-                        documentos_data[index][field] = value
-            
-            # Criar documentos
-            documentos_criados = 0
-            for doc_data in documentos_data.values():
-                if doc_data.get('tipo_documento'):
-                    try:
-                        tipo_doc = TipoDocumento.objects.get(id=doc_data['tipo_documento'])
-                        Documento.objects.create(
-                            protocolo=protocolo,
-                            tipo_documento=tipo_doc,
-                            observacoes=doc_data.get('observacoes', '')
-                        )
-                        documentos_criados += 1
-                    except TipoDocumento.DoesNotExist:
-                        pass
-            
-            # Enviar ao SITAC após salvar documentos (somente finalísticos)
-            if protocolo.tipo in ('finalistico_pf', 'finalistico_pj'):
-                sitac_service = SITACService()
-                protocolo_data = sitac_service.create_protocolo_data(protocolo)
-                success, sitac_response = sitac_service.submit_protocolo(protocolo_data)
-                
-                if success and sitac_response:
-                    if 'protocolo' in sitac_response:
-                        protocolo.protocolo_sitac = sitac_response['protocolo']
-                        protocolo.save()
-                    messages.success(request, f'Protocolo criado e enviado para SITAC com sucesso! {documentos_criados} documento(s) adicionado(s).')
-                else:
-                    messages.warning(request, f'Protocolo criado com sucesso, mas falha ao enviar para SITAC. {documentos_criados} documento(s) adicionado(s).')
+            documentos_data = _documentos_enviados(request.POST)
+            tipos = _tipos_documento(documentos_data, form.cleaned_data['tipo'])
+            if tipos is None:
+                form.add_error(None, 'Há tipos de documento inválidos ou inativos para este tipo de processo.')
             else:
-                messages.success(request, f'Protocolo administrativo criado com sucesso. {documentos_criados} documento(s) adicionado(s).')
+                # Protocolo, documentos e envio ao SITAC são gravados juntos
+                protocolo = form.save(commit=False)
+                documentos = criar_protocolo(
+                    protocolo,
+                    [(tipos[int(doc_data['tipo_documento'])], doc_data.get('observacoes', '')) for doc_data in documentos_data],
+                    usuario=request.user,
+                )
+                documentos_criados = len(documentos)
+
+                # O post_save de Protocolo enfileirou o envio ao SITAC (somente
+                # finalísticos) na mesma transação; o comando processar_envios_sitac
+                # faz o envio fora da requisição
+                if protocolo.tipo in TIPOS_FINALISTICOS:
+                    messages.success(request, f'Protocolo criado com sucesso e enfileirado para envio ao SITAC. {documentos_criados} documento(s) adicionado(s).')
+                else:
+                    messages.success(request, f'Protocolo administrativo criado com sucesso. {documentos_criados} documento(s) adicionado(s).')
             
-            return redirect('protocolos:detalhe', pk=protocolo.pk)
+                return redirect('protocolos:detalhe', pk=protocolo.pk)
     else:
         form = ProtocoloForm(user=request.user)
     
@@ -188,7 +265,7 @@ def protocolo_edit(request, pk):
     
     perfil = request.user.perfil
     
-    if not (perfil.can_edit or protocolo.criado_por == request.user):
+    if not (perfil.can_edit or protocolo.criado_por_id == request.user.pk):
         messages.error(request, 'Você não tem permissão para editar este protocolo.')
         return redirect('protocolos:detalhe', pk=protocolo.pk)
     
@@ -220,7 +297,7 @@ def protocolo_delete(request, pk):
     
     perfil = request.user.perfil
     
-    if not (perfil.can_edit or protocolo.criado_por == request.user):
+    if not (perfil.can_edit or protocolo.criado_por_id == request.user.pk):
         messages.error(request, 'Você não tem permissão para excluir este protocolo.')
         return redirect('protocolos:detalhe', pk=protocolo.pk)
     
@@ -253,4 +330,27 @@ def tipos_documento_api(request):
         for tipo in tipos
     ]
     
-    return JsonResponse({'tipos': tipos_data})
\ No newline at end of file
+    return JsonResponse({'tipos': tipos_data})
+
+@staff_member_required
+def sitac_status(request):
+    """Estado do circuit breaker, timeouts e pool de conexões do SITAC (monitoramento)"""
+    return JsonResponse({
+        **sitac_resilience.snapshot(),
+        'pool': pool_stats(),
+    })
+
+def sitac_metrics_view(request):
+    """
+    Métricas do SITAC deste processo no formato texto do Prometheus.
+    Acesso para a equipe (staff) ou com o token SITAC_METRICS_TOKEN no cabeçalho
+    Authorization: Bearer.
+    """
+    token = getattr(settings, 'SITAC_METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    autorizado = request.user.is_authenticated and request.user.is_staff
+    if not autorizado and token and authorization.startswith('Bearer '):
+        autorizado = hmac.compare_digest(authorization[7:], token)
+    if not autorizado:
+        return HttpResponseForbidden()
+    return HttpResponse(sitac_metrics.render(), content_type=sitac_metrics.CONTENT_TYPE)
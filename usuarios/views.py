@@ -6,6 +6,7 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from .models import PerfilUsuario
 from .forms import UsuarioRegistrationForm, PerfilUsuarioUpdateForm, CustomAuthenticationForm
+from protocolos.dashboard import dashboard_stats
 from protocolos.models import Protocolo
 
 def cadastro(request):
@@ -99,18 +100,14 @@ def editar_perfil(request):
 
 @login_required
 def dashboard(request):
-    # Estatísticas básicas
-    total_protocolos = Protocolo.objects.count()
-    protocolos_ativos = Protocolo.objects.filter(protocolo_sitac='ativo').count()
-    protocolos_arquivados = Protocolo.objects.filter(protocolo_sitac='arquivado').count()
-    
+    # Estatísticas em uma consulta, em cache até a próxima gravação de protocolo
+    estatisticas = dashboard_stats()
+
     # Protocolos recentes
     protocolos_recentes = Protocolo.objects.order_by('-criado_em')[:5]
     
     context = {
-        'total_protocolos': total_protocolos,
-        'protocolos_ativos': protocolos_ativos,
-        'protocolos_arquivados': protocolos_arquivados,
+        'estatisticas': estatisticas,
         'protocolos_recentes': protocolos_recentes,
         'perfil': getattr(request.user, 'perfil', None)
     }